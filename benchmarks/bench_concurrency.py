@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark of the chatbot graph: N turns started at the same time
+should finish in about the time of one, because every node awaits its LLM
+call instead of blocking the event loop.
+
+The chat models are ScriptedChatModel (fakes.py) with a fixed latency and
+the turns take the paths that need no MCP server (weather, LLM routing plus
+a direct answer). --blocking swaps in a model whose async call blocks the
+loop, which is what a node calling the synchronous `llm.invoke` does, as a
+baseline. Also reports the worst event-loop stall seen by a 10 ms ticker.
+
+    python benchmarks/bench_concurrency.py
+    python benchmarks/bench_concurrency.py --concurrency 1 16 64 --llm-latency-ms 300 --blocking
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+
+from fakes import ScriptedChatModel  # noqa: E402
+
+QUERIES = ["北京今天天气怎么样？", "tell me a joke"]
+
+
+class BlockingChatModel(ScriptedChatModel):
+    """ScriptedChatModel whose async path blocks the loop like a sync invoke inside a node"""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+class IdleGraphQLAgent:
+    """the workload never reaches the GraphQL agent; keeps the runtime from connecting to MCP"""
+
+    async def _initialize(self):
+        pass
+
+    async def run(self, state):
+        return state
+
+    async def aclose(self):
+        pass
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """largest delay of a periodic timer beyond its interval, in ms"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst * 1000
+
+
+async def run_level(runtime, concurrency: int) -> dict:
+    stop = asyncio.Event()
+    ticker = asyncio.ensure_future(loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(runtime.ainvoke(QUERIES[n % len(QUERIES)]) for n in range(concurrency)))
+    wall_ms = (time.perf_counter() - started) * 1000
+    stop.set()
+    return {"concurrency": concurrency, "wall_ms": wall_ms, "max_loop_lag_ms": await ticker}
+
+
+async def bench(llm_latency_s: float, blocking: bool, levels: List[int]) -> Tuple[float, List[dict]]:
+    from chatbot import ChatbotRuntime
+    from orchestrator import Orchestrator
+    from weather_agent import WeatherAgent
+
+    model = BlockingChatModel if blocking else ScriptedChatModel
+    llm = model(latency_s=llm_latency_s)
+    runtime = ChatbotRuntime(Orchestrator(llm=llm), WeatherAgent(llm=llm), IdleGraphQLAgent())
+    async with runtime:
+        # warm up imports and the compiled graph
+        await runtime.ainvoke(QUERIES[0])
+        # the slowest query alone (the LLM-routed one makes two LLM calls) is "one turn"
+        one_turn_ms = 0.0
+        for query in QUERIES:
+            started = time.perf_counter()
+            await runtime.ainvoke(query)
+            one_turn_ms = max(one_turn_ms, (time.perf_counter() - started) * 1000)
+        return one_turn_ms, [await run_level(runtime, n) for n in levels]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--blocking", action="store_true", help="also run the blocking baseline")
+    args = parser.parse_args()
+
+    os.environ["ANSWER_CACHE_ENABLED"] = "0"
+    modes = [False, True] if args.blocking else [False]
+    for blocking in modes:
+        single, results = asyncio.run(bench(args.llm_latency_ms / 1000, blocking, args.concurrency))
+        print(f"{'blocking' if blocking else 'async'} nodes, one turn {single:.1f} ms:")
+        for level in results:
+            print(
+                f"  {level['concurrency']:4d} turns at once: {level['wall_ms']:8.1f} ms "
+                f"({level['wall_ms'] / single:5.2f}x one turn)  max loop stall {level['max_loop_lag_ms']:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
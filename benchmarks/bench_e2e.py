@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the chatbot.
+
+Runs the real create_chatbot graph, the real MCP server (src/tools/server.py,
+started as a subprocess) and the real ReactGraphQLAgent, with two stand-ins:
+the chat models are replaced by ScriptedChatModel (fakes.py) and web3.bio by
+mock_graphql.py, which serves recorded introspection and identity payloads
+with a configurable latency. Nothing leaves the machine, so runs are
+repeatable and comparable across commits.
+
+Reports p50/p95/p99 latency per turn, graph node, LLM call and MCP tool call,
+turns/sec at each concurrency level, startup times and peak RSS of every
+process, and writes them as JSON. Failed turns count in the latencies and
+the error rate; a run with any failed turn exits with status 1 and writes
+no results.
+
+    python benchmarks/bench_e2e.py
+    python benchmarks/bench_e2e.py --concurrency 1 8 32 --turns 64 --llm-latency-ms 150
+    python benchmarks/bench_e2e.py --transport inprocess   # tools in this process, no MCP server
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+sys.path.insert(0, SRC_DIR)
+
+from fakes import ScriptedChatModel  # noqa: E402
+
+# (kind, template); kinds cover every path through the graph
+WORKLOAD = [
+    ("weather", "北京今天天气怎么样？"),
+    ("identity", "user{n}.eth 的身份"),
+    ("react", "@dwr{n} 都关联了哪些账户"),
+    ("identity", "farcaster 上的 @fc{n} 是谁"),
+    ("llm_route", "tell me a joke"),
+]
+
+
+def workload(turns: int, offset: int = 0) -> List[tuple]:
+    """distinct identities per turn, so upstream lookups are not all result-cache hits"""
+    return [
+        (kind, template.format(n=offset + n))
+        for n, (kind, template) in ((n, WORKLOAD[n % len(WORKLOAD)]) for n in range(turns))
+    ]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(q: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "p50": round(rank(50), 2),
+        "p95": round(rank(95), 2),
+        "p99": round(rank(99), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+class LatencyRecorder(BaseCallbackHandler):
+    """collect wall time of graph nodes, LLM calls and tool calls from the callbacks"""
+
+    run_inline = True
+
+    def __init__(self):
+        self.samples: Dict[str, Dict[str, List[float]]] = {"nodes": defaultdict(list), "llm": defaultdict(list), "tools": defaultdict(list)}
+        self._started: Dict[object, tuple] = {}
+
+    @staticmethod
+    def _node_path(metadata: Optional[dict]) -> str:
+        """graphql_agent/tools for the nodes of the ReAct subgraph"""
+        namespace = (metadata or {}).get("langgraph_checkpoint_ns", "")
+        return "/".join(part.split(":")[0] for part in namespace.split("|") if part)
+
+    def _start(self, kind: str, name: str, run_id):
+        self._started[run_id] = (kind, name, time.perf_counter())
+
+    def _end(self, run_id):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            kind, name, start = started
+            self.samples[kind][name].append((time.perf_counter() - start) * 1000)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        name = kwargs.get("name")
+        if metadata and name is not None and name == metadata.get("langgraph_node"):
+            self._start("nodes", self._node_path(metadata) or name, run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start("llm", self._node_path(metadata) or "direct", run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start("tools", (serialized or {}).get("name") or kwargs.get("name") or "tool", run_id)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+    def report(self) -> Dict[str, Dict[str, dict]]:
+        return {kind: {name: percentiles(values) for name, values in sorted(by_name.items())} for kind, by_name in self.samples.items()}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_service(name: str, argv: List[str], port: int, env: dict, cwd: str, log_dir: str, timeout: float = 60.0):
+    """start a subprocess and wait until it accepts connections on port; returns (process, seconds)"""
+    log = open(os.path.join(log_dir, f"{name}.log"), "wb")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, *argv], cwd=cwd, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited with {process.returncode}, see {log.name}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process, time.perf_counter() - started
+        except OSError:
+            time.sleep(0.02)
+    process.kill()
+    raise RuntimeError(f"{name} did not listen on {port} within {timeout}s, see {log.name}")
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """VmHWM of a process (Linux); the benchmark process itself by default"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid is None:
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return None
+
+
+async def run_turn(runtime, query: str, recorder: LatencyRecorder) -> dict:
+    from chatbot import create_initial_state
+
+    started = time.perf_counter()
+    result = await runtime.app.ainvoke(create_initial_state(query), config={"callbacks": [recorder]})
+    return {
+        "ms": (time.perf_counter() - started) * 1000,
+        "agent": result.get("current_agent"),
+        "error": result.get("query_error"),
+    }
+
+
+async def run_level(runtime, concurrency: int, turns: int, offset: int) -> dict:
+    recorder = LatencyRecorder()
+    semaphore = asyncio.Semaphore(concurrency)
+    by_kind = defaultdict(list)
+    errors = 0
+
+    async def one(kind: str, query: str):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                turn = await run_turn(runtime, query, recorder)
+            except Exception as e:
+                print(f"turn failed: {query!r}: {e}")
+                turn = {"ms": (time.perf_counter() - started) * 1000, "error": str(e)}
+            if turn["error"]:
+                errors += 1
+            # failed turns count too, or a run where many fail fast would report better percentiles
+            by_kind[kind].append(turn["ms"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(kind, query) for kind, query in workload(turns, offset)))
+    wall = time.perf_counter() - started
+    all_turns = [ms for samples in by_kind.values() for ms in samples]
+    return {
+        "concurrency": concurrency,
+        "turns": turns,
+        "errors": errors,
+        "error_rate": round(errors / turns, 4) if turns else 0.0,
+        "wall_s": round(wall, 3),
+        "turns_per_s": round(turns / wall, 2),
+        "turn_ms": percentiles(all_turns),
+        "turn_ms_by_kind": {kind: percentiles(samples) for kind, samples in sorted(by_kind.items())},
+        **recorder.report(),
+    }
+
+
+async def bench(args, mcp_url: Optional[str]) -> dict:
+    started = time.perf_counter()
+    from chatbot import ChatbotRuntime
+    from graphql_agent import ReactGraphQLAgent
+    from orchestrator import Orchestrator
+    from weather_agent import WeatherAgent
+    import_s = time.perf_counter() - started
+
+    llm = ScriptedChatModel(latency_s=args.llm_latency_ms / 1000)
+    runtime = ChatbotRuntime(
+        orchestrator=Orchestrator(llm=llm),
+        weather_agent=WeatherAgent(llm=llm),
+        graphql_agent=ReactGraphQLAgent(llm=llm, mcp_url=mcp_url, transport=args.transport),
+    )
+    started = time.perf_counter()
+    await runtime.start()
+    runtime_start_s = time.perf_counter() - started
+
+    try:
+        # one pass over the workload with a cold schema cache, not part of the levels
+        warmup = LatencyRecorder()
+        cold = [await run_turn(runtime, query, warmup) for _, query in workload(len(WORKLOAD), offset=10_000)]
+        levels = []
+        for n, concurrency in enumerate(args.concurrency):
+            level = await run_level(runtime, concurrency, args.turns, offset=n * args.turns)
+            levels.append(level)
+            print(
+                f"concurrency {concurrency:3d}: {level['turns_per_s']:7.2f} turns/s  "
+                f"p50 {level['turn_ms']['p50']:8.1f} ms  p95 {level['turn_ms']['p95']:8.1f} ms  "
+                f"p99 {level['turn_ms']['p99']:8.1f} ms  errors {level['errors']} ({level['error_rate']:.1%})"
+            )
+    finally:
+        await runtime.aclose()
+
+    return {
+        "startup": {"import_s": round(import_s, 3), "runtime_start_s": round(runtime_start_s, 3)},
+        "cold_turn_ms": [round(turn["ms"], 2) for turn in cold],
+        "cold_errors": sum(1 for turn in cold if turn["error"]),
+        "levels": levels,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--turns", type=int, default=40, help="turns per concurrency level")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--upstream-latency-ms", type=float, default=80.0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--transport", choices=["http", "inprocess"], default="http", help="how the agent reaches the MCP tools")
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results", f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    args = parser.parse_args()
+
+    # the answer cache would turn repeated turns into lookups, the benchmark measures the graph
+    os.environ["ANSWER_CACHE_ENABLED"] = "0"
+
+    with tempfile.TemporaryDirectory(prefix="bench-e2e-") as workdir:
+        mock_port, mcp_port = free_port(), free_port()
+        mock, mock_start_s = start_service(
+            "mock_graphql",
+            [os.path.join(BENCH_DIR, "mock_graphql.py"), "--port", str(mock_port),
+             "--latency-ms", str(args.upstream_latency_ms), "--jitter-ms", str(args.upstream_jitter_ms)],
+            mock_port, {}, BENCH_DIR, workdir,
+        )
+        server = None
+        try:
+            upstream = f"http://127.0.0.1:{mock_port}/graphql"
+            if args.transport == "http":
+                server, server_start_s = start_service(
+                    "mcp_server", ["server.py"], mcp_port,
+                    {
+                        "DATA_API_URL": upstream,
+                        "SCHEMA_CACHE_PATH": os.path.join(workdir, "schemas.json.gz"),
+                        "IDENTITY_STORE_PATH": os.path.join(workdir, "identities.sqlite3"),
+                        "MCP_PORT": str(mcp_port),
+                    },
+                    os.path.join(SRC_DIR, "tools"), workdir,
+                )
+                results = asyncio.run(bench(args, f"http://127.0.0.1:{mcp_port}/mcp"))
+            else:
+                # the tools run in this process and read these at import time
+                os.environ.update(
+                    DATA_API_URL=upstream,
+                    SCHEMA_CACHE_PATH=os.path.join(workdir, "schemas.json.gz"),
+                    IDENTITY_STORE_PATH=os.path.join(workdir, "identities.sqlite3"),
+                )
+                server_start_s = 0.0
+                results = asyncio.run(bench(args, None))
+            results["startup"].update(mock_graphql_s=round(mock_start_s, 3), mcp_server_s=round(server_start_s, 3))
+            results["peak_rss_mb"] = {
+                "chatbot": peak_rss_mb(),
+                "mcp_server": peak_rss_mb(server.pid) if server is not None else None,
+                "mock_graphql": peak_rss_mb(mock.pid),
+            }
+            results["upstream"] = httpx.get(f"http://127.0.0.1:{mock_port}/stats").json()
+        finally:
+            for process in (server, mock):
+                if process is not None:
+                    process.terminate()
+                    process.wait(timeout=10)
+
+    results["config"] = {
+        "transport": args.transport,
+        "concurrency": args.concurrency,
+        "turns": args.turns,
+        "llm_latency_ms": args.llm_latency_ms,
+        "upstream_latency_ms": args.upstream_latency_ms,
+        "upstream_jitter_ms": args.upstream_jitter_ms,
+        "python": sys.version.split()[0],
+    }
+    print(f"startup: {results['startup']}")
+    print(f"peak RSS (MB): {results['peak_rss_mb']}")
+    errors = results["cold_errors"] + sum(level["errors"] for level in results["levels"])
+    if errors:
+        # numbers of a run with failed turns are not comparable to a clean run, keep them out of the results
+        sys.exit(f"{errors} turns failed, results not written")
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
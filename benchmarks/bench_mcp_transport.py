@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Per-tool-call overhead of the MCP transports used by ReactGraphQLAgent.
+
+Times the same tool calls through:
+  per_call    MultiServerMCPClient.get_tools(), a new HTTP session per call (the old behaviour)
+  persistent  one MCP session over streamable HTTP, reused by every call (MCP_TRANSPORT=http)
+  inprocess   the FastMCP tools called directly in this process (MCP_TRANSPORT=inprocess)
+
+The upstream is mock_graphql.py with no latency and the schema is warmed up
+first, so the numbers are transport cost plus the tool's own local work.
+
+    python benchmarks/bench_mcp_transport.py --calls 200 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench_e2e import BENCH_DIR, SRC_DIR, free_port, percentiles, start_service
+
+CALLS = [
+    ("describe-type", {"type_name": "Identity"}),
+    ("find-field-path", {"field_name": "displayName"}),
+    ("lookup-identity", {"platform": "ens", "identity": "vitalik.eth"}),
+]
+
+
+async def time_calls(tools, calls: int, concurrency: int) -> dict:
+    by_name = {tool.name: tool for tool in tools}
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(n: int):
+        name, args = CALLS[n % len(CALLS)]
+        async with semaphore:
+            started = time.perf_counter()
+            await by_name[name].ainvoke(args)
+            samples.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(calls)))
+    wall = time.perf_counter() - started
+    return {**percentiles(samples), "calls_per_s": round(calls / wall, 1)}
+
+
+async def bench(args, mcp_url: str) -> dict:
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+    from mcp_transport import PersistentMCPSession, load_inprocess_tools
+
+    client = MultiServerMCPClient({"relate-account": {"transport": "streamable_http", "url": mcp_url}})
+    session = PersistentMCPSession(client, "relate-account")
+    modes = {
+        "per_call": await client.get_tools(),
+        "persistent": await session.start(),
+        "inprocess": await load_inprocess_tools(),
+    }
+    results = {}
+    try:
+        for mode, tools in modes.items():
+            # warm the schema and result caches of whichever server answers
+            by_name = {tool.name: tool for tool in tools}
+            await by_name["discover-query-schema"].ainvoke({})
+            await time_calls(tools, len(CALLS), 1)
+            results[mode] = {
+                "sequential": await time_calls(tools, args.calls, 1),
+                f"concurrency_{args.concurrency}": await time_calls(tools, args.calls, args.concurrency),
+            }
+            sequential = results[mode]["sequential"]
+            print(f"{mode:>10}: p50 {sequential['p50']:7.2f} ms  p95 {sequential['p95']:7.2f} ms  "
+                  f"{sequential['calls_per_s']:8.1f} calls/s sequential, "
+                  f"{results[mode][f'concurrency_{args.concurrency}']['calls_per_s']:8.1f} calls/s at {args.concurrency}")
+    finally:
+        await session.aclose()
+
+    baseline = results["inprocess"]["sequential"]["p50"]
+    for mode in ("per_call", "persistent"):
+        results[mode]["overhead_p50_ms"] = round(results[mode]["sequential"]["p50"] - baseline, 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=150)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results", f"mcp-transport-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-mcp-") as workdir:
+        mock_port, mcp_port = free_port(), free_port()
+        upstream = f"http://127.0.0.1:{mock_port}/graphql"
+        # the in-process server reads these at import time
+        os.environ.update(
+            DATA_API_URL=upstream,
+            SCHEMA_CACHE_PATH=os.path.join(workdir, "inprocess.json.gz"),
+            IDENTITY_STORE_PATH=os.path.join(workdir, "inprocess.sqlite3"),
+        )
+        mock, _ = start_service(
+            "mock_graphql", [os.path.join(BENCH_DIR, "mock_graphql.py"), "--port", str(mock_port), "--latency-ms", "0"],
+            mock_port, {}, BENCH_DIR, workdir,
+        )
+        server = None
+        try:
+            server, _ = start_service(
+                "mcp_server", ["server.py"], mcp_port,
+                {
+                    "SCHEMA_CACHE_PATH": os.path.join(workdir, "server.json.gz"),
+                    "IDENTITY_STORE_PATH": os.path.join(workdir, "server.sqlite3"),
+                    "MCP_PORT": str(mcp_port),
+                },
+                os.path.join(SRC_DIR, "tools"), workdir,
+            )
+            results = asyncio.run(bench(args, f"http://127.0.0.1:{mcp_port}/mcp"))
+        finally:
+            for process in (server, mock):
+                if process is not None:
+                    process.terminate()
+                    process.wait(timeout=10)
+
+    print(f"overhead over in-process (p50): per-call sessions {results['per_call']['overhead_p50_ms']} ms, "
+          f"persistent session {results['persistent']['overhead_p50_ms']} ms")
+    results["config"] = {"calls": args.calls, "concurrency": args.concurrency, "python": sys.version.split()[0]}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
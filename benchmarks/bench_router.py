@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Routing latency benchmark: Orchestrator.route_query with and without the
+rule-based fast path.
+
+By default the routing LLM is replaced by a stand-in that sleeps for
+--llm-latency-ms, so the numbers are reproducible offline; pass --live to
+time the real gpt-4o-mini router instead.
+
+    python benchmarks/bench_router.py
+    python benchmarks/bench_router.py --live --repeat 1
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from orchestrator import Orchestrator  # noqa: E402
+from router import classify_query  # noqa: E402
+
+QUERIES = [
+    "what is vitalik.eth's farcaster",
+    "查询 sujiyan.eth 的身份",
+    "jesse.base.eth linked accounts",
+    "who owns 0xd8da6bf26964af9d7eed9e03e53415d37aa96045",
+    "@dwr on farcaster",
+    "toly.sol",
+    "北京今天天气怎么样？",
+    "Will it rain in New York tomorrow?",
+    "明天上海会下雨吗？",
+    "show my lens profile",
+    "tell me a joke",
+    "what can you do?",
+]
+
+
+class SleepingLLM:
+    """routing LLM stand-in with a fixed latency"""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.latency_s)
+        return SimpleNamespace(content='{"agent_name": "none"}')
+
+
+async def time_routes(orchestrator: Orchestrator, repeat: int):
+    samples = []
+    sources = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            state = {"messages": [], "current_agent": "", "user_query": query, "agent_response": ""}
+            start = time.perf_counter()
+            state = await orchestrator.route_query(state)
+            samples.append((time.perf_counter() - start) * 1000)
+            sources.append(state["route_source"])
+    return samples, sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency-ms", type=float, default=600.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--live", action="store_true", help="use the real routing LLM")
+    args = parser.parse_args()
+
+    llm = None if args.live else SleepingLLM(args.llm_latency_ms / 1000)
+    llm_only = Orchestrator(llm=llm, fast_path=False)
+    fast_path = Orchestrator(llm=llm or llm_only.llm, fast_path=True)
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        for query in QUERIES:
+            classify_query(query)
+    classify_us = (time.perf_counter() - start) / (1000 * len(QUERIES)) * 1e6
+
+    baseline, _ = asyncio.run(time_routes(llm_only, args.repeat))
+    optimized, sources = asyncio.run(time_routes(fast_path, args.repeat))
+
+    local = sources.count("rule")
+    print(f"queries routed locally: {local}/{len(sources)} ({local / len(sources):.0%})")
+    print(f"classify_query: {classify_us:.1f} us/query")
+    print(f"LLM-only routing:  mean {statistics.mean(baseline):8.1f} ms  total {sum(baseline):9.1f} ms")
+    print(f"fast-path routing: mean {statistics.mean(optimized):8.1f} ms  total {sum(optimized):9.1f} ms")
+    print(f"routing latency removed: {sum(baseline) - sum(optimized):.1f} ms ({1 - sum(optimized) / sum(baseline):.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: cold-start time and memory of the CLI (src/main.py) and
+the MCP server (src/tools/server.py), each in a fresh interpreter.
+
+- main.py: seconds from spawn until the first "User:" prompt is printed,
+  and the peak RSS of the process by then
+- import: seconds and peak RSS of `import main`, `import chatbot` (src/)
+  and `import server` (src/tools/) alone; `import main` is all the CLI
+  does before its prompt, so --max-import-main fails the run when it
+  gets slower than the given seconds
+- MCP server: seconds until it accepts connections, and its peak RSS
+
+Every measurement is repeated --repeat times and the median reported. No
+LLM or network access is needed: the API key is a placeholder and the MCP
+server URL points at a closed port.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_e2e import BENCH_DIR, SRC_DIR, free_port, peak_rss_mb, start_service
+
+IMPORT_PROBE = (
+    "import json, resource, time\n"
+    "started = time.perf_counter()\n"
+    "import {module}\n"
+    "print(json.dumps({{'seconds': time.perf_counter() - started, "
+    "'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))\n"
+)
+
+
+def isolated_env(workdir: str) -> dict:
+    """keep caches and stores of the child processes in the temporary directory"""
+    return {
+        **os.environ,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-startup-benchmark"),
+        "MCP_SERVER_URL": f"http://127.0.0.1:{free_port()}/mcp",
+        "SCHEMA_CACHE_PATH": os.path.join(workdir, "schemas.json.gz"),
+        "IDENTITY_STORE_PATH": os.path.join(workdir, "identities.sqlite3"),
+        "ANSWER_CACHE_PATH": os.path.join(workdir, "answers.json.gz"),
+        "MEMORY_SQLITE_PATH": os.path.join(workdir, "conversations.sqlite3"),
+    }
+
+
+def time_to_prompt(env: dict, marker: bytes = b"User:", timeout: float = 60.0) -> dict:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"], cwd=SRC_DIR, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    seen = b""
+    try:
+        while marker not in seen:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError(f"main.py exited before the prompt: {seen.decode(errors='replace')}")
+            seen += chunk
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("main.py did not show the prompt in time")
+        seconds = time.perf_counter() - started
+        rss = peak_rss_mb(process.pid)
+        process.stdin.write(b"quit\n")
+        process.stdin.flush()
+        process.wait(timeout=30)
+    finally:
+        if process.poll() is None:
+            process.kill()
+    return {"seconds": seconds, "peak_rss_mb": rss}
+
+
+def time_import(module: str, cwd: str, env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE.format(module=module)], cwd=cwd, env=env, capture_output=True, check=True,
+    ).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def time_server(env: dict, workdir: str) -> dict:
+    port = free_port()
+    process, seconds = start_service(
+        "mcp_server", ["server.py"], port, {**env, "MCP_PORT": str(port)}, os.path.join(SRC_DIR, "tools"), workdir,
+    )
+    try:
+        return {"seconds": seconds, "peak_rss_mb": peak_rss_mb(process.pid)}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def median(samples: list) -> dict:
+    return {key: round(statistics.median(s[key] for s in samples), 3) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-import-main", type=float, help="exit with status 1 when `import main` takes longer (seconds)")
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results", f"startup-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as workdir:
+        env = isolated_env(workdir)
+        # one untimed run so every variant sees warm bytecode and page caches
+        time_import("chatbot", SRC_DIR, env)
+        results = {
+            "main_to_prompt": median([time_to_prompt(env) for _ in range(args.repeat)]),
+            "import_main": median([time_import("main", SRC_DIR, env) for _ in range(args.repeat)]),
+            "import_chatbot": median([time_import("chatbot", SRC_DIR, env) for _ in range(args.repeat)]),
+            "import_server": median([time_import("server", os.path.join(SRC_DIR, "tools"), env) for _ in range(args.repeat)]),
+            "mcp_server_ready": median([time_server(env, workdir) for _ in range(args.repeat)]),
+        }
+
+    for name, result in results.items():
+        print(f"{name:18s} {result['seconds']:7.3f} s   peak RSS {result['peak_rss_mb']:7.1f} MB")
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.max_import_main is not None and results["import_main"]["seconds"] > args.max_import_main:
+        sys.exit(f"import main took {results['import_main']['seconds']:.3f} s, over the {args.max_import_main:g} s limit")
+
+
+if __name__ == "__main__":
+    main()
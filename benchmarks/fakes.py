@@ -0,0 +1,112 @@
+"""
+Offline stand-in for the chat models, shared by the benchmarks.
+
+ScriptedChatModel answers every prompt of the chatbot (routing, weather,
+identity summaries, the ReAct loop, direct answers) with a canned reply after
+a fixed latency, so the real graph, agents and MCP server can be timed
+without an LLM provider.
+"""
+
+import asyncio
+import re
+import time
+import uuid
+from typing import Any, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+HANDLE_RE = re.compile(r"@(\w+)")
+WEATHER_WORDS = ("天气", "weather", "rain", "下雨")
+IDENTITY_HINTS = (".eth", "@", "0x", "身份", "farcaster", "lens")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def react_query(identity: str) -> str:
+    return (
+        f'query {{ identity(platform: farcaster, identity: "{identity}") {{ '
+        "identity platform profile { displayName description } "
+        "identityGraph { vertices { identity platform } } } }"
+    )
+
+
+class ScriptedChatModel(BaseChatModel):
+    """deterministic chat model with a fixed per-call latency"""
+
+    latency_s: float = 0.05
+    tools_bound: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"tools_bound": True})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency_s)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency_s)
+        return self._result(messages)
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        message = self.reply(messages)
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        output_tokens = estimate_tokens(str(message.content)) + 20 * len(message.tool_calls)
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def reply(self, messages: List[BaseMessage]) -> AIMessage:
+        system = next((str(m.content) for m in messages if isinstance(m, SystemMessage)), "")
+        last_human = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        if self.tools_bound:
+            return self._react_step(messages, last_human)
+        if "Orchestrator" in system:
+            return AIMessage(content=f'{{"agent_name": "{self._route(last_human)}"}}')
+        if "天气" in system:
+            return AIMessage(content="今天晴，气温 18 到 26 摄氏度，东南风 2 级，不会下雨。")
+        if "identity assistant" in system:
+            return AIMessage(content=f"找到了该身份的资料和关联账户（原始结果 {len(last_human)} 字符），主要包括 ENS、Farcaster 和 Lens 账号。")
+        return AIMessage(content="你好！我可以帮你查询天气，或者查询 web3 身份及其关联账户。")
+
+    @staticmethod
+    def _route(query: str) -> str:
+        lowered = query.lower()
+        if any(word in lowered for word in WEATHER_WORDS):
+            return "weather_agent"
+        if any(hint in lowered for hint in IDENTITY_HINTS):
+            return "graphql_agent"
+        return "none"
+
+    @staticmethod
+    def _react_step(messages: List[BaseMessage], last_human: str) -> AIMessage:
+        """schema overview, then type lookups in parallel, then the query, then the answer"""
+        turn_start = max(n for n, m in enumerate(messages) if isinstance(m, HumanMessage))
+        tool_results = [m for m in messages[turn_start:] if isinstance(m, ToolMessage)]
+        match = HANDLE_RE.search(last_human)
+        identity = match.group(1) if match else "vitalik.eth"
+        steps = [
+            [("discover-query-schema", {})],
+            [("describe-type", {"type_name": "Identity"}), ("find-field-path", {"field_name": "vertices"})],
+            [("execute-query", {"query_statement": react_query(identity), "vertex_limit": 10})],
+        ]
+        remaining = len(tool_results)
+        for step in steps:
+            if remaining <= 0:
+                return AIMessage(
+                    content="",
+                    tool_calls=[{"name": name, "args": args, "id": f"call-{uuid.uuid4().hex[:12]}"} for name, args in step],
+                )
+            remaining -= len(step)
+        summary = str(tool_results[-1].content)[:200]
+        return AIMessage(content=f"{identity} 的身份图查询完成：{summary}")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the web3.bio GraphQL endpoint, used by the offline
+benchmarks. It answers introspection with the recorded schema in
+fixtures/introspection.json and every `identity` lookup (single, aliased
+batch or an inline query written by the agent) with the recorded graph in
+fixtures/identity.json, renamed to the requested identity. Each request
+waits --latency-ms (plus up to --jitter-ms) before answering. Automatic
+persisted queries (extensions.persistedQuery) are supported unless
+--no-apq is given; --error-rate answers that share of requests with a 502
+to exercise the client retries.
+
+    python benchmarks/mock_graphql.py --port 8100 --latency-ms 80
+"""
+
+import argparse
+import asyncio
+import copy
+import hashlib
+import os
+import random
+import re
+
+import orjson
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+INLINE_IDENTITY_RE = re.compile(r'(?:(\w+)\s*:\s*)?identity\s*\(\s*platform\s*:\s*(\w+)\s*,\s*identity\s*:\s*"([^"]*)"')
+
+
+def load_fixture(name: str) -> dict:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return orjson.loads(f.read())
+
+
+def create_app(latency_ms: float = 80.0, jitter_ms: float = 0.0, apq: bool = True, error_rate: float = 0.0) -> Starlette:
+    introspection = load_fixture("introspection.json")
+    identity = load_fixture("identity.json")
+    stats = {"requests": 0, "introspection": 0, "identity": 0, "bytes_in": 0, "bytes_out": 0, "apq_hits": 0, "apq_misses": 0, "errors": 0}
+    documents = {}
+
+    def identity_payload(platform: str, name: str) -> dict:
+        payload = copy.copy(identity)
+        payload.update(id=f"{platform},{name}", identity=name, platform=platform, aliases=[f"{platform},{name}"])
+        return payload
+
+    def answer(body: dict) -> dict:
+        query = body.get("query", "")
+        variables = body.get("variables") or {}
+        if "__schema" in query:
+            stats["introspection"] += 1
+            return introspection
+        stats["identity"] += 1
+        # aliased batch: i<n>: identity(platform: $p<n>, identity: $i<n>)
+        if "p0" in variables:
+            data = {}
+            n = 0
+            while f"p{n}" in variables:
+                data[f"i{n}"] = identity_payload(variables[f"p{n}"], variables[f"i{n}"])
+                n += 1
+            return {"data": data}
+        if "identity" in variables:
+            return {"data": {"identity": identity_payload(variables["platform"], variables["identity"])}}
+        data = {}
+        for alias, platform, name in INLINE_IDENTITY_RE.findall(query):
+            data[alias or "identity"] = identity_payload(platform, name)
+        if not data:
+            return {"data": None, "errors": [{"message": "mock server only answers identity lookups"}]}
+        return {"data": data}
+
+    async def graphql(request: Request) -> Response:
+        stats["requests"] += 1
+        raw = await request.body()
+        stats["bytes_in"] += len(raw)
+        body = orjson.loads(raw)
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            return Response(b"upstream unavailable", status_code=502)
+        persisted = (body.get("extensions") or {}).get("persistedQuery")
+        if persisted and apq:
+            digest = persisted["sha256Hash"]
+            if body.get("query") is None:
+                if digest not in documents:
+                    stats["apq_misses"] += 1
+                    return JSONResponse({"errors": [{"message": "PersistedQueryNotFound", "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]})
+                stats["apq_hits"] += 1
+                body["query"] = documents[digest]
+            elif hashlib.sha256(body["query"].encode()).hexdigest() == digest:
+                documents[digest] = body["query"]
+        if body.get("query") is None:
+            return JSONResponse({"errors": [{"message": "Must provide query string."}]}, status_code=400)
+        delay = latency_ms + random.uniform(0, jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        content = orjson.dumps(answer(body))
+        stats["bytes_out"] += len(content)
+        return Response(content, media_type="application/json")
+
+    async def get_stats(request: Request) -> JSONResponse:
+        return JSONResponse(stats)
+
+    app = Starlette(routes=[
+        Route("/graphql", graphql, methods=["POST"]),
+        Route("/stats", get_stats, methods=["GET"]),
+    ])
+    app.state.stats = stats
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 502")
+    parser.add_argument("--no-apq", action="store_true", help="reject persisted-query hashes like a server without APQ")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.jitter_ms, apq=not args.no_apq, error_rate=args.error_rate), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import json
+import os
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from router import EVM_ADDRESS_RE, HANDLE_RE, NAME_RE
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "answers.npz")
+
+# seconds an answer stays valid, per agent that produced it
+DEFAULT_TTLS = {
+    "weather_agent": 10 * 60,
+    "graphql_agent": 6 * 60 * 60,
+    "identity_agent": 6 * 60 * 60,
+    "none": 60 * 60,
+}
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "what", "whats", "which", "who", "whose", "how", "of", "for",
+    "on", "in", "at", "to", "me", "my", "show", "tell", "find", "get", "please", "does", "do", "can",
+    "you", "i", "s", "and", "or", "about", "account", "accounts", "linked", "related", "any",
+}
+CJK_STOP_RE = re.compile(r"[的了吗呢吧啊是请帮我你查询一下什么怎么样如何哪些有]")
+CJK_RUN_RE = re.compile(r"[一-鿿]+")
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9._-]*[a-z0-9]|[a-z0-9]")
+
+
+def query_entities(query: str) -> frozenset:
+    """names, addresses, handles and numbers; two queries must agree on these to share an answer"""
+    lowered = query.lower()
+    found = set(m.group(1) for m in NAME_RE.finditer(lowered))
+    found.update(m.group(0) for m in EVM_ADDRESS_RE.finditer(lowered))
+    found.update("@" + m.group(1) for m in HANDLE_RE.finditer(lowered))
+    found.update(re.findall(r"\d+", lowered))
+    return frozenset(found)
+
+
+def _features(query: str):
+    lowered = query.lower()
+    for run in CJK_RUN_RE.findall(lowered):
+        run = CJK_STOP_RE.sub("", run)
+        if len(run) == 1:
+            yield run, 1.0
+        for i in range(len(run) - 1):
+            yield run[i:i + 2], 1.0
+    for word in WORD_RE.findall(CJK_RUN_RE.sub(" ", lowered).replace("'s", " ")):
+        if word in STOPWORDS:
+            continue
+        yield word, 1.0
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3], 0.3
+
+
+def embed(query: str, dim: int) -> np.ndarray:
+    """signed feature hashing of content words, their trigrams and CJK bigrams, L2-normalized"""
+    vec = np.zeros(dim, dtype=np.float32)
+    features = list(_features(query))
+    if not features:
+        return vec
+    hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f, _ in features), dtype=np.uint32, count=len(features))
+    weights = np.fromiter((w for _, w in features), dtype=np.float32, count=len(features))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vec, hashes % dim, signs * weights)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class AnswerCache:
+    """
+    Semantic cache of final answers in front of the chatbot graph.
+
+    Queries are embedded locally with feature hashing and compared to all
+    cached queries with one matrix-vector product. A cached answer is reused
+    when cosine similarity reaches `threshold`, the named entities (ENS names,
+    addresses, handles, numbers) are identical and the entry has not expired.
+    Capacity is fixed at `max_entries`; the least recently used entry is
+    evicted when full.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        path: Optional[str] = None,
+        dim: int = 1024,
+    ):
+        self.threshold = threshold if threshold is not None else float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.85"))
+        self.max_entries = max_entries or int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2048"))
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.path = path or os.getenv("ANSWER_CACHE_PATH", DEFAULT_SNAPSHOT_PATH)
+        self.dim = dim
+
+        self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._expires_at = np.zeros(self.max_entries, dtype=np.float64)
+        # logical clock for LRU order, immune to equal wall-clock timestamps
+        self._last_used = np.zeros(self.max_entries, dtype=np.int64)
+        self._clock = 0
+        self._entries: List[Optional[dict]] = [None] * self.max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["AnswerCache"]:
+        """the default cache, or None when ANSWER_CACHE_ENABLED=0"""
+        if os.getenv("ANSWER_CACHE_ENABLED", "1") == "0":
+            return None
+        return cls()
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._expires_at > time.time()))
+
+    def lookup(self, query: str) -> Optional[dict]:
+        """return the cached entry (query, answer, agent) for a near-duplicate query, or None"""
+        now = time.time()
+        vector = embed(query, self.dim)
+        similarities = self._vectors @ vector
+        similarities[self._expires_at <= now] = -1.0
+        candidates = np.flatnonzero(similarities >= self.threshold)
+        if candidates.size:
+            entities = query_entities(query)
+            for slot in candidates[np.argsort(-similarities[candidates])]:
+                entry = self._entries[slot]
+                if entry["entities"] == entities:
+                    self._touch(slot)
+                    self.hits += 1
+                    return {**entry, "similarity": float(similarities[slot])}
+        self.misses += 1
+        return None
+
+    def store(self, query: str, answer: str, agent_name: str, sub_agents: Sequence[str] = ()):
+        """cache an answer; a compound answer lives as long as the shortest-lived of its `sub_agents`"""
+        ttl = min(self.ttls.get(name, self.ttls["none"]) for name in (sub_agents or [agent_name]))
+        if ttl <= 0 or not answer:
+            return
+        now = time.time()
+        vector = embed(query, self.dim)
+        entities = query_entities(query)
+
+        # overwrite a near-duplicate instead of keeping both
+        similarities = self._vectors @ vector
+        similarities[self._expires_at <= now] = -1.0
+        slot = None
+        for candidate in np.flatnonzero(similarities >= self.threshold):
+            if self._entries[candidate]["entities"] == entities:
+                slot = candidate
+                break
+        if slot is None:
+            free = np.flatnonzero(self._expires_at <= now)
+            if free.size:
+                slot = free[0]
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+        self._vectors[slot] = vector
+        self._expires_at[slot] = now + ttl
+        self._touch(slot)
+        self._entries[slot] = {"query": query, "answer": answer, "agent": agent_name, "sub_agents": list(sub_agents), "entities": entities}
+
+    def _touch(self, slot: int):
+        self._clock += 1
+        self._last_used[slot] = self._clock
+
+    def invalidate(self, agent_name: Optional[str] = None):
+        for slot, entry in enumerate(self._entries):
+            if entry is not None and (agent_name is None or agent_name in (entry["agent"], *entry.get("sub_agents", ()))):
+                self._expires_at[slot] = 0.0
+                self._entries[slot] = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def save(self):
+        """write live entries to an .npz snapshot"""
+        live = np.flatnonzero(self._expires_at > time.time())
+        meta = [
+            {**self._entries[slot], "entities": sorted(self._entries[slot]["entities"])}
+            for slot in live
+        ]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            vectors=self._vectors[live],
+            expires_at=self._expires_at[live],
+            meta=np.array(json.dumps(meta, ensure_ascii=False)),
+        )
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> int:
+        """restore unexpired entries from the snapshot, return how many were loaded"""
+        try:
+            with np.load(self.path, allow_pickle=False) as snapshot:
+                vectors = snapshot["vectors"]
+                expires_at = snapshot["expires_at"]
+                meta = json.loads(str(snapshot["meta"]))
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable answer cache snapshot {self.path}: {e}")
+            return 0
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            return 0
+
+        now = time.time()
+        keep = [i for i in np.argsort(-expires_at) if expires_at[i] > now][: self.max_entries]
+        for slot, i in enumerate(keep):
+            self._vectors[slot] = vectors[i]
+            self._expires_at[slot] = expires_at[i]
+            self._touch(slot)
+            self._entries[slot] = {**meta[i], "entities": frozenset(meta[i]["entities"])}
+        return len(keep)
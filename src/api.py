@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+HTTP front end for the chatbot: many chat sessions served concurrently on
+one event loop, all sharing one ChatbotRuntime (and its compiled graph).
+
+    uvicorn api:create_app --factory --app-dir src --port 8080
+    curl -s localhost:8080/chat -d '{"message": "sujiyan.eth"}'
+    curl -sN localhost:8080/chat -d '{"message": "sujiyan.eth", "stream": true}'
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from answer_cache import AnswerCache
+from chatbot import ChatbotRuntime
+from llm import aclose_http_clients
+from memory import ConversationMemory
+import telemetry
+from tools.metrics import CONTENT_TYPE, REGISTRY
+
+class Overloaded(Exception):
+    pass
+
+class TurnLimiter:
+    """at most `max_concurrency` turns run at once and at most `max_queue` wait; beyond that requests are shed"""
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def acquire(self):
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise Overloaded()
+        self.waiting += 1
+        self._idle.clear()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+        if self.active == 0 and self.waiting == 0:
+            self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """wait until no turn is running or queued, return False on timeout"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+class Session:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.turns = 0
+        # requests holding this session object, it is not evicted while any are
+        self.requests = 0
+        # turns of one session run one after another
+        self.lock = asyncio.Lock()
+
+class ChatService:
+    def __init__(
+        self,
+        runtime: ChatbotRuntime,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        deadline: Optional[float] = None,
+        drain_timeout: Optional[float] = None,
+        max_sessions: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+    ):
+        self.runtime = runtime
+        self.limiter = TurnLimiter(
+            max_concurrency or int(os.getenv("CHAT_MAX_CONCURRENCY", "32")),
+            max_queue if max_queue is not None else int(os.getenv("CHAT_MAX_QUEUE", "64")),
+        )
+        self.deadline = deadline or float(os.getenv("CHAT_DEADLINE", "60"))
+        self.drain_timeout = drain_timeout or float(os.getenv("CHAT_DRAIN_TIMEOUT", "30"))
+        # bounded like the in-memory conversation store: least recently used and idle sessions are dropped
+        self.max_sessions = max_sessions or int(os.getenv("MEMORY_MAX_SESSIONS", "1000"))
+        self.idle_ttl = idle_ttl or float(os.getenv("MEMORY_IDLE_TTL", "3600"))
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.draining = False
+        REGISTRY.collect("chatbot_active_turns", "gauge", "Turns running now", lambda: self.limiter.active)
+        REGISTRY.collect("chatbot_queued_turns", "gauge", "Turns waiting for a slot", lambda: self.limiter.waiting)
+        REGISTRY.collect("chatbot_sessions", "gauge", "Known chat sessions", lambda: len(self.sessions))
+
+    def get_session(self, session_id: Optional[str]) -> Session:
+        self._evict()
+        session_id = session_id or uuid.uuid4().hex
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = Session(session_id)
+        self.sessions.move_to_end(session_id)
+        session.last_active = time.time()
+        return session
+
+    def _evict(self):
+        now = time.time()
+        for session_id, session in list(self.sessions.items()):
+            if len(self.sessions) < self.max_sessions and now - session.last_active <= self.idle_ttl:
+                break
+            # a session with a request in flight keeps its lock, so its turns stay serialized
+            if session.requests == 0:
+                del self.sessions[session_id]
+
+    def _release_session(self, session: Session):
+        session.requests -= 1
+        session.last_active = time.time()
+
+    @asynccontextmanager
+    async def lifespan(self, app: Starlette):
+        await self.runtime.start()
+        try:
+            yield
+        finally:
+            # stop taking new turns, let the in-flight ones finish, then release the runtime
+            self.draining = True
+            if not await self.limiter.wait_idle(self.drain_timeout):
+                print(f"Shutting down with {self.limiter.active} turn(s) still running")
+            await self.runtime.aclose()
+            await aclose_http_clients()
+
+    async def create_session(self, request: Request) -> JSONResponse:
+        return JSONResponse({"session_id": self.get_session(None).session_id})
+
+    async def health(self, request: Request) -> JSONResponse:
+        return JSONResponse({
+            "status": "draining" if self.draining else "ok",
+            "active_turns": self.limiter.active,
+            "queued_turns": self.limiter.waiting,
+            "sessions": len(self.sessions),
+        })
+
+    async def metrics(self, request: Request) -> Response:
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+    async def traces(self, request: Request) -> JSONResponse:
+        """the most recent per-turn trace records, newest last; ?session_id= filters"""
+        session_id = request.query_params.get("session_id")
+        records = [r for r in telemetry.recent_traces if session_id is None or r["session_id"] == session_id]
+        return JSONResponse(records)
+
+    async def chat(self, request: Request):
+        if self.draining:
+            return JSONResponse({"error": "server is shutting down"}, status_code=503)
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            return JSONResponse({"error": "request body must be JSON"}, status_code=400)
+        if not isinstance(body, dict):
+            return JSONResponse({"error": "request body must be a JSON object"}, status_code=400)
+        message = body.get("message")
+        if message is not None and not isinstance(message, str):
+            return JSONResponse({"error": "message must be a string"}, status_code=400)
+        if not isinstance(body.get("session_id") or "", str):
+            return JSONResponse({"error": "session_id must be a string"}, status_code=400)
+        message = (message or "").strip()
+        if not message:
+            return JSONResponse({"error": "message is required"}, status_code=400)
+        session = self.get_session(body.get("session_id"))
+        session.requests += 1
+
+        try:
+            await self.limiter.acquire()
+        except Overloaded:
+            self._release_session(session)
+            return JSONResponse(
+                {"error": "too many concurrent requests", "session_id": session.session_id},
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+
+        if body.get("stream"):
+            # the generator releases the slot when it finishes; the background task covers
+            # clients that disconnect before the first chunk is pulled
+            release = self._release_once(session)
+            return StreamingResponse(
+                self._stream_turn(session, message, release),
+                media_type="application/x-ndjson",
+                headers={"X-Session-Id": session.session_id},
+                background=BackgroundTask(release),
+            )
+        try:
+            # waiting for an earlier turn of the same session counts against the deadline too
+            response = await asyncio.wait_for(self._turn(session, message), self.deadline)
+        except asyncio.TimeoutError:
+            return JSONResponse(
+                {"error": f"turn exceeded {self.deadline:g}s deadline", "session_id": session.session_id},
+                status_code=504,
+            )
+        finally:
+            self.limiter.release()
+            self._release_session(session)
+        return JSONResponse({"session_id": session.session_id, "response": response})
+
+    async def _turn(self, session: Session, message: str) -> str:
+        async with session.lock:
+            session.turns += 1
+            return await self.runtime.ainvoke(message, session.session_id)
+
+    def _release_once(self, session: Session):
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.limiter.release()
+                self._release_session(session)
+        return release
+
+    async def _stream_turn(self, session: Session, message: str, release):
+        try:
+            async with asyncio.timeout(self.deadline):
+                async with session.lock:
+                    session.turns += 1
+                    async for event in self.runtime.astream(message, session.session_id):
+                        if event["type"] == "final":
+                            event = {**event, "session_id": session.session_id}
+                        yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        except TimeoutError:
+            yield json.dumps({"type": "error", "error": f"turn exceeded {self.deadline:g}s deadline"}) + "\n"
+        finally:
+            release()
+
+def create_app(runtime: Optional[ChatbotRuntime] = None, **service_options) -> Starlette:
+    runtime = runtime or ChatbotRuntime(answer_cache=AnswerCache.from_env(), memory=ConversationMemory())
+    service = ChatService(runtime, **service_options)
+    app = Starlette(
+        routes=[
+            Route("/chat", service.chat, methods=["POST"]),
+            Route("/sessions", service.create_session, methods=["POST"]),
+            Route("/healthz", service.health, methods=["GET"]),
+            Route("/metrics", service.metrics, methods=["GET"]),
+            Route("/traces", service.traces, methods=["GET"]),
+        ],
+        lifespan=service.lifespan,
+    )
+    app.state.service = service
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        create_app(),
+        host=os.getenv("CHAT_HOST", "127.0.0.1"),
+        port=int(os.getenv("CHAT_PORT", "8080")),
+        timeout_graceful_shutdown=int(os.getenv("CHAT_DRAIN_TIMEOUT", "30")),
+    )
@@ -1,32 +1,119 @@
 import os 
 import asyncio
+import inspect
+import threading
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Optional
 from dotenv import load_dotenv
-from langgraph.graph import StateGraph, END
-from orchestrator import Orchestrator, AgentState
-from weather_agent import WeatherAgent
-from graphql_agent import ReactGraphQLAgent
+
+# langgraph, langchain, telemetry and the agent modules are imported when the runtime starts or runs a turn, not with this module
+if TYPE_CHECKING:
+    from answer_cache import AnswerCache
+    from memory import ConversationMemory
 
 load_dotenv()
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 base_url = os.getenv("BASE_URL")
 
-def create_chatbot():
-    """create chatbot state graph"""
+class LazyAgent:
+    """stands in for an agent and builds it with `factory` the first time it is used"""
+
+    def __init__(self, factory: Callable[[], object]):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self.instance = None
+
+    def get(self):
+        # the warm-up builds it in a worker thread while turns may ask for it on the loop
+        if self.instance is None:
+            with self._lock:
+                if self.instance is None:
+                    self.instance = self._factory()
+        return self.instance
+
+    def __getattr__(self, name):
+        # langgraph probes node closures for __self__ and the like while compiling, that must not build the agent
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+def _node(agent, method: str):
+    """graph node calling agent.<method>, looked up per call so lazy agents stay unbuilt until routed to"""
+    async def node(state):
+        result = getattr(agent, method)(state)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    node.__name__ = method
+    return node
+
+def new_weather_agent():
+    from weather_agent import WeatherAgent
+    return WeatherAgent()
+
+def new_graphql_agent():
+    from graphql_agent import ReactGraphQLAgent
+    return ReactGraphQLAgent()
+
+def new_identity_agent(graphql_agent):
+    from identity_agent import IdentityLookupAgent
+    return IdentityLookupAgent(graphql_agent)
+
+def create_subtask_runner(weather_agent, graphql_agent, identity_agent):
+    """graph node that answers one part of a compound query with its expert agent"""
+    agents = {
+        "weather_agent": _node(weather_agent, "process_query"),
+        "graphql_agent": _node(graphql_agent, "run"),
+        "identity_agent": _node(identity_agent, "run"),
+    }
+
+    async def run_subtask(payload: dict) -> dict:
+        task = payload["task"]
+        state = create_initial_state(task["query"], payload.get("messages"))
+        state.update(current_agent=task["agent"], route_platform=task.get("platform"), route_identity=task.get("identity"))
+        started = time.perf_counter()
+        try:
+            result = await agents[task["agent"]](state)
+            response, error = result.get("agent_response") or "", result.get("query_error")
+            exhausted = (result.get("budget_usage") or {}).get("exhausted")
+        except Exception as e:
+            response, error, exhausted = f"抱歉，处理“{task['query']}”时出错: {e}", str(e), None
+        # a partial update: parallel subtasks only ever append to agent_results
+        return {"agent_results": [{
+            "index": task["index"],
+            "agent": task["agent"],
+            "query": task["query"],
+            "response": response,
+            "error": error,
+            "exhausted": exhausted,
+            "latency_ms": (time.perf_counter() - started) * 1000,
+        }]}
+
+    return run_subtask
+
+def create_chatbot(orchestrator=None, weather_agent=None, graphql_agent=None, identity_agent=None):
+    """create chatbot state graph; agents that are not given are built the first time a turn is routed to them"""
+    from langgraph.graph import StateGraph, END
+    from orchestrator import Orchestrator, AgentState
     
     # init agents
-    orchestrator = Orchestrator()
-    weather_agent = WeatherAgent()
-    graphql_agent = ReactGraphQLAgent()
+    orchestrator = orchestrator or Orchestrator()
+    weather_agent = weather_agent or LazyAgent(new_weather_agent)
+    graphql_agent = graphql_agent or LazyAgent(new_graphql_agent)
+    identity_agent = identity_agent or LazyAgent(lambda: new_identity_agent(graphql_agent))
     
     # create state graph
     workflow = StateGraph(AgentState)
     
     # add nodes
-    workflow.add_node("orchestrator", orchestrator.route_query)
-    workflow.add_node("weather_agent", weather_agent.process_query)
-    workflow.add_node("graphql_agent", graphql_agent.run)
-    workflow.add_node("format_response", orchestrator.format_response)
+    workflow.add_node("orchestrator", _node(orchestrator, "route_query"))
+    workflow.add_node("weather_agent", _node(weather_agent, "process_query"))
+    workflow.add_node("graphql_agent", _node(graphql_agent, "run"))
+    workflow.add_node("identity_agent", _node(identity_agent, "run"))
+    workflow.add_node("subtask", create_subtask_runner(weather_agent, graphql_agent, identity_agent))
+    workflow.add_node("format_response", _node(orchestrator, "format_response"))
     
     # set entry point
     workflow.set_entry_point("orchestrator")
@@ -38,6 +125,8 @@ def create_chatbot():
         {
             "weather_agent": "weather_agent",
             "graphql_agent": "graphql_agent",
+            "identity_agent": "identity_agent",
+            "subtask": "subtask",
             "end": "format_response"
         }
     )
@@ -45,6 +134,9 @@ def create_chatbot():
     # add edges from expert agents to end
     workflow.add_edge("weather_agent", "format_response")
     workflow.add_edge("graphql_agent", "format_response")
+    workflow.add_edge("identity_agent", "format_response")
+    # the parallel subtasks of a compound query all finish before format_response merges them
+    workflow.add_edge("subtask", "format_response")
     workflow.add_edge("format_response", END)
     
     # compile graph
@@ -52,23 +144,270 @@ def create_chatbot():
     
     return app
 
-async def process_user_input_async(user_query: str) -> str:
-    """异步处理用户输入并返回响应"""
-    app = create_chatbot()
-    
-    # create initial state
-    initial_state = {
-        "messages": [],
+# graph nodes whose LLM output is the answer shown to the user (the router's JSON is not)
+STREAMED_NODES = ("weather_agent", "graphql_agent", "identity_agent", "format_response")
+# nodes whose models may answer with tool calls; text they stream is only an answer if the generation ends without any
+TOOL_CALLING_NODES = ("graphql_agent",)
+
+def graph_node(metadata: dict) -> Optional[str]:
+    """the top-level graph node of an event, also for models inside a node's own graph (the ReAct agent)"""
+    namespace = metadata.get("langgraph_checkpoint_ns") or ""
+    return namespace.split("|")[0].split(":")[0] or metadata.get("langgraph_node")
+
+def create_initial_state(user_query: str, messages=None) -> dict:
+    """create the graph input for one user turn"""
+    return {
+        "messages": messages or [],
         "current_agent": "",
         "user_query": user_query,
-        "agent_response": ""
+        "agent_response": "",
+        "route_source": "",
+        "route_confidence": 0.0,
+        "query_error": None,
+        "route_platform": None,
+        "route_identity": None,
+        "agent_path": "",
+        "agent_latency_ms": 0.0,
+        "budget_usage": None,
+        "sub_tasks": [],
+        "agent_results": []
     }
-    
-    # run graph
-    result = await app.ainvoke(initial_state)
-    
-    return result["agent_response"]
+
+class ChatbotRuntime:
+    """long-lived chatbot: agents, MCP tools and the compiled graph are built once in start() and reused by every turn"""
+
+    def __init__(self, orchestrator=None, weather_agent=None, graphql_agent=None, answer_cache: Optional["AnswerCache"] = None, identity_agent=None, memory: Optional["ConversationMemory"] = None):
+        self.orchestrator = orchestrator
+        self.weather_agent = weather_agent
+        self.graphql_agent = graphql_agent
+        self.identity_agent = identity_agent
+        self.answer_cache = answer_cache
+        self.memory = memory
+        self.app = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._start_lock = asyncio.Lock()
+        self._warmup: Optional[asyncio.Future] = None
+
+    @property
+    def started(self) -> bool:
+        return self.app is not None
+
+    async def start(self) -> "ChatbotRuntime":
+        """compile the graph (idempotent); the expert agents are built on first route, see create_chatbot"""
+        async with self._start_lock:
+            if self.app is not None:
+                return self
+
+            from orchestrator import Orchestrator
+
+            self.loop = asyncio.get_running_loop()
+            if self.answer_cache is not None:
+                self.answer_cache.load()
+            self.orchestrator = self.orchestrator or Orchestrator()
+            self.weather_agent = self.weather_agent or LazyAgent(new_weather_agent)
+            self.graphql_agent = self.graphql_agent or LazyAgent(new_graphql_agent)
+            self.identity_agent = self.identity_agent or LazyAgent(lambda: new_identity_agent(self.graphql_agent))
+
+            self.app = create_chatbot(self.orchestrator, self.weather_agent, self.graphql_agent, self.identity_agent)
+            # fetch the MCP tool list in the background instead of on the first graphql turn;
+            # if the MCP server is not up yet the agent retries lazily in run()
+            if os.getenv("AGENT_WARMUP", "1") != "0":
+                self._warmup = asyncio.ensure_future(self._warm_up())
+        return self
+
+    async def _warm_up(self):
+        try:
+            if isinstance(self.graphql_agent, LazyAgent):
+                # importing the agent modules takes a while, keep it off the event loop
+                await asyncio.to_thread(self.graphql_agent.get)
+            await self.graphql_agent._initialize()
+        except Exception as e:
+            print(f"GraphQL agent warm-up failed: {e}")
+
+    def _history(self, session_id: Optional[str]) -> list:
+        if self.memory is None or session_id is None:
+            return []
+        return self.memory.history(session_id)
+
+    def _uses_answer_cache(self, user_query: str, history: list) -> bool:
+        # follow-up questions depend on the history, only standalone turns use the answer cache;
+        # a turn that names its identity (vitalik.eth, 0x..., @handle) stands on its own in any session
+        if self.answer_cache is None:
+            return False
+        if not history:
+            return True
+        from router import classify_query
+        decision = classify_query(user_query)
+        return decision is not None and decision.identity is not None
+
+    def _store_answer(self, user_query: str, result: dict):
+        # failed turns and the partial answer of an exhausted ReAct budget are not worth reusing
+        if result.get("query_error") or (result.get("budget_usage") or {}).get("exhausted"):
+            return
+        sub_results = result.get("agent_results") or []
+        if any(r.get("exhausted") for r in sub_results):
+            return
+        self.answer_cache.store(user_query, result["agent_response"], result["current_agent"], [r["agent"] for r in sub_results])
+
+    async def _remember(self, session_id: Optional[str], user_query: str, answer: str):
+        if self.memory is not None and session_id is not None:
+            if self.memory.summarizer is None:
+                self.memory.summarizer = getattr(self.orchestrator, "llm", None)
+            await self.memory.append_turn(session_id, user_query, answer)
+
+    async def ainvoke(self, user_query: str, session_id: Optional[str] = None) -> str:
+        """run one user turn through the compiled graph; turns sharing a session_id share history"""
+        if self.app is None:
+            await self.start()
+        import telemetry
+        tracer = telemetry.turn_tracer(session_id, user_query)
+        history = self._history(session_id)
+        use_cache = self._uses_answer_cache(user_query, history)
+        if use_cache:
+            cached = self.answer_cache.lookup(user_query)
+            if cached is not None:
+                await self._remember(session_id, user_query, cached["answer"])
+                if tracer is not None:
+                    tracer.finish({"current_agent": cached["agent"]}, cached=True)
+                return cached["answer"]
+        result = await self.app.ainvoke(create_initial_state(user_query, history), config=telemetry.run_config(tracer))
+        if tracer is not None:
+            tracer.finish(result)
+        if use_cache:
+            self._store_answer(user_query, result)
+        await self._remember(session_id, user_query, result["agent_response"])
+        return result["agent_response"]
+
+    async def astream(self, user_query: str, session_id: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        run one user turn and yield progress events as they happen:
+          {"type": "tool_start", "name", "input"} / {"type": "tool_end", "name"}
+          {"type": "token", "node", "text"}  answer tokens of the expert agents and the none path
+          {"type": "final", "text", "agent", "agent_path", "agent_latency_ms", "cached", "ttft_ms", "total_ms"}  always last
+        """
+        if self.app is None:
+            await self.start()
+        started = time.perf_counter()
+        import telemetry
+        tracer = telemetry.turn_tracer(session_id, user_query)
+        history = self._history(session_id)
+        use_cache = self._uses_answer_cache(user_query, history)
+        if use_cache:
+            cached = self.answer_cache.lookup(user_query)
+            if cached is not None:
+                await self._remember(session_id, user_query, cached["answer"])
+                if tracer is not None:
+                    tracer.finish({"current_agent": cached["agent"]}, cached=True)
+                elapsed = (time.perf_counter() - started) * 1000
+                yield {"type": "final", "text": cached["answer"], "agent": cached["agent"], "agent_path": "answer_cache",
+                       "agent_latency_ms": 0.0, "cached": True, "ttft_ms": elapsed, "total_ms": elapsed}
+                return
+
+        ttft_ms = None
+        result = None
+        # run_id -> text of a tool-calling node's generation, held back until we know it is not a tool call
+        held = {}
+        async for event in self.app.astream_events(create_initial_state(user_query, history), config=telemetry.run_config(tracer), version="v2"):
+            kind = event["event"]
+            node = graph_node(event.get("metadata", {}))
+            if kind == "on_chat_model_stream" and node in STREAMED_NODES:
+                text = event["data"]["chunk"].content
+                if text and node in TOOL_CALLING_NODES:
+                    held.setdefault(event["run_id"], []).append(text)
+                elif text:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                    yield {"type": "token", "node": node, "text": text}
+            elif kind == "on_chat_model_end" and event["run_id"] in held:
+                texts = held.pop(event["run_id"])
+                # text written before tool calls is the model thinking aloud, not the answer
+                if not getattr(event["data"].get("output"), "tool_calls", None):
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                    for text in texts:
+                        yield {"type": "token", "node": node, "text": text}
+            elif kind == "on_tool_start":
+                yield {"type": "tool_start", "name": event["name"], "input": event["data"].get("input")}
+            elif kind == "on_tool_end":
+                yield {"type": "tool_end", "name": event["name"]}
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                result = event["data"]["output"]
+
+        total_ms = (time.perf_counter() - started) * 1000
+        if tracer is not None:
+            tracer.finish(result, ttft_ms=ttft_ms)
+        if use_cache:
+            self._store_answer(user_query, result)
+        await self._remember(session_id, user_query, result["agent_response"])
+        yield {"type": "final", "text": result["agent_response"], "agent": result["current_agent"],
+               "agent_path": result.get("agent_path", ""), "agent_latency_ms": result.get("agent_latency_ms", 0.0),
+               "cached": False, "ttft_ms": ttft_ms if ttft_ms is not None else total_ms, "total_ms": total_ms}
+
+    async def aclose(self):
+        """release agent resources; start() may be called again afterwards"""
+        async with self._start_lock:
+            if self.app is None:
+                return
+            if self._warmup is not None:
+                self._warmup.cancel()
+                await asyncio.gather(self._warmup, return_exceptions=True)
+                self._warmup = None
+            graphql_agent = self.graphql_agent.instance if isinstance(self.graphql_agent, LazyAgent) else self.graphql_agent
+            if hasattr(graphql_agent, "aclose"):
+                await graphql_agent.aclose()
+            if self.answer_cache is not None:
+                self.answer_cache.save()
+            if self.memory is not None:
+                self.memory.close()
+            self.app = None
+            self.loop = None
+
+    async def __aenter__(self) -> "ChatbotRuntime":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+# default runtime and its private event loop, shared by the sync wrapper
+_runtime: Optional[ChatbotRuntime] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def get_runtime() -> ChatbotRuntime:
+    """return the process-wide default runtime"""
+    global _runtime
+    if _runtime is None:
+        from answer_cache import AnswerCache
+        from memory import ConversationMemory
+        _runtime = ChatbotRuntime(answer_cache=AnswerCache.from_env(), memory=ConversationMemory())
+    return _runtime
+
+async def process_user_input_async(user_query: str, runtime: Optional[ChatbotRuntime] = None, session_id: Optional[str] = None) -> str:
+    """异步处理用户输入并返回响应"""
+    runtime = runtime or get_runtime()
+    return await runtime.ainvoke(user_query, session_id)
+
+async def stream_user_input_async(user_query: str, runtime: Optional[ChatbotRuntime] = None, session_id: Optional[str] = None) -> AsyncIterator[dict]:
+    """流式处理用户输入，逐个产出工具调用进度和回答 token（事件格式见 ChatbotRuntime.astream）"""
+    runtime = runtime or get_runtime()
+    async for event in runtime.astream(user_query, session_id):
+        yield event
 
 def process_user_input(user_query: str) -> str:
-    """同步包装器，用于处理用户输入"""
-    return asyncio.run(process_user_input_async(user_query))
+    """同步包装器，用于处理用户输入（所有轮次复用同一个事件循环和 runtime）"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(process_user_input_async(user_query))
+
+def close():
+    """close the default runtime and its event loop"""
+    global _runtime, _loop
+    if _loop is None:
+        return
+    if _runtime is not None:
+        _loop.run_until_complete(_runtime.aclose())
+        _runtime = None
+    from llm import aclose_http_clients
+    _loop.run_until_complete(aclose_http_clients())
+    _loop.close()
+    _loop = None
@@ -1,17 +1,23 @@
+import asyncio
 import os
-from typing import List, TypedDict, Annotated, Optional, Dict, Any
+import time
+from contextlib import aclosing
+from typing import List, TypedDict, Annotated, Optional, Dict, Any, Tuple
 
 from dotenv import load_dotenv
 from langchain.schema import BaseMessage
-from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import create_react_agent
 from langchain.schema import HumanMessage, SystemMessage, AIMessage
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_core.messages import ToolMessage
+from langgraph.errors import GraphRecursionError
+from mcp_transport import PersistentMCPSession, load_inprocess_tools
+from llm import get_chat_model
 
 load_dotenv()
 
 GRAPHQL_ENDPOINT = "https://graph.web3.bio/graphql"
 
+BUDGET_NAMES = {"iterations": "迭代次数", "time": "时间", "tokens": "token"}
+
 
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], "conversation history"]
@@ -22,37 +28,75 @@ class AgentState(TypedDict):
     graphql_query: Annotated[Optional[str], "generated GraphQL query"]
     query_result: Annotated[Optional[Dict[str, Any]], "GraphQL query result"]
     query_error: Annotated[Optional[str], "GraphQL query error"]
+    agent_path: Annotated[str, "how the expert agent answered: template or react"]
+    agent_latency_ms: Annotated[float, "time spent in the expert agent"]
+    budget_usage: Annotated[Optional[Dict[str, Any]], "iterations, tokens and time used by the ReAct loop"]
 
 
 class ReactGraphQLAgent:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4.1-mini",
-            base_url=os.getenv("BASE_URL"),
-            api_key=os.getenv("OPENAI_API_KEY"),
-        )
+    def __init__(
+        self,
+        llm=None,
+        max_iterations: Optional[int] = None,
+        max_seconds: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        mcp_url: Optional[str] = None,
+        transport: Optional[str] = None,
+    ):
+        # per-turn budgets of the ReAct loop
+        self.max_iterations = max_iterations or int(os.getenv("GRAPHQL_AGENT_MAX_ITERATIONS", "8"))
+        self.max_seconds = max_seconds or float(os.getenv("GRAPHQL_AGENT_MAX_SECONDS", "30"))
+        self.max_tokens = max_tokens or int(os.getenv("GRAPHQL_AGENT_MAX_TOKENS", "30000"))
+
+        self._llm = llm
         
-        self.client = MultiServerMCPClient({
-            "relate-account": {
-                "transport": "streamable_http",
-                "url": "http://127.0.0.1:8000/mcp"
-            }
-        })
+        # "http": one persistent session to the MCP server; "inprocess": call the server's tools directly
+        self.transport = transport or os.getenv("MCP_TRANSPORT", "http")
+        if self.transport not in ("http", "inprocess"):
+            raise ValueError(f"Unknown MCP transport '{self.transport}', expected http or inprocess")
+        self.mcp_url = mcp_url or os.getenv("MCP_SERVER_URL", "http://127.0.0.1:8000/mcp")
+        self._client = None
+        self.session: Optional[PersistentMCPSession] = None
         
         self.tools = None
         self.agent = None
         self.agent_executor = None
         self._initialized = False
 
+    @property
+    def llm(self):
+        return self._llm or get_chat_model("gpt-4.1-mini")
+
+    @property
+    def client(self):
+        # langchain_mcp_adapters pulls in the whole mcp SDK, import it when a session is first opened
+        if self._client is None:
+            from langchain_mcp_adapters.client import MultiServerMCPClient
+
+            self._client = MultiServerMCPClient({
+                "relate-account": {
+                    "transport": "streamable_http",
+                    "url": self.mcp_url
+                }
+            })
+        return self._client
+
     async def _initialize(self):
         """Async initialize agent and tools"""
-        if self._initialized:
+        # a dropped MCP session (e.g. the server restarted) is opened again
+        if self._initialized and (self.session is None or self.session.alive):
             return
-            
-        self.tools = await self.client.get_tools()
+
+        if self.transport == "inprocess":
+            self.tools = await load_inprocess_tools()
+        else:
+            self.session = self.session or PersistentMCPSession(self.client, "relate-account")
+            self.tools = await self.session.start()
 
         
         # Create ReAct agent
+        from langgraph.prebuilt import create_react_agent
+
         self.agent = create_react_agent(
             model=self.llm,
             tools=self.tools,
@@ -60,7 +104,72 @@ class ReactGraphQLAgent:
         
         self._initialized = True
 
+    async def aclose(self):
+        """Drop the cached tools and agent, the next run() initializes again"""
+        if self.session is not None:
+            await self.session.aclose()
+        self.tools = None
+        self.agent = None
+        self._initialized = False
+
+    async def _run_with_budget(self, messages: List[BaseMessage]) -> Tuple[List[BaseMessage], Dict[str, Any]]:
+        """
+        Run the ReAct loop until it answers or a budget runs out. Tool calls
+        emitted in the same step run concurrently (ToolNode gathers them), and
+        leaving the time budget cancels the ones still in flight.
+        Returns the messages added in this turn; the history passed in does
+        not count against the budgets.
+        """
+        usage = {"iterations": 0, "tokens": 0, "elapsed_ms": 0.0, "exhausted": None}
+        start = len(messages)
+        latest = messages
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.max_seconds):
+                # the recursion limit is a backstop, the iteration check below stops first
+                stream = self.agent.astream(
+                    {"messages": messages},
+                    config={"recursion_limit": 2 * self.max_iterations + 2},
+                    stream_mode="values",
+                )
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        latest = chunk["messages"]
+                        ai_messages = [m for m in latest[start:] if isinstance(m, AIMessage)]
+                        usage["iterations"] = len(ai_messages)
+                        usage["tokens"] = sum((m.usage_metadata or {}).get("total_tokens", 0) for m in ai_messages)
+                        pending_tools = isinstance(latest[-1], AIMessage) and bool(latest[-1].tool_calls)
+                        if not pending_tools:
+                            continue
+                        if usage["tokens"] >= self.max_tokens:
+                            usage["exhausted"] = "tokens"
+                            break
+                        if usage["iterations"] >= self.max_iterations:
+                            usage["exhausted"] = "iterations"
+                            break
+        except TimeoutError:
+            usage["exhausted"] = "time"
+        except GraphRecursionError:
+            usage["exhausted"] = "iterations"
+        usage["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        return latest[start:], usage
+
+    @staticmethod
+    def _best_answer(messages: List[BaseMessage], exhausted: Optional[str]) -> str:
+        """the final answer, or the most useful partial one when a budget ran out, from the messages of this turn"""
+        final_msg = next((msg for msg in reversed(messages) if isinstance(msg, AIMessage) and msg.content), None)
+        if exhausted is None:
+            return final_msg.content if final_msg is not None else ""
+        note = f"（已达到本轮{BUDGET_NAMES[exhausted]}预算，以下为部分结果）"
+        if final_msg is not None:
+            return f"{note}\n{final_msg.content}"
+        tool_msg = next((msg for msg in reversed(messages) if isinstance(msg, ToolMessage)), None)
+        if tool_msg is not None:
+            return f"{note}\n{str(tool_msg.content)[:2000]}"
+        return f"{note}\n抱歉，在预算内没有得到结果。"
+
     async def run(self, state: AgentState) -> AgentState:
+        started = time.perf_counter()
         try:
             # Ensure initialized
             await self._initialize()
@@ -69,6 +178,7 @@ class ReactGraphQLAgent:
             system_prompt = """
               You are a helpful data assistant that translates natural language questions into GraphQL queries. 
               You could use the tools provided to get the query schema which can help you build the query statement.
+              Start from the schema overview, then look up only the types and fields you need with describe-type and find-field-path.
               
               You should:
                 1. Understand what data the user is asking for
@@ -77,21 +187,21 @@ class ReactGraphQLAgent:
 
               all above steps could be done with the tools provided.
               
+              When several tool calls do not depend on each other, request them in the same step so they run in parallel.
               Be precise and focused in your responses.
               
             """
 
             initial_msg = [
                 SystemMessage(content=system_prompt),
+                *(state.get("messages") or []),
                 HumanMessage(content=state["user_query"])
             ]
             
-            # Use agent executor to process query
-            result = await self.agent.ainvoke({
-                "messages": initial_msg
-            })
-            messages = result["messages"]
-            state["agent_response"] = next((msg for msg in reversed(messages) if isinstance(msg, AIMessage)), None)
+            # Run the ReAct loop within the per-turn budgets
+            messages, usage = await self._run_with_budget(initial_msg)
+            state["agent_response"] = self._best_answer(messages, usage["exhausted"])
+            state["budget_usage"] = usage
             
         except Exception as e:
             error_msg = f"处理查询时发生错误: {str(e)}"
@@ -100,4 +210,6 @@ class ReactGraphQLAgent:
                 "query_error": str(e)
             })
         
+        state["agent_path"] = "react"
+        state["agent_latency_ms"] = (time.perf_counter() - started) * 1000
         return state
@@ -0,0 +1,89 @@
+import time
+from typing import List, TypedDict, Annotated, Optional
+
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain.schema import BaseMessage
+
+class AgentState(TypedDict):
+    messages: Annotated[List[BaseMessage], "conversation history"]
+    current_agent: Annotated[str, "current agent name"]
+    user_query: Annotated[str, "user query"]
+    agent_response: Annotated[str, "agent response"]
+    route_platform: Annotated[Optional[str], "platform extracted by the router"]
+    route_identity: Annotated[Optional[str], "identity extracted by the router"]
+    agent_path: Annotated[str, "how the expert agent answered: template or react"]
+    agent_latency_ms: Annotated[float, "time spent in the expert agent"]
+    query_error: Annotated[Optional[str], "GraphQL query error"]
+
+LOOKUP_TOOL = "lookup-identity"
+
+class IdentityLookupAgent:
+    """
+    Answers "which identities are linked to X on platform Y" with the fixed
+    IDENTITY_QUERY template (the lookup-identity MCP tool) and a single
+    summarization call, instead of the multi-step ReAct loop. Anything the
+    template cannot serve is handed to the ReAct GraphQL agent.
+    """
+
+    def __init__(self, graphql_agent, llm=None):
+        # share the ReAct agent's MCP client and chat model
+        self.graphql_agent = graphql_agent
+        self._llm = llm
+
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", """You are a web3 identity assistant backed by web3.bio.
+            Answer the user's question using only the identity data below, which is the web3.bio profile of the identity and its identity graph (the linked identities on other platforms).
+            Be precise and focused. If the data does not contain the answer, say so.
+
+            Identity data:
+            {identity_data}
+            """),
+            MessagesPlaceholder("history", optional=True),
+            ("human", "{user_query}")
+        ])
+
+    @property
+    def llm(self):
+        return self._llm or self.graphql_agent.llm
+
+    async def _lookup_tool(self):
+        await self.graphql_agent._initialize()
+        return next((t for t in self.graphql_agent.tools if t.name == LOOKUP_TOOL), None)
+
+    async def run(self, state: AgentState) -> AgentState:
+        started = time.perf_counter()
+        platform = state.get("route_platform")
+        identity = state.get("route_identity")
+
+        result = None
+        tool = None
+        if platform and identity:
+            try:
+                tool = await self._lookup_tool()
+            except Exception as e:
+                # the ReAct agent retries the connection and reports the error in the answer
+                print(f"MCP tools unavailable, falling back to the ReAct agent: {e}")
+        if tool is not None:
+            try:
+                result = await tool.ainvoke({"platform": platform, "identity": identity})
+            except Exception as e:
+                print(f"{LOOKUP_TOOL} failed, falling back to the ReAct agent: {e}")
+        if isinstance(result, list):
+            # MCP tools return content blocks
+            result = "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in result)
+
+        if not result or result.startswith("查询执行失败"):
+            state = await self.graphql_agent.run(state)
+            state["agent_latency_ms"] = (time.perf_counter() - started) * 1000
+            return state
+
+        response = await self.llm.ainvoke(
+            self.prompt.format_messages(
+                identity_data=result, user_query=state["user_query"], history=state.get("messages") or []
+            )
+        )
+        state["agent_response"] = response.content
+        state["current_agent"] = "identity_agent"
+        state["agent_path"] = "template"
+        state["agent_latency_ms"] = (time.perf_counter() - started) * 1000
+        return state
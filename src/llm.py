@@ -0,0 +1,67 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+# (model, base_url) -> chat model, shared by every agent that asks for the same model
+_models: Dict[Tuple[str, Optional[str]], object] = {}
+_models_lock = threading.Lock()
+
+def _limits() -> httpx.Limits:
+    pool_size = int(os.getenv("LLM_POOL_SIZE", "50"))
+    return httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(float(os.getenv("LLM_TIMEOUT", "60")), connect=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")))
+
+def shared_http_client() -> httpx.Client:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.Client(limits=_limits(), timeout=_timeout())
+    return _http_client
+
+def shared_http_async_client() -> httpx.AsyncClient:
+    """one keep-alive pool for every chat model, so concurrent turns reuse open connections to the provider"""
+    global _http_async_client
+    if _http_async_client is None or _http_async_client.is_closed:
+        _http_async_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+    return _http_async_client
+
+def create_chat_model(model: str, base_url: Optional[str] = None):
+    """a new ChatOpenAI on `base_url` (BASE_URL by default) that uses the shared HTTP pools"""
+    # langchain_openai (and the openai SDK) take a while to import, load them on first use
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model,
+        base_url=base_url or os.getenv("BASE_URL"),
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=shared_http_client(),
+        http_async_client=shared_http_async_client(),
+    )
+
+def get_chat_model(model: str, base_url: Optional[str] = None):
+    """the shared chat model for `model` on `base_url`, created on first request"""
+    key = (model, base_url or os.getenv("BASE_URL"))
+    with _models_lock:
+        chat_model = _models.get(key)
+        if chat_model is None:
+            chat_model = _models[key] = create_chat_model(model, key[1])
+    return chat_model
+
+async def aclose_http_clients():
+    """close the shared pools; chat models handed out before are dropped with them"""
+    global _http_client, _http_async_client
+    _models.clear()
+    if _http_async_client is not None:
+        await _http_async_client.aclose()
+        _http_async_client = None
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
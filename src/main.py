@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 
-from chatbot import process_user_input
+import asyncio
 
-def main():
+from chatbot import ChatbotRuntime
+from answer_cache import AnswerCache
+from memory import ConversationMemory
+
+async def amain():
     print("Mutil-agent Chatbot")
     print("=" * 50)
     print("Supported Features:")
@@ -11,31 +15,57 @@ def main():
     print("- Input 'quit' or 'exit' to quit")
     print("=" * 50)
     
-    while True:
-        try:
-            # get user input
-            user_input = input("\n User: ").strip()
-            
-            # check exit command
-            if user_input.lower() in ['quit', 'exit']:
-                print("bye")
+    # build the graph once, every turn below reuses it
+    runtime = ChatbotRuntime(answer_cache=AnswerCache.from_env(), memory=ConversationMemory())
+    # show the prompt right away, the first turn waits for start() if it is still running
+    startup = asyncio.ensure_future(runtime.start())
+    
+    try:
+        while True:
+            try:
+                # get user input without blocking the event loop
+                user_input = (await asyncio.to_thread(input, "\n User: ")).strip()
+                
+                # check exit command
+                if user_input.lower() in ['quit', 'exit']:
+                    print("bye")
+                    break
+                
+                # check empty input
+                if not user_input:
+                    print("Please enter a valid question")
+                    continue
+                
+                # stream tool progress and answer tokens as they arrive
+                print("\n Agent: ", end="", flush=True)
+                streamed = False
+                async for event in runtime.astream(user_input, session_id="cli"):
+                    if event["type"] == "tool_start":
+                        print(f"\n   [calling {event['name']}]", end="", flush=True)
+                    elif event["type"] == "token":
+                        if not streamed:
+                            print("\n ", end="")
+                            streamed = True
+                        print(event["text"], end="", flush=True)
+                    elif event["type"] == "final":
+                        if not streamed:
+                            print(event["text"], end="")
+                        print(f"\n   (first token {event['ttft_ms']:.0f} ms, total {event['total_ms']:.0f} ms)")
+                
+            except (KeyboardInterrupt, EOFError):
+                print("\n   BYE!")
                 break
-            
-            # check empty input
-            if not user_input:
-                print("Please enter a valid question")
-                continue
-            
-            # process user input
-            print("\n Agent is thinking...")
-            response = process_user_input(user_input)
-            print(f" Agent: {response}")
-            
-        except KeyboardInterrupt:
-            print("\n   BYE!")
-            break
-        except Exception as e:
-            print(f"    Error: {e}")
+            except Exception as e:
+                print(f"    Error: {e}")
+    finally:
+        await asyncio.gather(startup, return_exceptions=True)
+        await runtime.aclose()
+
+def main():
+    try:
+        asyncio.run(amain())
+    except KeyboardInterrupt:
+        print("\n   BYE!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
@@ -0,0 +1,104 @@
+import asyncio
+import importlib
+import os
+import sys
+from typing import TYPE_CHECKING, List, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+if TYPE_CHECKING:
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools")
+
+
+def import_tool_server():
+    """
+    import the relate-account MCP server (tools/server.py) into this process.
+    Its modules import each other by bare name, so tools/ goes on sys.path;
+    `metrics` is aliased to tools.metrics so both sides share one registry.
+    """
+    if TOOLS_DIR not in sys.path:
+        sys.path.append(TOOLS_DIR)
+    sys.modules.setdefault("metrics", importlib.import_module("tools.metrics"))
+    return importlib.import_module("server")
+
+
+def _text(result) -> str:
+    return "\n".join(block.text for block in result.content if getattr(block, "text", None) is not None)
+
+
+def _as_langchain_tool(tool) -> BaseTool:
+    """wrap a FastMCP tool so the agent calls it directly: same argument validation, no JSON-RPC"""
+
+    async def call(**arguments) -> str:
+        return _text(await tool.run(arguments))
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description or "",
+        args_schema=tool.parameters,
+        coroutine=call,
+    )
+
+
+async def load_inprocess_tools() -> List[BaseTool]:
+    server = import_tool_server()
+    tools = await server.mcp.get_tools()
+    return [_as_langchain_tool(tool) for tool in tools.values()]
+
+
+class PersistentMCPSession:
+    """
+    One MCP session kept open for the life of the agent, instead of the
+    session per tool call that MultiServerMCPClient.get_tools() tools open.
+    The session lives in its own task because its transport (anyio task
+    groups) must be entered and exited by the same task.
+    """
+
+    def __init__(self, client: "MultiServerMCPClient", server_name: str):
+        self.client = client
+        self.server_name = server_name
+        self._task: Optional[asyncio.Task] = None
+        self._closed: Optional[asyncio.Event] = None
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> List[BaseTool]:
+        """open the session and return tools bound to it"""
+        await self.aclose()
+        self._closed = asyncio.Event()
+        ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._hold(ready, self._closed))
+        return await ready
+
+    async def _hold(self, ready: asyncio.Future, closed: asyncio.Event):
+        from langchain_mcp_adapters.tools import load_mcp_tools
+
+        try:
+            async with self.client.session(self.server_name) as session:
+                ready.set_result(await load_mcp_tools(session))
+                await closed.wait()
+        except asyncio.CancelledError:
+            ready.cancel()
+            raise
+        except Exception as e:
+            # surface the connection error instead of the task group wrapping it
+            while isinstance(e, ExceptionGroup) and len(e.exceptions) == 1:
+                e = e.exceptions[0]
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"MCP session to {self.server_name} closed: {e}")
+
+    async def aclose(self):
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        self._closed.set()
+        try:
+            await asyncio.wait_for(task, timeout=5)
+        except Exception:
+            task.cancel()
@@ -0,0 +1,224 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Optional, TypedDict
+
+# langchain is imported on first use, not on the CLI's startup path
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "conversations.sqlite3")
+
+def estimate_tokens(text: str) -> int:
+    """cheap token estimate: ~4 ASCII characters per token, one token per other character (e.g. CJK)"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+def messages_tokens(messages: List["BaseMessage"]) -> int:
+    return sum(estimate_tokens(str(m.content)) for m in messages)
+
+class SessionRecord(TypedDict):
+    summary: str
+    messages: List["BaseMessage"]
+
+class ConversationStore:
+    """where session history lives; subclasses decide durability and eviction"""
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        raise NotImplementedError
+
+    def save(self, session_id: str, record: SessionRecord):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class InMemoryConversationStore(ConversationStore):
+    """process-local sessions; least recently used and idle sessions are evicted"""
+
+    def __init__(self, max_sessions: Optional[int] = None, idle_ttl: Optional[float] = None):
+        self.max_sessions = max_sessions or int(os.getenv("MEMORY_MAX_SESSIONS", "1000"))
+        self.idle_ttl = idle_ttl or float(os.getenv("MEMORY_IDLE_TTL", "3600"))
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - last_used <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        self._evict()
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        self._sessions[session_id] = (time.monotonic(), entry[1])
+        self._sessions.move_to_end(session_id)
+        return {"summary": entry[1]["summary"], "messages": list(entry[1]["messages"])}
+
+    def save(self, session_id: str, record: SessionRecord):
+        self._sessions[session_id] = (time.monotonic(), record)
+        self._sessions.move_to_end(session_id)
+        self._evict()
+
+    def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+class SqliteConversationStore(ConversationStore):
+    """durable sessions in a SQLite file; sessions idle longer than idle_ttl are purged"""
+
+    def __init__(self, path: Optional[str] = None, idle_ttl: Optional[float] = None):
+        self.path = path or os.getenv("MEMORY_SQLITE_PATH", DEFAULT_SQLITE_PATH)
+        self.idle_ttl = idle_ttl or float(os.getenv("MEMORY_IDLE_TTL", str(30 * 24 * 3600)))
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.idle_ttl,))
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # (re)opened on demand so the store survives a runtime aclose()/start() cycle
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        return self._conn
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary, messages, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or time.time() - row[2] > self.idle_ttl:
+            return None
+        from langchain_core.messages import messages_from_dict
+        return {"summary": row[0], "messages": messages_from_dict(json.loads(row[1]))}
+
+    def save(self, session_id: str, record: SessionRecord):
+        from langchain_core.messages import messages_to_dict
+        payload = json.dumps(messages_to_dict(record["messages"]), ensure_ascii=False, separators=(",", ":"))
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO sessions (session_id, summary, messages, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, "
+                "messages = excluded.messages, updated_at = excluded.updated_at",
+                (session_id, record["summary"], payload, time.time()),
+            )
+
+    def delete(self, session_id: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def create_conversation_store(backend: Optional[str] = None) -> ConversationStore:
+    backend = backend or os.getenv("MEMORY_BACKEND", "memory")
+    if backend == "sqlite":
+        return SqliteConversationStore()
+    if backend == "memory":
+        return InMemoryConversationStore()
+    raise ValueError(f"Unknown MEMORY_BACKEND '{backend}', expected memory or sqlite")
+
+SUMMARY_PROMPT = """请把下面的对话压缩成一段简短的摘要，保留后续对话可能用到的事实（身份、地址、平台、城市、用户的偏好等），不要添加新信息。
+
+已有摘要:
+{summary}
+
+新的对话:
+{transcript}
+"""
+
+class ConversationMemory:
+    """
+    Session-scoped history for the chatbot graph.
+
+    The newest `window` messages are kept verbatim. Once the stored history
+    exceeds `summary_threshold` tokens, everything older is folded into a
+    rolling summary by the `summarizer` model. `max_tokens` is a hard cap on
+    what a session keeps (oldest messages go first) and `max_message_chars`
+    caps any single stored message, so per-turn prompt size stays flat.
+    """
+
+    def __init__(
+        self,
+        store: Optional[ConversationStore] = None,
+        summarizer=None,
+        window: Optional[int] = None,
+        summary_threshold: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        max_message_chars: Optional[int] = None,
+    ):
+        self.store = store if store is not None else create_conversation_store()
+        self.summarizer = summarizer
+        self.window = window or int(os.getenv("MEMORY_WINDOW_MESSAGES", "6"))
+        self.summary_threshold = summary_threshold or int(os.getenv("MEMORY_SUMMARY_THRESHOLD_TOKENS", "1500"))
+        self.max_tokens = max_tokens or int(os.getenv("MEMORY_MAX_TOKENS", "3000"))
+        self.max_message_chars = max_message_chars or int(os.getenv("MEMORY_MAX_MESSAGE_CHARS", "2000"))
+
+    def history(self, session_id: str) -> List["BaseMessage"]:
+        """messages to put in front of the next turn: the rolling summary, then the recent window"""
+        record = self.store.load(session_id)
+        if record is None:
+            return []
+        from langchain_core.messages import SystemMessage
+        prefix = [SystemMessage(content=f"之前对话的摘要: {record['summary']}")] if record["summary"] else []
+        return prefix + record["messages"]
+
+    async def append_turn(self, session_id: str, user_query: str, answer: str):
+        from langchain_core.messages import AIMessage, HumanMessage
+        record = self.store.load(session_id) or {"summary": "", "messages": []}
+        messages = record["messages"] + [
+            HumanMessage(content=user_query[: self.max_message_chars]),
+            AIMessage(content=answer[: self.max_message_chars]),
+        ]
+        summary = record["summary"]
+
+        if messages_tokens(messages) + estimate_tokens(summary) > self.summary_threshold and len(messages) > self.window:
+            older, messages = messages[: -self.window], messages[-self.window:]
+            summary = await self._summarize(summary, older)
+
+        # hard cap, whatever the summarizer produced
+        while len(messages) > 2 and messages_tokens(messages) + estimate_tokens(summary) > self.max_tokens:
+            messages = messages[2:]
+        summary = summary[: self.max_message_chars]
+
+        self.store.save(session_id, {"summary": summary, "messages": messages})
+
+    async def _summarize(self, summary: str, older: List["BaseMessage"]) -> str:
+        from langchain_core.messages import HumanMessage
+        transcript = "\n".join(
+            f"{'用户' if isinstance(m, HumanMessage) else '助手'}: {m.content}" for m in older
+        )
+        if self.summarizer is None:
+            # no model available: keep the tail of the transcript as a crude summary
+            return (summary + "\n" + transcript)[-self.max_message_chars:]
+        response = await self.summarizer.ainvoke(SUMMARY_PROMPT.format(summary=summary or "（无）", transcript=transcript))
+        return str(response.content)
+
+    def reset(self, session_id: str):
+        self.store.delete(session_id)
+
+    def close(self):
+        self.store.close()
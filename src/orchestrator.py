@@ -1,11 +1,15 @@
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.output_parsers import JsonOutputToolsParser
-from langchain.schema import BaseMessage
-from typing import List, TypedDict, Annotated
+from langchain.schema import BaseMessage, HumanMessage
+from typing import List, TypedDict, Annotated, Optional, Dict, Any
+import operator
 import os
+import re
 from dotenv import load_dotenv
 import json
+from langgraph.types import Send
+from router import RouteDecision, classify_query, split_compound_query
+from llm import get_chat_model
 
 load_dotenv()
 
@@ -14,14 +18,64 @@ class AgentState(TypedDict):
     current_agent: Annotated[str, "current agent name"]
     user_query: Annotated[str, "user query"]
     agent_response: Annotated[str, "agent response"]
+    route_source: Annotated[str, "who made the routing decision: rule or llm"]
+    route_confidence: Annotated[float, "confidence of the routing decision"]
+    query_error: Annotated[Optional[str], "error raised while the expert agent handled the query"]
+    route_platform: Annotated[Optional[str], "platform extracted by the router"]
+    route_identity: Annotated[Optional[str], "identity extracted by the router"]
+    agent_path: Annotated[str, "how the expert agent answered: template or react"]
+    agent_latency_ms: Annotated[float, "time spent in the expert agent"]
+    budget_usage: Annotated[Optional[Dict[str, Any]], "iterations, tokens and time used by the ReAct loop"]
+    sub_tasks: Annotated[List[Dict[str, Any]], "parts of a compound query, one per expert agent"]
+    agent_results: Annotated[List[Dict[str, Any]], "answers of the sub-tasks, merged by format_response", operator.add]
+
+AGENT_NAMES = ("weather_agent", "graphql_agent", "none")
+SUB_TASK_AGENTS = ("weather_agent", "graphql_agent")
+JSON_OBJECT_RE = re.compile(r"\{.*?\}", re.DOTALL)
+JSON_DOCUMENT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+def parse_route(content: str) -> Optional[str]:
+    """extract agent_name from the router LLM reply, tolerating code fences and surrounding text"""
+    match = JSON_OBJECT_RE.search(content or "")
+    if match is None:
+        return None
+    try:
+        agent_name = json.loads(match.group(0)).get("agent_name")
+    except (json.JSONDecodeError, AttributeError):
+        return None
+    return agent_name if agent_name in AGENT_NAMES else None
+
+def parse_tasks(content: str) -> Optional[List[Dict[str, str]]]:
+    """the sub-tasks of a {"agent_name": "multi", "tasks": [...]} reply, None for single-agent replies"""
+    match = JSON_DOCUMENT_RE.search(content or "")
+    if match is None:
+        return None
+    try:
+        tasks = json.loads(match.group(0)).get("tasks")
+    except (json.JSONDecodeError, AttributeError):
+        return None
+    if not isinstance(tasks, list):
+        return None
+    tasks = [
+        {"agent_name": t["agent_name"], "query": str(t["query"])}
+        for t in tasks
+        if isinstance(t, dict) and t.get("agent_name") in SUB_TASK_AGENTS and t.get("query")
+    ]
+    return tasks if len(tasks) > 1 else None
+
+def sub_task(query: str, decision: Optional[RouteDecision], agent_name: str) -> Dict[str, Any]:
+    """one part of a compound query; a single known identity goes to the IDENTITY_QUERY template"""
+    if decision is not None and decision.agent_name == "graphql_agent" and decision.platform and decision.identity:
+        return {"agent": "identity_agent", "query": query, "platform": decision.platform, "identity": decision.identity}
+    return {"agent": agent_name, "query": query, "platform": None, "identity": None}
 
 class Orchestrator:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            base_url=os.getenv("BASE_URL"),
-            api_key=os.getenv("OPENAI_API_KEY"),
-        )
+    def __init__(self, llm=None, fast_path: bool = True, min_confidence: Optional[float] = None):
+        # route confidently classifiable queries locally, without the LLM round trip
+        self.fast_path = fast_path
+        self.min_confidence = min_confidence if min_confidence is not None else float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.8"))
+        # the chat model is created on the first LLM-routed turn, rule-routed turns never need it
+        self._llm = llm
 
         self.parser = JsonOutputToolsParser()
         self.prompt = ChatPromptTemplate.from_messages([
@@ -41,48 +95,104 @@ class Orchestrator:
             {{"agent_name": "graphql_agent"}}
 
             如果查询不匹配任何agent，返回: {{"agent_name": "none"}}
+
+            如果一个问题同时需要多个agent（例如既问天气又查询身份），把它拆成子任务，每个子任务是一个可以单独回答的问题:
+            {{"agent_name": "multi", "tasks": [{{"agent_name": "weather_agent", "query": "上海今天天气怎么样"}}, {{"agent_name": "graphql_agent", "query": "vitalik.eth 有哪个 Farcaster 账号"}}]}}
             """),
+            MessagesPlaceholder("history", optional=True),
             ("human", "{user_query}")
         ])
 
-    def route_query(self, state: AgentState) -> AgentState:
+    @property
+    def llm(self):
+        return self._llm or get_chat_model("gpt-4o-mini")
+
+    async def route_query(self, state: AgentState) -> AgentState:
         """indent detect and routing"""
         user_query = state["user_query"]
         
+        if self.fast_path:
+            decision = classify_query(user_query)
+            if decision is not None and decision.confidence >= self.min_confidence:
+                state["current_agent"] = decision.agent_name
+                if decision.agent_name == "graphql_agent" and decision.platform and decision.identity:
+                    # a single known identity: the IDENTITY_QUERY template answers it without the ReAct loop
+                    state["current_agent"] = "identity_agent"
+                    state["route_platform"] = decision.platform
+                    state["route_identity"] = decision.identity
+                state["route_source"] = "rule"
+                state["route_confidence"] = decision.confidence
+                return state
+            
+            # a compound question: run one sub-task per agent in parallel
+            parts = split_compound_query(user_query)
+            if parts is not None and all(d.confidence >= self.min_confidence for _, d in parts):
+                state["current_agent"] = "multi"
+                state["sub_tasks"] = [sub_task(text, d, d.agent_name) for text, d in parts]
+                state["route_source"] = "rule"
+                state["route_confidence"] = min(d.confidence for _, d in parts)
+                return state
+        
         # use LLM to analyze query and decide routing
-        response = self.llm.invoke(
-            self.prompt.format_messages(user_query=user_query)
+        response = await self.llm.ainvoke(
+            self.prompt.format_messages(user_query=user_query, history=state.get("messages") or [])
         )
         
-        try:
-            # try to parse json response
-            decision = json.loads(response.content)
-            agent_name = decision.get("agent_name", "none")
-        except:
-            # if parse failed, default to none
-            agent_name = "none"
+        tasks = parse_tasks(response.content)
+        if tasks is not None:
+            state["current_agent"] = "multi"
+            state["sub_tasks"] = [sub_task(t["query"], classify_query(t["query"]), t["agent_name"]) for t in tasks]
+            state["route_source"] = "llm"
+            state["route_confidence"] = 1.0
+            return state
+        
+        agent_name = parse_route(response.content)
+        if agent_name is None:
+            print(f"Unparseable routing decision, falling back to none: {response.content!r}")
         
         # update state
-        state["current_agent"] = agent_name
+        state["current_agent"] = agent_name or "none"
+        state["route_source"] = "llm"
+        state["route_confidence"] = 1.0 if agent_name else 0.0
         
         return state
 
-    def should_continue(self, state: AgentState) -> str:
-        """decide next step"""
+    def should_continue(self, state: AgentState):
+        """decide next step; a compound query fans out to one subtask node per part"""
         current_agent = state["current_agent"]
         
+        if current_agent == "multi":
+            return [
+                Send("subtask", {"task": {**task, "index": n}, "messages": state.get("messages") or []})
+                for n, task in enumerate(state["sub_tasks"])
+            ]
         if current_agent == "weather_agent":
             return "weather_agent"
         elif current_agent == "graphql_agent":
             return "graphql_agent"
+        elif current_agent == "identity_agent":
+            return "identity_agent"
         else:
             return "end"
 
-    def format_response(self, state: AgentState) -> AgentState:
+    async def format_response(self, state: AgentState) -> AgentState:
+        if state.get("agent_results"):
+            # answers of the sub-tasks in the order of the question; only the changed keys are returned,
+            # agent_results itself is merged by its reducer
+            results = sorted(state["agent_results"], key=lambda r: r["index"])
+            errors = [r["error"] for r in results if r.get("error")]
+            return {
+                "agent_response": "\n\n".join(r["response"] for r in results if r.get("response")) or "抱歉，我没有找到合适的响应。",
+                "query_error": "; ".join(errors) or None,
+                "agent_latency_ms": max(r["latency_ms"] for r in results),
+                "agent_path": "parallel",
+            }
         if state["current_agent"] == "none":
             # when no suitable agent, use orchestrator's LLM to answer question
-            response = self.llm.invoke(
-                f"用户询问: {state['user_query']}\n\n请直接回答用户的问题，不需要使用任何特定的agent。"
+            response = await self.llm.ainvoke(
+                (state.get("messages") or []) + [
+                    HumanMessage(content=f"用户询问: {state['user_query']}\n\n请直接回答用户的问题，不需要使用任何特定的agent。")
+                ]
             )
             state["agent_response"] = response.content
         else:
@@ -0,0 +1,166 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+from tools.platforms import Platform
+
+class RouteDecision(NamedTuple):
+    agent_name: str
+    confidence: float
+    platform: Optional[str] = None
+    identity: Optional[str] = None
+
+# domain suffix -> platform, longest suffix first
+NAME_SUFFIXES = [
+    (".base.eth", Platform.BASENAMES),
+    (".linea.eth", Platform.LINEA),
+    (".eth", Platform.ENS),
+    (".sol", Platform.SNS),
+    (".lens", Platform.LENS),
+    (".bit", Platform.DOTBIT),
+    (".bnb", Platform.SPACE_ID),
+    (".arb", Platform.SPACE_ID),
+    (".crypto", Platform.UNSTOPPABLEDOMAINS),
+    (".nft", Platform.UNSTOPPABLEDOMAINS),
+    (".x", Platform.UNSTOPPABLEDOMAINS),
+    (".wallet", Platform.UNSTOPPABLEDOMAINS),
+    (".box", Platform.BOX),
+]
+
+NAME_RE = re.compile(
+    r"(?<![\w.-])((?:[a-z0-9][a-z0-9_-]*\.)+(?:" + "|".join(re.escape(s.lstrip(".").split(".")[-1]) for s, _ in NAME_SUFFIXES) + r"))(?![\w-])",
+    re.IGNORECASE,
+)
+EVM_ADDRESS_RE = re.compile(r"\b0x[0-9a-fA-F]{40}\b")
+BITCOIN_ADDRESS_RE = re.compile(r"\b(?:bc1[02-9ac-hj-np-z]{11,71}|[13][1-9A-HJ-NP-Za-km-z]{25,34})\b")
+SOLANA_ADDRESS_RE = re.compile(r"\b[1-9A-HJ-NP-Za-km-z]{32,44}\b")
+HANDLE_RE = re.compile(r"(?<![\w.])@([a-z0-9_][a-z0-9_.-]{0,38}[a-z0-9_])", re.IGNORECASE)
+
+# Platform values that are also ordinary words ("mode", "email", ...) are not a routing signal on their own
+AMBIGUOUS_PLATFORM_WORDS = {
+    "box", "mint", "mode", "email", "dns", "ton", "tron", "zeta", "gravity", "genome",
+    "merlin", "particle", "privy", "stacks", "cosmos", "ckb", "nftd", "taiko", "manta", "tomo",
+}
+PLATFORM_WORD_RE = re.compile(
+    r"\b(" + "|".join(
+        sorted((p.value for p in Platform if p.value not in AMBIGUOUS_PLATFORM_WORDS), key=len, reverse=True)
+    ) + r")\b",
+    re.IGNORECASE,
+)
+IDENTITY_WORDS_RE = re.compile(
+    r"\b(identit(?:y|ies)|account|address|profile|handle|domain|wallet|web3\.bio|owner|resolve[sd]?)\b|身份|账号|地址|域名|钱包",
+    re.IGNORECASE,
+)
+
+WEATHER_RE = re.compile(
+    r"\b(weather|forecast|temperature|rain(?:ing|y)?|snow(?:ing|y)?|sunny|humid(?:ity)?|windy|storm|typhoon|celsius|fahrenheit)\b"
+    r"|天气|气温|温度|下雨|降雨|下雪|预报|台风|晴天|阴天|刮风|湿度|雾霾|空气质量",
+    re.IGNORECASE,
+)
+
+def _name_platform(name: str) -> Optional[Platform]:
+    lowered = name.lower()
+    for suffix, platform in NAME_SUFFIXES:
+        if lowered.endswith(suffix):
+            return platform
+    return None
+
+def _mentioned_platforms(user_query: str) -> List[Platform]:
+    return [Platform(m.lower()) for m in PLATFORM_WORD_RE.findall(user_query)]
+
+def classify_query(user_query: str) -> Optional[RouteDecision]:
+    """
+    Route obvious queries without an LLM call.
+
+    Returns None when the query is ambiguous (no signal, or both weather and
+    identity signals) so the caller falls back to the LLM router.
+    """
+    identity_decision = _classify_identity(user_query)
+    is_weather = WEATHER_RE.search(user_query) is not None
+
+    if identity_decision and is_weather:
+        return None
+    if identity_decision:
+        return identity_decision
+    if is_weather:
+        return RouteDecision("weather_agent", 0.9)
+    return None
+
+def _classify_identity(user_query: str) -> Optional[RouteDecision]:
+    mentioned = _mentioned_platforms(user_query)
+
+    name = NAME_RE.search(user_query)
+    if name:
+        platform = _name_platform(name.group(1))
+        if platform is not None:
+            return RouteDecision("graphql_agent", 0.95, platform.value, name.group(1).lower())
+
+    address = EVM_ADDRESS_RE.search(user_query)
+    if address:
+        return RouteDecision("graphql_agent", 0.95, Platform.ETHEREUM.value, address.group(0).lower())
+
+    address = BITCOIN_ADDRESS_RE.search(user_query)
+    if address and (address.group(0).startswith("bc1") or mentioned or IDENTITY_WORDS_RE.search(user_query)):
+        return RouteDecision("graphql_agent", 0.9, Platform.BITCOIN.value, address.group(0))
+
+    handle = HANDLE_RE.search(user_query)
+    if handle:
+        platform = next((p for p in mentioned if p is not Platform.ENS), None)
+        return RouteDecision("graphql_agent", 0.9, platform.value if platform else None, handle.group(1))
+
+    # base58 strings look like many things, only trust them next to identity wording
+    address = SOLANA_ADDRESS_RE.search(user_query)
+    if address and (mentioned or IDENTITY_WORDS_RE.search(user_query)):
+        return RouteDecision("graphql_agent", 0.85, Platform.SOLANA.value, address.group(0))
+
+    if mentioned and IDENTITY_WORDS_RE.search(user_query):
+        return RouteDecision("graphql_agent", 0.8, mentioned[0].value)
+    if mentioned:
+        return RouteDecision("graphql_agent", 0.6, mentioned[0].value)
+    return None
+
+# clause boundaries of a compound question ("weather in Shanghai and who is vitalik.eth")
+CLAUSE_SPLIT_RE = re.compile(
+    r"\s*(?:[;；，。？?！!]|,\s*(?:and\s+)?|\b(?:and|also|plus|then)\b|并且|而且|以及|还有|另外|同时|然后)\s*",
+    re.IGNORECASE,
+)
+
+def split_compound_query(user_query: str) -> Optional[List[Tuple[str, RouteDecision]]]:
+    """
+    Split a question that needs more than one agent into (sub-query, decision)
+    pairs, e.g. a weather question joined with an identity lookup.
+
+    Clauses without a routing signal of their own stay with the clause after
+    them (or before, at the end); consecutive clauses for the same agent are
+    joined again. Returns None unless at least two agents are involved and
+    every part is classified.
+    """
+    if classify_query(user_query) is not None:
+        return None
+    clauses = [c for c in CLAUSE_SPLIT_RE.split(user_query) if c and c.strip()]
+    if len(clauses) < 2:
+        return None
+
+    parts: List[List] = []
+    pending = ""
+    for clause in clauses:
+        text = f"{pending} {clause}".strip() if pending else clause.strip()
+        decision = classify_query(text)
+        if decision is None:
+            pending = text
+            continue
+        pending = ""
+        if parts and parts[-1][1].agent_name == decision.agent_name:
+            # several identities in one part go to the ReAct agent, not the single-identity template
+            parts[-1] = [f"{parts[-1][0]}, {text}", decision._replace(platform=None, identity=None)]
+        else:
+            parts.append([text, decision])
+    if pending and parts:
+        merged = f"{parts[-1][0]}, {pending}"
+        decision = classify_query(merged)
+        if decision is None:
+            return None
+        parts[-1] = [merged, decision]
+
+    if len({decision.agent_name for _, decision in parts}) < 2:
+        return None
+    return [(text, decision) for text, decision in parts]
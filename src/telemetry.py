@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from tools.metrics import BYTES_BUCKETS, ENABLED, REGISTRY
+
+TURN_SECONDS = REGISTRY.histogram("chatbot_turn_seconds", "Wall time of a user turn", ("agent", "cached"))
+NODE_SECONDS = REGISTRY.histogram("chatbot_node_seconds", "Wall time of a graph node; ReAct nodes are graphql_agent/agent and graphql_agent/tools", ("node",))
+LLM_SECONDS = REGISTRY.histogram("chatbot_llm_seconds", "Latency of LLM calls", ("node", "model"))
+LLM_TOKENS = REGISTRY.counter("chatbot_llm_tokens_total", "Tokens used by LLM calls", ("node", "model", "kind"))
+TOOL_SECONDS = REGISTRY.histogram("chatbot_tool_seconds", "MCP tool call latency as seen by the agent, transport included", ("tool", "status"))
+TOOL_BYTES = REGISTRY.histogram("chatbot_tool_result_bytes", "Size of MCP tool results handed to the LLM", ("tool",), BYTES_BUCKETS)
+
+# TRACE_PATH appends one JSON line per turn; the last TRACE_BUFFER turns are kept in memory
+TRACE_PATH = os.getenv("TRACE_PATH")
+recent_traces: deque = deque(maxlen=int(os.getenv("TRACE_BUFFER", "100")))
+_trace_file_lock = threading.Lock()
+
+
+def node_path(metadata: Optional[dict]) -> str:
+    """graph node of a callback event; nodes of nested graphs are written parent/child"""
+    namespace = (metadata or {}).get("langgraph_checkpoint_ns", "")
+    return "/".join(part.split(":")[0] for part in namespace.split("|") if part)
+
+
+class TurnTracer(BaseCallbackHandler):
+    """
+    Callback handler for one turn: times graph nodes, LLM calls and tool
+    calls, feeds the histograms and collects the spans into a trace record.
+    """
+
+    # called on the event loop, no executor hop
+    run_inline = True
+
+    def __init__(self, session_id: Optional[str] = None, user_query: str = ""):
+        self.trace_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.user_query = user_query
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._open: Dict[Any, Dict[str, Any]] = {}
+
+    def _start(self, run_id, kind: str, name: str, **attrs):
+        self._open[run_id] = {"kind": kind, "name": name, "start": time.perf_counter(), **attrs}
+
+    def _end(self, run_id, **attrs) -> Optional[Dict[str, Any]]:
+        span = self._open.pop(run_id, None)
+        if span is None:
+            return None
+        started = span.pop("start")
+        seconds = time.perf_counter() - started
+        span.update(attrs, offset_ms=round((started - self._t0) * 1000, 2), duration_ms=round(seconds * 1000, 2))
+        self.spans.append(span)
+        return span
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        name = kwargs.get("name")
+        if metadata and name is not None and name == metadata.get("langgraph_node"):
+            self._start(run_id, "node", node_path(metadata) or name)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        span = self._end(run_id)
+        if span is not None:
+            NODE_SECONDS.observe(span["duration_ms"] / 1000, span["name"])
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "unknown"
+        self._start(run_id, "llm", node_path(metadata) or "direct", model=model)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        generations = response.generations[0] if response.generations else []
+        message = getattr(generations[0], "message", None) if generations else None
+        if message is not None and getattr(message, "usage_metadata", None):
+            usage = message.usage_metadata
+        elif response.llm_output and response.llm_output.get("token_usage"):
+            token_usage = response.llm_output["token_usage"]
+            usage = {"input_tokens": token_usage.get("prompt_tokens", 0), "output_tokens": token_usage.get("completion_tokens", 0)}
+        span = self._end(
+            run_id,
+            prompt_tokens=usage.get("input_tokens", 0),
+            completion_tokens=usage.get("output_tokens", 0),
+        )
+        if span is not None:
+            LLM_SECONDS.observe(span["duration_ms"] / 1000, span["name"], span["model"])
+            LLM_TOKENS.inc(span["name"], span["model"], "prompt", amount=span["prompt_tokens"])
+            LLM_TOKENS.inc(span["name"], span["model"], "completion", amount=span["completion_tokens"])
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", (serialized or {}).get("name") or kwargs.get("name") or "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        content = getattr(output, "content", output)
+        size = len(content.encode()) if isinstance(content, str) else len(str(content).encode())
+        span = self._end(run_id, status="ok", bytes=size)
+        if span is not None:
+            TOOL_SECONDS.observe(span["duration_ms"] / 1000, span["name"], "ok")
+            TOOL_BYTES.observe(size, span["name"])
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        span = self._end(run_id, status="error", error=str(error)[:200])
+        if span is not None:
+            TOOL_SECONDS.observe(span["duration_ms"] / 1000, span["name"], "error")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        span = self._end(run_id, error=str(error)[:200])
+        if span is not None:
+            NODE_SECONDS.observe(span["duration_ms"] / 1000, span["name"])
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        span = self._end(run_id, error=str(error)[:200])
+        if span is not None:
+            LLM_SECONDS.observe(span["duration_ms"] / 1000, span["name"], span["model"])
+
+    def finish(self, result: Optional[dict] = None, cached: bool = False, **extra) -> Dict[str, Any]:
+        """close the turn: observe its duration and publish the trace record"""
+        result = result or {}
+        seconds = time.perf_counter() - self._t0
+        agent = result.get("current_agent") or "unknown"
+        TURN_SECONDS.observe(seconds, agent, "true" if cached else "false")
+        record = {
+            "trace_id": self.trace_id,
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "user_query": self.user_query,
+            "agent": agent,
+            "agent_path": "answer_cache" if cached else result.get("agent_path", ""),
+            "route_source": result.get("route_source", ""),
+            "cached": cached,
+            "error": result.get("query_error"),
+            "budget_usage": result.get("budget_usage"),
+            "total_ms": round(seconds * 1000, 2),
+            "spans": sorted(self.spans, key=lambda span: span["offset_ms"]),
+            **extra,
+        }
+        publish_trace(record)
+        return record
+
+
+def publish_trace(record: Dict[str, Any]):
+    recent_traces.append(record)
+    if TRACE_PATH:
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with _trace_file_lock, open(TRACE_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def turn_tracer(session_id: Optional[str] = None, user_query: str = "") -> Optional[TurnTracer]:
+    """a tracer for one turn, or None when METRICS_ENABLED=0"""
+    return TurnTracer(session_id, user_query) if ENABLED else None
+
+
+def run_config(tracer: Optional[TurnTracer]) -> Optional[dict]:
+    return {"callbacks": [tracer]} if tracer is not None else None
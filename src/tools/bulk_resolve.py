@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Resolve a CSV or JSONL file of (platform, identity) rows against web3.bio
+without the chatbot: rows are read lazily, grouped into aliased batch
+queries (the IDENTITY_QUERY selection for every pair), sent with bounded
+concurrency under a request rate limit and written in input order as JSONL,
+one line per input row.
+
+Progress is checkpointed next to the output (<output>.checkpoint), so an
+interrupted run started again with the same arguments skips the rows it
+already wrote. Rows the upstream answers with an error are written with
+that error; a batch that fails as a whole because the upstream is
+unavailable (down after retries, circuit open) stops the run so it can be
+resumed later; a batch the upstream rejects outright is split until the
+offending rows are isolated and written with the error.
+
+	python src/tools/bulk_resolve.py identities.csv -o resolved.jsonl --concurrency 4 --rate 5
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from identity import build_identity_batch_query, identity_key, parse_platform, split_batch_result
+from platforms import Platform
+
+# (row number, input row, parsed platform or the parse error, identity)
+Row = Tuple[int, dict, object, str]
+
+
+class BatchFailedError(Exception):
+	pass
+
+
+def read_rows(path: str, platform_field: str = "platform", identity_field: str = "identity", skip: int = 0) -> Iterator[Row]:
+	"""lazily yield the rows of a CSV or JSONL file, the first `skip` rows are passed over"""
+	with open(path, newline="", encoding="utf-8") as f:
+		if path.endswith((".jsonl", ".ndjson", ".json")):
+			records: Iterable[dict] = (json.loads(line) for line in f if line.strip())
+		else:
+			records = csv.DictReader(f)
+		for number, record in enumerate(records):
+			if number < skip:
+				continue
+			identity = str(record.get(identity_field) or "").strip()
+			try:
+				platform: object = parse_platform(str(record.get(platform_field) or ""))
+			except ValueError as e:
+				platform = e
+			if not identity and isinstance(platform, Platform):
+				platform = ValueError(f"Missing '{identity_field}'")
+			yield number, record, platform, identity
+
+
+def batched(rows: Iterator[Row], size: int) -> Iterator[List[Row]]:
+	batch = []
+	for row in rows:
+		batch.append(row)
+		if len(batch) >= size:
+			yield batch
+			batch = []
+	if batch:
+		yield batch
+
+
+class RateLimiter:
+	"""spaces acquisitions at least 1/rate seconds apart; rate <= 0 means unlimited"""
+
+	def __init__(self, rate: float):
+		self.interval = 1.0 / rate if rate > 0 else 0.0
+		self._next = 0.0
+		self._lock = asyncio.Lock()
+
+	async def acquire(self):
+		if not self.interval:
+			return
+		async with self._lock:
+			now = time.monotonic()
+			wait = self._next - now
+			self._next = max(now, self._next) + self.interval
+		if wait > 0:
+			await asyncio.sleep(wait)
+
+
+class Checkpoint:
+	"""rows written so far and the output size after them, replaced atomically"""
+
+	def __init__(self, path: str):
+		self.path = path
+
+	def load(self, input_path: str) -> Tuple[int, int]:
+		try:
+			with open(self.path, encoding="utf-8") as f:
+				state = json.load(f)
+		except FileNotFoundError:
+			return 0, 0
+		if state.get("input") != os.path.abspath(input_path):
+			raise ValueError(f"{self.path} belongs to {state.get('input')}, pass --restart to start over")
+		return state["rows"], state["offset"]
+
+	def save(self, input_path: str, rows: int, offset: int):
+		tmp_path = self.path + ".tmp"
+		with open(tmp_path, "w", encoding="utf-8") as f:
+			json.dump({"input": os.path.abspath(input_path), "rows": rows, "offset": offset}, f)
+		os.replace(tmp_path, self.path)
+
+	def clear(self):
+		if os.path.exists(self.path):
+			os.unlink(self.path)
+
+
+class BulkResolver:
+	"""
+	Runs the batches through server.execute_graphql_query, so retries, the
+	circuit breaker, persisted queries and the identity store all apply.
+	At most `concurrency` batches are in flight; finished batches are
+	written in input order, so memory stays bounded by
+	concurrency * batch_size rows whatever the input size.
+	"""
+
+	def __init__(self, server, batch_size: int = 10, concurrency: int = 4, rate: float = 0.0, use_store: bool = True):
+		self.server = server
+		self.batch_size = batch_size
+		self.concurrency = concurrency
+		self.limiter = RateLimiter(rate)
+		self.use_store = use_store
+		self.rows = 0
+		self.errors = 0
+		self.requests = 0
+		self.store_hits = 0
+
+	async def resolve(self, batch: List[Row]) -> List[dict]:
+		results = {}
+		pairs = []
+		for _, _, platform, identity in batch:
+			if not isinstance(platform, Platform):
+				continue
+			key = identity_key(platform, identity)
+			if key in results:
+				continue
+			known = self.server.identity_store.lookup(platform.value, identity) if self.use_store else None
+			if known is not None:
+				self.store_hits += 1
+				results[key] = known
+			else:
+				results[key] = {}
+				pairs.append((platform, identity))
+
+		if pairs:
+			results.update(await self._resolve_pairs(pairs, batch[0][0]))
+
+		lines = []
+		for number, record, platform, identity in batch:
+			line = {"row": number, "input": record}
+			if isinstance(platform, Platform):
+				result = results[identity_key(platform, identity)]
+			else:
+				result = {"error": str(platform)}
+			if "error" in result:
+				line["error"] = result["error"]
+				self.errors += 1
+			else:
+				line["data"] = result
+			lines.append(line)
+		return lines
+
+	async def _resolve_pairs(self, pairs: List[Tuple[Platform, str]], first_row: int) -> dict:
+		query_obj = build_identity_batch_query(pairs)
+		self.server.persisted_queries.register(query_obj["query"])
+		await self.limiter.acquire()
+		self.requests += 1
+		data = await self.server.execute_graphql_query(query_obj, self.server.url, partial=True)
+		if "error" in data:
+			if data.get("transient"):
+				raise BatchFailedError(f"batch starting at row {first_row} failed: {data['error']}")
+			if len(pairs) > 1:
+				# the upstream rejected the whole document, e.g. because of one bad identity: split to isolate it,
+				# a resumed run would only stop at the same batch again
+				half = len(pairs) // 2
+				results = await self._resolve_pairs(pairs[:half], first_row)
+				results.update(await self._resolve_pairs(pairs[half:], first_row))
+				return results
+		elif self.use_store:
+			self.server.identity_store.ingest(data)
+		return split_batch_result(pairs, data)
+
+	async def run(self, rows: Iterator[Row], out, on_batch=None):
+		"""resolve `rows` and write them to the binary file `out`; `on_batch(rows_written)` runs after each batch"""
+		pending: deque = deque()
+
+		async def write_next():
+			lines = await pending.popleft()
+			out.write(b"".join(json.dumps(line, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n" for line in lines))
+			out.flush()
+			self.rows += len(lines)
+			if on_batch is not None:
+				on_batch(self.rows)
+
+		try:
+			for batch in batched(rows, self.batch_size):
+				while len(pending) >= self.concurrency:
+					await write_next()
+				pending.append(asyncio.ensure_future(self.resolve(batch)))
+			while pending:
+				await write_next()
+		finally:
+			for task in pending:
+				task.cancel()
+
+
+async def amain(args) -> dict:
+	import server
+
+	checkpoint = Checkpoint(args.output + ".checkpoint")
+	if args.restart:
+		checkpoint.clear()
+	done, offset = checkpoint.load(args.input)
+	if not os.path.exists(args.output):
+		done, offset = 0, 0
+	mode = "r+b" if done else "wb"
+	resolver = BulkResolver(server, args.batch_size, args.concurrency, args.rate, use_store=not args.no_store)
+	resolver.rows = done
+	started = time.monotonic()
+	last_report = [started]
+
+	def on_batch(rows: int):
+		checkpoint.save(args.input, rows, out.tell())
+		now = time.monotonic()
+		if now - last_report[0] >= args.report_every:
+			last_report[0] = now
+			rate = (rows - done) / (now - started)
+			print(f"{rows} rows, {rate:.1f} rows/s, {resolver.requests} requests, {resolver.store_hits} store hits, {resolver.errors} errors", file=sys.stderr)
+
+	if done:
+		print(f"Resuming after row {done} of {args.input}", file=sys.stderr)
+	with open(args.output, mode) as out:
+		# drop whatever was written after the last checkpoint
+		out.seek(offset)
+		out.truncate()
+		try:
+			await resolver.run(read_rows(args.input, args.platform_field, args.identity_field, skip=done), out, on_batch)
+		finally:
+			await server.graphql_client.aclose()
+			server.identity_store.close()
+
+	elapsed = time.monotonic() - started
+	summary = {
+		"rows": resolver.rows,
+		"resolved_this_run": resolver.rows - done,
+		"errors": resolver.errors,
+		"requests": resolver.requests,
+		"store_hits": resolver.store_hits,
+		"seconds": round(elapsed, 2),
+		"rows_per_second": round((resolver.rows - done) / elapsed, 1) if elapsed else 0.0,
+	}
+	checkpoint.clear()
+	return summary
+
+
+def parse_args(argv: Optional[List[str]] = None):
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("input", help="CSV with a header row, or JSONL (.jsonl/.ndjson)")
+	parser.add_argument("-o", "--output", required=True, help="JSONL file to write, one line per input row")
+	parser.add_argument("--platform-field", default="platform")
+	parser.add_argument("--identity-field", default="identity")
+	parser.add_argument("--batch-size", type=int, default=int(os.getenv("IDENTITY_BATCH_SIZE", "10")), help="identities per aliased query")
+	parser.add_argument("--concurrency", type=int, default=4, help="batches in flight at once")
+	parser.add_argument("--rate", type=float, default=5.0, help="upstream requests per second, 0 for no limit")
+	parser.add_argument("--no-store", action="store_true", help="do not answer from or write to the identity store")
+	parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first row")
+	parser.add_argument("--report-every", type=float, default=5.0, help="seconds between progress lines")
+	return parser.parse_args(argv)
+
+
+def main():
+	try:
+		summary = asyncio.run(amain(parse_args()))
+	except BatchFailedError as e:
+		print(f"Stopped, {e}; run the same command again to resume", file=sys.stderr)
+		sys.exit(1)
+	except ValueError as e:
+		# a checkpoint of another input, an unreadable input file
+		print(e, file=sys.stderr)
+		sys.exit(2)
+	except KeyboardInterrupt:
+		print("Interrupted; run the same command again to resume", file=sys.stderr)
+		sys.exit(130)
+	print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,175 @@
+import asyncio
+import importlib.util
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from metrics import BYTES_BUCKETS, ENABLED as METRICS_ENABLED, REGISTRY
+from persisted_queries import PERSISTED_QUERIES, REJECTED_STATUSES, PersistedQueryRegistry
+
+try:
+	import orjson
+except ImportError:  # pragma: no cover - orjson ships with the requirements
+	orjson = None
+	import json
+
+
+UPSTREAM_SECONDS = REGISTRY.histogram(
+	"graphql_upstream_request_seconds", "Latency of POSTs to the GraphQL upstream, by HTTP status (error/timeout when none)", ("status",)
+)
+UPSTREAM_BYTES = REGISTRY.histogram(
+	"graphql_upstream_response_bytes", "Size of the JSON bodies read from the GraphQL upstream", buckets=BYTES_BUCKETS
+)
+
+
+def _env_float(name: str, default: float) -> float:
+	value = os.getenv(name)
+	return float(value) if value else default
+
+
+class GraphQLClient:
+	"""
+	Shared async HTTP client for upstream GraphQL calls.
+
+	All requests go through one keep-alive connection pool, so concurrent tool
+	calls reuse open TCP/TLS connections instead of dialing per request.
+	Timeouts are in seconds; `deadline` bounds the whole request (connect,
+	upload, wait and download) on top of the per-phase timeouts.
+	"""
+
+	def __init__(
+		self,
+		pool_size: Optional[int] = None,
+		connect_timeout: Optional[float] = None,
+		read_timeout: Optional[float] = None,
+		deadline: Optional[float] = None,
+		http2: Optional[bool] = None,
+		persisted_queries: Optional[PersistedQueryRegistry] = None,
+	):
+		self.pool_size = pool_size or int(os.getenv("GRAPHQL_POOL_SIZE", "20"))
+		self.connect_timeout = connect_timeout or _env_float("GRAPHQL_CONNECT_TIMEOUT", 5.0)
+		self.read_timeout = read_timeout or _env_float("GRAPHQL_READ_TIMEOUT", 30.0)
+		self.deadline = deadline or _env_float("GRAPHQL_DEADLINE", 45.0)
+		self.max_response_bytes = int(os.getenv("GRAPHQL_MAX_RESPONSE_BYTES", str(16 * 1024 * 1024)))
+		# HTTP/2 needs the optional `h2` package (httpx[http2])
+		self.http2 = importlib.util.find_spec("h2") is not None if http2 is None else http2
+		self.persisted_queries = persisted_queries
+		self._client: Optional[httpx.AsyncClient] = None
+
+	@property
+	def client(self) -> httpx.AsyncClient:
+		# created lazily so it binds to the event loop that serves the tools
+		if self._client is None or self._client.is_closed:
+			self._client = httpx.AsyncClient(
+				http2=self.http2,
+				limits=httpx.Limits(
+					max_connections=self.pool_size,
+					max_keepalive_connections=self.pool_size,
+				),
+				timeout=httpx.Timeout(
+					self.read_timeout,
+					connect=self.connect_timeout,
+					pool=self.connect_timeout,
+				),
+			)
+		return self._client
+
+	async def post(
+		self,
+		url: str,
+		payload: dict,
+		headers: Optional[Dict[str, str]] = None,
+		deadline: Optional[float] = None,
+	) -> httpx.Response:
+		deadline = deadline or self.deadline
+		try:
+			return await asyncio.wait_for(
+				self.client.post(url, json=payload, headers=headers),
+				timeout=deadline,
+			)
+		except asyncio.TimeoutError:
+			raise TimeoutError(f"request exceeded {deadline:g}s deadline") from None
+
+	async def post_json(
+		self,
+		url: str,
+		payload: dict,
+		headers: Optional[Dict[str, str]] = None,
+		deadline: Optional[float] = None,
+	) -> Tuple[httpx.Response, Any]:
+		"""
+		POST and decode the JSON body. The body is read chunk by chunk as it
+		arrives and refused beyond `max_response_bytes`; it is None for error statuses.
+		"""
+		deadline = deadline or self.deadline
+		started = time.perf_counter()
+		status = "error"
+		try:
+			response, body = await asyncio.wait_for(self._post_json(url, payload, headers), timeout=deadline)
+			status = str(response.status_code)
+			return response, body
+		except asyncio.TimeoutError:
+			status = "timeout"
+			raise TimeoutError(f"request exceeded {deadline:g}s deadline") from None
+		finally:
+			if METRICS_ENABLED:
+				UPSTREAM_SECONDS.observe(time.perf_counter() - started, status)
+
+	async def post_query(
+		self,
+		url: str,
+		query_obj: dict,
+		headers: Optional[Dict[str, str]] = None,
+		deadline: Optional[float] = None,
+	) -> Tuple[httpx.Response, Any]:
+		"""
+		post_json for a GraphQL request. Documents in `persisted_queries` are
+		sent as their hash; when the server does not know the hash the request
+		is repeated with the document, and endpoints that refuse hash-only
+		requests get plain requests from then on. Other failures (5xx, 429,
+		GraphQL errors) are returned as they are, for the caller's retries.
+		"""
+		registry = self.persisted_queries
+		digest = registry.lookup(query_obj["query"]) if registry is not None and registry.applies_to(url) else None
+		if digest is None:
+			return await self.post_json(url, query_obj, headers=headers, deadline=deadline)
+
+		response, body = await self.post_json(url, registry.hashed_payload(digest, query_obj), headers=headers, deadline=deadline)
+		outcome = registry.classify(response.status_code, body)
+		if outcome == "hit":
+			PERSISTED_QUERIES.inc("hit")
+			return response, body
+		if outcome == "not_found":
+			PERSISTED_QUERIES.inc("registered")
+			return await self.post_json(url, registry.full_payload(digest, query_obj), headers=headers, deadline=deadline)
+
+		PERSISTED_QUERIES.inc(outcome)
+		if outcome == "error":
+			return response, body
+		if outcome == "unsupported":
+			registry.mark_unsupported(url)
+		response, body = await self.post_json(url, query_obj, headers=headers, deadline=deadline)
+		if outcome == "rejected" and response.status_code not in REJECTED_STATUSES:
+			# the document alone was accepted, so it was the hash-only form the server refused
+			registry.mark_unsupported(url)
+		return response, body
+
+	async def _post_json(self, url: str, payload: dict, headers: Optional[Dict[str, str]]) -> Tuple[httpx.Response, Any]:
+		async with self.client.stream("POST", url, json=payload, headers=headers) as response:
+			if response.is_error:
+				return response, None
+			body = bytearray()
+			async for chunk in response.aiter_bytes():
+				body += chunk
+				if len(body) > self.max_response_bytes:
+					raise ValueError(f"response larger than {self.max_response_bytes} bytes")
+		if METRICS_ENABLED:
+			UPSTREAM_BYTES.observe(len(body))
+		return response, orjson.loads(body) if orjson is not None else json.loads(body)
+
+	async def aclose(self):
+		if self._client is not None:
+			await self._client.aclose()
+			self._client = None
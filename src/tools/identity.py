@@ -0,0 +1,70 @@
+from typing import Dict, Iterable, List, Tuple
+
+from pydantic import BaseModel, Field
+
+from platforms import Platform
+from query import IDENTITY_FIELDS
+
+
+class IdentityRef(BaseModel):
+	platform: str = Field(description="The platform of the identity, a value of the Platform enum, e.g. ens, farcaster, lens, ethereum.")
+	identity: str = Field(description="The identity on that platform, e.g. vitalik.eth or 0xd8da6bf26964af9d7eed9e03e53415d37aa96045.")
+
+
+def parse_platform(value: str) -> Platform:
+	"""accept a Platform value or member name in any case"""
+	normalized = value.strip().lower()
+	try:
+		return Platform(normalized)
+	except ValueError:
+		pass
+	member = Platform.__members__.get(normalized.upper())
+	if member is None:
+		raise ValueError(f"Unknown platform '{value}'")
+	return member
+
+
+def identity_key(platform: Platform, identity: str) -> str:
+	return f"{platform.value}:{identity}"
+
+
+def build_identity_batch_query(pairs: List[Tuple[Platform, str]]) -> dict:
+	"""one aliased document that looks up every pair; alias `i<n>` answers pairs[n]"""
+	definitions = []
+	selections = []
+	variables = {}
+	for n, (platform, identity) in enumerate(pairs):
+		definitions.append(f"$p{n}: Platform!, $i{n}: String!")
+		selections.append(f"\ti{n}: identity(platform: $p{n}, identity: $i{n}) {{{IDENTITY_FIELDS}\t}}")
+		variables[f"p{n}"] = platform.value
+		variables[f"i{n}"] = identity
+	query = f"query QUERY_PROFILES({', '.join(definitions)}) {{\n" + "\n".join(selections) + "\n}\n"
+	return {"query": query, "variables": variables}
+
+
+def chunked(pairs: List[Tuple[Platform, str]], size: int) -> Iterable[List[Tuple[Platform, str]]]:
+	for start in range(0, len(pairs), size):
+		yield pairs[start:start + size]
+
+
+def split_batch_result(pairs: List[Tuple[Platform, str]], data: dict) -> Dict[str, dict]:
+	"""map an aliased batch response (or a whole-batch error) back onto its input pairs"""
+	results = {}
+	errors_by_alias = {}
+	for error in data.get("errors", []):
+		path = error.get("path") or []
+		if path:
+			errors_by_alias.setdefault(path[0], []).append(error.get("message", str(error)))
+
+	for n, (platform, identity) in enumerate(pairs):
+		key = identity_key(platform, identity)
+		alias = f"i{n}"
+		if "error" in data:
+			results[key] = {"error": data["error"]}
+		elif alias in errors_by_alias:
+			results[key] = {"error": "; ".join(errors_by_alias[alias])}
+		elif data.get(alias) is None:
+			results[key] = {"error": "Identity not found"}
+		else:
+			results[key] = data[alias]
+	return results
@@ -0,0 +1,196 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+from metrics import REGISTRY
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "identities.sqlite3")
+
+LOOKUPS = REGISTRY.counter(
+	"identity_store_lookups_total",
+	"Identity store lookups by outcome: hit, miss, stale (fetched too long ago) or expired (the vertex expiredAt has passed)",
+	("result",),
+)
+
+# vertex-only fields that do not belong on a top-level identity record
+_VERTEX_ONLY = ("registeredAt", "expiredAt")
+
+
+def vertex_key(platform: str, identity: str) -> str:
+	"""addresses are case-insensitive hex, everything else is kept as written"""
+	identity = identity.strip()
+	if identity.startswith("0x"):
+		identity = identity.lower()
+	return f"{platform.strip().lower()}:{identity}"
+
+
+def _dumps(value: Any) -> str:
+	return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def find_identity_records(value: Any) -> Iterable[dict]:
+	"""every identity record carrying an identityGraph (with graphId and vertices) inside a GraphQL result"""
+	if isinstance(value, list):
+		for item in value:
+			yield from find_identity_records(item)
+	elif isinstance(value, dict):
+		graph = value.get("identityGraph")
+		if isinstance(graph, dict) and graph.get("graphId") and isinstance(graph.get("vertices"), list):
+			yield value
+		for key, item in value.items():
+			if key != "identityGraph":
+				yield from find_identity_records(item)
+
+
+class IdentityStore:
+	"""
+	Identity graphs seen in upstream responses, indexed by every vertex.
+
+	An `identity` result carries its whole identityGraph, so after one
+	lookup every linked identity (ENS, Farcaster, Lens, addresses, ...) can
+	be answered locally: `lookup(platform, identity)` rebuilds the record in
+	the shape of an IDENTITY_QUERY result from the stored vertex and graph.
+
+	A vertex is served while it was fetched less than `max_age` seconds ago
+	and its `expiredAt` has not passed; a vertex with an older `updatedAt`
+	never replaces a newer one, and fields a newer record lacks are kept.
+	Only feed it IDENTITY_QUERY-shaped results: the graph's vertex list is
+	replaced by the one ingested last.
+	"""
+
+	def __init__(self, path: Optional[str] = None, max_age: Optional[float] = None, enabled: Optional[bool] = None):
+		self.path = path or os.getenv("IDENTITY_STORE_PATH", DEFAULT_STORE_PATH)
+		self.max_age = max_age if max_age is not None else float(os.getenv("IDENTITY_STORE_MAX_AGE", "3600"))
+		self.enabled = enabled if enabled is not None else os.getenv("IDENTITY_STORE_ENABLED", "1") != "0"
+		self._conn: Optional[sqlite3.Connection] = None
+		self._lock = threading.Lock()
+		if not self.enabled:
+			return
+		if self.path != ":memory:":
+			os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+		with self._lock, self._db:
+			self._db.execute("PRAGMA journal_mode=WAL")
+			self._db.execute(
+				"CREATE TABLE IF NOT EXISTS graphs ("
+				"graph_id TEXT PRIMARY KEY, vertices TEXT NOT NULL, fetched_at REAL NOT NULL)"
+			)
+			self._db.execute(
+				"CREATE TABLE IF NOT EXISTS vertices ("
+				"key TEXT PRIMARY KEY, graph_id TEXT NOT NULL, record TEXT NOT NULL, "
+				"updated_at INTEGER NOT NULL, expired_at INTEGER, fetched_at REAL NOT NULL)"
+			)
+			self._db.execute("CREATE INDEX IF NOT EXISTS vertices_graph ON vertices (graph_id)")
+
+	@property
+	def _db(self) -> sqlite3.Connection:
+		if self._conn is None:
+			self._conn = sqlite3.connect(self.path, check_same_thread=False)
+		return self._conn
+
+	def ingest(self, result: Any) -> int:
+		"""store every identity graph found in `result`, return the number of vertices written"""
+		if not self.enabled:
+			return 0
+		written = 0
+		for record in find_identity_records(result):
+			written += self._ingest_record(record)
+		return written
+
+	def _ingest_record(self, record: dict) -> int:
+		graph = record["identityGraph"]
+		graph_id = graph["graphId"]
+		vertices = [v for v in graph["vertices"] if isinstance(v, dict) and v.get("platform") and v.get("identity")]
+		now = time.time()
+		root_key = vertex_key(str(record.get("platform", "")), str(record.get("identity", "")))
+		# the queried identity keeps its full record (id, aliases, status, ...), the others their vertex fields
+		root = {key: value for key, value in record.items() if key != "identityGraph"}
+		rows = {}
+		for vertex in vertices:
+			key = vertex_key(vertex["platform"], vertex["identity"])
+			rows[key] = (root if key == root_key else vertex, vertex.get("updatedAt") or 0, vertex.get("expiredAt"))
+		if record.get("platform") and record.get("identity") and root_key not in rows:
+			rows[root_key] = (root, record.get("updatedAt") or 0, None)
+		if not rows:
+			return 0
+		with self._lock, self._db:
+			# fields already known for a vertex are kept unless the new record carries them too
+			placeholders = ",".join("?" * len(rows))
+			stored = {
+				key: (json.loads(known), updated_at)
+				for key, known, updated_at in self._db.execute(
+					f"SELECT key, record, updated_at FROM vertices WHERE key IN ({placeholders})", list(rows)
+				)
+			}
+			values = []
+			for key, (fields, updated_at, expired_at) in rows.items():
+				known, known_updated_at = stored.get(key, ({}, 0))
+				if updated_at >= known_updated_at:
+					fields = {**known, **fields}
+				values.append((key, graph_id, _dumps(fields), updated_at, expired_at, now))
+			# vertices that left the graph must not keep pointing at it
+			self._db.execute(
+				f"DELETE FROM vertices WHERE graph_id = ? AND key NOT IN ({placeholders})", [graph_id, *rows]
+			)
+			self._db.execute(
+				"INSERT INTO graphs (graph_id, vertices, fetched_at) VALUES (?, ?, ?) "
+				"ON CONFLICT(graph_id) DO UPDATE SET vertices = excluded.vertices, fetched_at = excluded.fetched_at",
+				(graph_id, _dumps(vertices), now),
+			)
+			self._db.executemany(
+				"INSERT INTO vertices (key, graph_id, record, updated_at, expired_at, fetched_at) VALUES (?, ?, ?, ?, ?, ?) "
+				"ON CONFLICT(key) DO UPDATE SET graph_id = excluded.graph_id, record = excluded.record, "
+				"updated_at = excluded.updated_at, expired_at = excluded.expired_at, fetched_at = excluded.fetched_at "
+				"WHERE excluded.updated_at >= vertices.updated_at",
+				values,
+			)
+		return len(values)
+
+	def lookup(self, platform: str, identity: str) -> Optional[dict]:
+		"""the identity record with its identity graph, None unless the vertex is known and fresh"""
+		if not self.enabled:
+			return None
+		now = time.time()
+		with self._lock:
+			row = self._db.execute(
+				"SELECT v.record, v.expired_at, v.fetched_at, g.graph_id, g.vertices FROM vertices v "
+				"JOIN graphs g ON g.graph_id = v.graph_id WHERE v.key = ?",
+				(vertex_key(platform, identity),),
+			).fetchone()
+		if row is None:
+			LOOKUPS.inc("miss")
+			return None
+		record, expired_at, fetched_at, graph_id, vertices = row
+		if expired_at is not None and expired_at < now:
+			LOOKUPS.inc("expired")
+			return None
+		if now - fetched_at > self.max_age:
+			LOOKUPS.inc("stale")
+			return None
+		LOOKUPS.inc("hit")
+		record = {key: value for key, value in json.loads(record).items() if key not in _VERTEX_ONLY}
+		record["identityGraph"] = {"graphId": graph_id, "vertices": json.loads(vertices)}
+		return record
+
+	def stats(self) -> dict:
+		if not self.enabled:
+			return {"enabled": False}
+		with self._lock:
+			graphs = self._db.execute("SELECT COUNT(*) FROM graphs").fetchone()[0]
+			vertices = self._db.execute("SELECT COUNT(*) FROM vertices").fetchone()[0]
+		return {"enabled": True, "graphs": graphs, "vertices": vertices, "max_age": self.max_age}
+
+	def clear(self):
+		if not self.enabled:
+			return
+		with self._lock, self._db:
+			self._db.execute("DELETE FROM vertices")
+			self._db.execute("DELETE FROM graphs")
+
+	def close(self):
+		with self._lock:
+			if self._conn is not None:
+				self._conn.close()
+				self._conn = None
@@ -0,0 +1,193 @@
+import bisect
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# METRICS_ENABLED=0 turns every instrumentation point into a skipped branch
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Labels = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+	if value == float("inf"):
+		return "+Inf"
+	return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+	return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Iterable[str], values: Iterable[str]) -> str:
+	pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+	return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+	"""monotonic counter with a fixed set of label names"""
+
+	kind = "counter"
+
+	def __init__(self, name: str, help: str, labelnames: Labels = (), enabled: bool = True):
+		self.name = name
+		self.help = help
+		self.labelnames = tuple(labelnames)
+		self.enabled = enabled
+		self._values: Dict[Labels, float] = {}
+		self._lock = threading.Lock()
+
+	def inc(self, *labels: str, amount: float = 1.0):
+		if not self.enabled:
+			return
+		with self._lock:
+			self._values[labels] = self._values.get(labels, 0.0) + amount
+
+	def value(self, *labels: str) -> float:
+		return self._values.get(labels, 0.0)
+
+	def lines(self) -> List[str]:
+		with self._lock:
+			items = sorted(self._values.items())
+		return [f"{self.name}{_label_text(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+	def clear(self):
+		with self._lock:
+			self._values.clear()
+
+
+class Histogram:
+	"""cumulative-bucket histogram in the Prometheus layout"""
+
+	kind = "histogram"
+
+	def __init__(self, name: str, help: str, labelnames: Labels = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS, enabled: bool = True):
+		self.name = name
+		self.help = help
+		self.labelnames = tuple(labelnames)
+		self.enabled = enabled
+		self.buckets = tuple(sorted(buckets))
+		# labels -> [per-bucket counts (+Inf last), sum, count]
+		self._values: Dict[Labels, list] = {}
+		self._lock = threading.Lock()
+
+	def observe(self, value: float, *labels: str):
+		if not self.enabled:
+			return
+		index = bisect.bisect_left(self.buckets, value)
+		with self._lock:
+			entry = self._values.get(labels)
+			if entry is None:
+				entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+			entry[0][index] += 1
+			entry[1] += value
+			entry[2] += 1
+
+	def count(self, *labels: str) -> int:
+		entry = self._values.get(labels)
+		return entry[2] if entry is not None else 0
+
+	def lines(self) -> List[str]:
+		with self._lock:
+			items = sorted((labels, [list(entry[0]), entry[1], entry[2]]) for labels, entry in self._values.items())
+		lines = []
+		for labels, (counts, total, count) in items:
+			cumulative = 0
+			for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+				cumulative += bucket_count
+				label_text = _label_text(self.labelnames + ("le",), labels + (_format_value(bound),))
+				lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+			label_text = _label_text(self.labelnames, labels)
+			lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+			lines.append(f"{self.name}_count{label_text} {count}")
+		return lines
+
+	def clear(self):
+		with self._lock:
+			self._values.clear()
+
+
+class Collected:
+	"""metric read from existing state at export time, e.g. the counters a cache already keeps"""
+
+	def __init__(self, name: str, kind: str, help: str, read: Callable[[], Union[float, Dict[Labels, float]]], labelnames: Labels = ()):
+		self.name = name
+		self.kind = kind
+		self.help = help
+		self.labelnames = tuple(labelnames)
+		self.read = read
+
+	def lines(self) -> List[str]:
+		values = self.read()
+		if not isinstance(values, dict):
+			values = {(): values}
+		return [f"{self.name}{_label_text(self.labelnames, labels)} {_format_value(value)}" for labels, value in sorted(values.items())]
+
+	def clear(self):
+		pass
+
+
+class Registry:
+	"""named metrics of one process, rendered in the Prometheus text format
+
+	a disabled registry hands out metrics that drop every update and registers no collected readers
+	"""
+
+	def __init__(self, enabled: bool = True):
+		self.enabled = enabled
+		self._metrics: Dict[str, object] = {}
+		self._lock = threading.Lock()
+
+	def _register(self, metric):
+		with self._lock:
+			existing = self._metrics.get(metric.name)
+			if existing is not None:
+				if type(existing) is not type(metric):
+					raise ValueError(f"metric {metric.name} already registered as {existing.kind}")
+				return existing
+			self._metrics[metric.name] = metric
+			return metric
+
+	def counter(self, name: str, help: str, labelnames: Labels = ()) -> Counter:
+		return self._register(Counter(name, help, labelnames, self.enabled))
+
+	def histogram(self, name: str, help: str, labelnames: Labels = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+		return self._register(Histogram(name, help, labelnames, buckets, self.enabled))
+
+	def collect(self, name: str, kind: str, help: str, read: Callable, labelnames: Labels = ()) -> Collected:
+		"""register (or replace) a metric whose value is read from `read()` at export time"""
+		metric = Collected(name, kind, help, read, labelnames)
+		if not self.enabled:
+			return metric
+		with self._lock:
+			self._metrics[name] = metric
+		return metric
+
+	def get(self, name: str) -> Optional[object]:
+		return self._metrics.get(name)
+
+	def render(self) -> str:
+		with self._lock:
+			metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+		out = []
+		for metric in metrics:
+			out.append(f"# HELP {metric.name} {metric.help}")
+			out.append(f"# TYPE {metric.name} {metric.kind}")
+			out.extend(metric.lines())
+		return "\n".join(out) + "\n"
+
+	def clear(self):
+		"""reset every value, the metrics stay registered"""
+		with self._lock:
+			metrics = list(self._metrics.values())
+		for metric in metrics:
+			metric.clear()
+
+
+REGISTRY = Registry(ENABLED)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
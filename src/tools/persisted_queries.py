@@ -0,0 +1,126 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Set
+
+from metrics import REGISTRY
+
+PERSISTED_QUERIES = REGISTRY.counter(
+	"graphql_persisted_queries_total",
+	"Persisted-query requests by outcome: hit (hash only), registered (sent again with the document), unsupported and rejected (sent again as a plain query), error (returned as is)",
+	("outcome",),
+)
+
+NOT_FOUND = "PersistedQueryNotFound"
+NOT_SUPPORTED = "PersistedQueryNotSupported"
+
+# how servers without persisted-query support refuse a request that has no document
+REJECTED_STATUSES = {400, 404, 405}
+
+
+def document_hash(query: str) -> str:
+	return hashlib.sha256(query.encode()).hexdigest()
+
+
+def _error_messages(body: Any) -> Set[str]:
+	if not isinstance(body, dict):
+		return set()
+	messages = set()
+	for error in body.get("errors") or []:
+		messages.add(error.get("message", ""))
+		code = (error.get("extensions") or {}).get("code", "")
+		if code == "PERSISTED_QUERY_NOT_FOUND":
+			messages.add(NOT_FOUND)
+		elif code == "PERSISTED_QUERY_NOT_SUPPORTED":
+			messages.add(NOT_SUPPORTED)
+	return messages
+
+
+class PersistedQueryRegistry:
+	"""
+	Documents the client sends by hash (automatic persisted queries, the
+	Apollo `extensions.persistedQuery` protocol).
+
+	A registered document goes out as its sha256 plus variables. A server
+	that has not seen the hash answers PersistedQueryNotFound, and the
+	client sends the hash together with the full document once so the
+	server can store it. Endpoints that do not support the protocol are
+	remembered and get full documents from then on.
+
+	`pinned` documents (the fixed queries in query.py) are hashed once at
+	import and never evicted; other documents that recur, such as the
+	identity batch queries, are kept up to `max_documents`, least recently
+	used first out.
+	"""
+
+	def __init__(self, pinned: Iterable[str] = (), max_documents: Optional[int] = None, enabled: Optional[bool] = None):
+		self.enabled = enabled if enabled is not None else os.getenv("GRAPHQL_PERSISTED_QUERIES", "1") != "0"
+		self.max_documents = max_documents or int(os.getenv("GRAPHQL_PERSISTED_QUERIES_MAX", "128"))
+		self._pinned = {document_hash(query): query for query in pinned}
+		self._documents: "OrderedDict[str, str]" = OrderedDict()
+		self._unsupported: Set[str] = set()
+
+	def __len__(self) -> int:
+		return len(self._pinned) + len(self._documents)
+
+	def register(self, query: str) -> str:
+		digest = document_hash(query)
+		if digest in self._pinned:
+			return digest
+		self._documents[digest] = query
+		self._documents.move_to_end(digest)
+		while len(self._documents) > self.max_documents:
+			self._documents.popitem(last=False)
+		return digest
+
+	def lookup(self, query: str) -> Optional[str]:
+		"""the hash of a registered document, None for documents sent in full"""
+		digest = document_hash(query)
+		if digest in self._pinned:
+			return digest
+		if digest in self._documents:
+			self._documents.move_to_end(digest)
+			return digest
+		return None
+
+	def document(self, digest: str) -> Optional[str]:
+		return self._pinned.get(digest) or self._documents.get(digest)
+
+	def applies_to(self, url: str) -> bool:
+		return self.enabled and url not in self._unsupported
+
+	@staticmethod
+	def extension(digest: str) -> dict:
+		return {"persistedQuery": {"version": 1, "sha256Hash": digest}}
+
+	def hashed_payload(self, digest: str, query_obj: dict) -> dict:
+		payload = {key: value for key, value in query_obj.items() if key != "query"}
+		payload["extensions"] = {**(query_obj.get("extensions") or {}), **self.extension(digest)}
+		return payload
+
+	def full_payload(self, digest: str, query_obj: dict) -> dict:
+		return {**query_obj, "extensions": {**(query_obj.get("extensions") or {}), **self.extension(digest)}}
+
+	def classify(self, status_code: int, body: Any) -> str:
+		"""
+		outcome of a hash-only request: hit, not_found, unsupported, rejected
+		when the server refused the request as malformed (servers without APQ
+		often answer a request that has no document with a generic 400), or
+		error for anything else, such as a 5xx or a GraphQL error, which says
+		nothing about persisted-query support
+		"""
+		messages = _error_messages(body)
+		if NOT_FOUND in messages:
+			return "not_found"
+		if NOT_SUPPORTED in messages:
+			return "unsupported"
+		if status_code in REJECTED_STATUSES:
+			return "rejected"
+		if status_code >= 400 or not isinstance(body, dict):
+			return "error"
+		return "hit"
+
+	def mark_unsupported(self, url: str):
+		if url not in self._unsupported:
+			print(f"Persisted queries are not supported by {url}, sending full documents")
+			self._unsupported.add(url)
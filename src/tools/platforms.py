@@ -1,3 +1,4 @@
+import sys
 from enum import Enum
 
 class Platform(Enum):
@@ -72,4 +73,9 @@ class Platform(Enum):
 	WARPCAST = "warpcast"
 	OPENSEA = "opensea"
 	ICEBREAKER = "icebreaker"
-	TALLY = "tally"
\ No newline at end of file
+	TALLY = "tally"
+
+# the tools import this module as `platforms`, the chatbot (src/) as `tools.platforms`; both names must
+# resolve to this one module, or a process loading both gets two Platform enums and isinstance checks fail
+sys.modules.setdefault("platforms", sys.modules[__name__])
+sys.modules.setdefault("tools.platforms", sys.modules[__name__])
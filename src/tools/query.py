@@ -1,6 +1,5 @@
-IDENTITY_QUERY = '''
-query QUERY_PROFILE($platform: Platform!, $identity: String!) {
-	identity(platform: $platform, identity: $identity) {
+# selection set of one `identity` lookup, shared by the single and the batched queries
+IDENTITY_FIELDS = '''
 		id
 		status
 		aliases
@@ -75,7 +74,11 @@ query QUERY_PROFILE($platform: Platform!, $identity: String!) {
 				}
 			}
 		}
-	}
+'''
+
+IDENTITY_QUERY = '''
+query QUERY_PROFILE($platform: Platform!, $identity: String!) {
+	identity(platform: $platform, identity: $identity) {''' + IDENTITY_FIELDS + '''	}
 }
 '''
 
@@ -91,16 +94,59 @@ query {
       fields {
         name
         description
-        type {
+        args {
           name
-          kind
-          ofType {
-            name
-            kind
+          type {
+            ...TypeRef
           }
         }
+        type {
+          ...TypeRef
+        }
+      }
+      inputFields {
+        name
+        type {
+          ...TypeRef
+        }
+      }
+      enumValues {
+        name
+      }
+      interfaces {
+        ...TypeRef
+      }
+      possibleTypes {
+        ...TypeRef
+      }
+    }
+    directives {
+      name
+      locations
+      args {
+        name
+        type {
+          ...TypeRef
+        }
+      }
+    }
+  }
+}
+
+fragment TypeRef on __Type {
+  name
+  kind
+  ofType {
+    name
+    kind
+    ofType {
+      name
+      kind
+      ofType {
+        name
+        kind
       }
     }
   }
 }
-'''
\ No newline at end of file
+'''
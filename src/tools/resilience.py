@@ -0,0 +1,224 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+from metrics import REGISTRY
+
+T = TypeVar("T")
+
+RETRIES = REGISTRY.counter("graphql_upstream_retries_total", "Upstream attempts retried after a transient failure, by reason", ("reason",))
+REJECTED = REGISTRY.counter("graphql_upstream_rejected_total", "Upstream calls failed fast because the circuit breaker was open")
+BREAKER_TRANSITIONS = REGISTRY.counter("graphql_circuit_breaker_transitions_total", "Circuit breaker state changes, by new state", ("state",))
+HEDGES = REGISTRY.counter("graphql_hedged_requests_total", "Hedged duplicate requests: fired, and won when the duplicate answered first", ("outcome",))
+
+# statuses worth another attempt; other 4xx/5xx answers will not change on retry
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _env_float(name: str, default: float) -> float:
+	value = os.getenv(name)
+	return float(value) if value else default
+
+
+class UpstreamHTTPError(Exception):
+	def __init__(self, status_code: int, reason: str = ""):
+		super().__init__(f"HTTP {status_code}: {reason}".rstrip(": "))
+		self.status_code = status_code
+
+
+class CircuitOpenError(Exception):
+	pass
+
+
+def retry_reason(error: BaseException) -> Optional[str]:
+	"""why `error` is transient (timeout, connect, http_502, ...), None when retrying cannot help"""
+	if isinstance(error, (TimeoutError, asyncio.TimeoutError, httpx.TimeoutException)):
+		return "timeout"
+	if isinstance(error, httpx.TransportError):
+		return "connect"
+	if isinstance(error, UpstreamHTTPError) and error.status_code in RETRYABLE_STATUSES:
+		return f"http_{error.status_code}"
+	return None
+
+
+class CircuitBreaker:
+	"""
+	Opens after `failure_threshold` consecutive transient failures and then
+	fails calls fast for `reset_timeout` seconds. After that one probe call
+	is let through (half-open): success closes the breaker, failure opens it
+	again.
+	"""
+
+	CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+	def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+		self.failure_threshold = failure_threshold or int(os.getenv("GRAPHQL_BREAKER_THRESHOLD", "5"))
+		self.reset_timeout = reset_timeout or _env_float("GRAPHQL_BREAKER_RESET", 30.0)
+		self.state = self.CLOSED
+		self.failures = 0
+		self.opened_at = 0.0
+		self._probing = False
+
+	def _transition(self, state: str):
+		if state != self.state:
+			self.state = state
+			BREAKER_TRANSITIONS.inc(state)
+
+	def before_call(self):
+		"""raise CircuitOpenError unless a call may go upstream now"""
+		if self.state == self.OPEN:
+			if time.monotonic() - self.opened_at < self.reset_timeout:
+				REJECTED.inc()
+				raise CircuitOpenError(f"upstream circuit open after {self.failures} consecutive failures")
+			self._transition(self.HALF_OPEN)
+		if self.state == self.HALF_OPEN:
+			if self._probing:
+				REJECTED.inc()
+				raise CircuitOpenError("upstream circuit half-open, waiting for the probe request")
+			self._probing = True
+
+	def record_success(self):
+		self._probing = False
+		self.failures = 0
+		self._transition(self.CLOSED)
+
+	def record_failure(self):
+		self._probing = False
+		self.failures += 1
+		if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+			self.opened_at = time.monotonic()
+			self._transition(self.OPEN)
+
+	def abandon(self):
+		"""the call was cancelled before it finished; let the next one probe"""
+		self._probing = False
+
+	@property
+	def state_value(self) -> int:
+		return {self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[self.state]
+
+
+class LatencyWindow:
+	"""recent successful call latencies, for the hedging delay"""
+
+	def __init__(self, size: int = 200):
+		self._samples: deque = deque(maxlen=size)
+
+	def __len__(self) -> int:
+		return len(self._samples)
+
+	def add(self, seconds: float):
+		self._samples.append(seconds)
+
+	def quantile(self, q: float) -> float:
+		ordered = sorted(self._samples)
+		return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientExecutor:
+	"""
+	Runs an upstream call with bounded retries, a circuit breaker and
+	optional hedging.
+
+	Only transient failures (see retry_reason) are retried, with full-jitter
+	exponential backoff and never beyond `max_elapsed` seconds in total. With
+	`hedge` on, a duplicate of a call that is still running after the p95 of
+	recent latencies is started and whichever answers first wins; only use it
+	for idempotent requests (GraphQL queries are).
+	"""
+
+	def __init__(
+		self,
+		breaker: Optional[CircuitBreaker] = None,
+		retries: Optional[int] = None,
+		base_delay: Optional[float] = None,
+		max_delay: Optional[float] = None,
+		max_elapsed: Optional[float] = None,
+		hedge: Optional[bool] = None,
+		hedge_quantile: float = 0.95,
+		hedge_min_samples: int = 20,
+		hedge_min_delay: Optional[float] = None,
+	):
+		self.breaker = breaker if breaker is not None else CircuitBreaker()
+		self.retries = retries if retries is not None else int(os.getenv("GRAPHQL_RETRIES", "2"))
+		self.base_delay = base_delay if base_delay is not None else _env_float("GRAPHQL_RETRY_BASE_DELAY", 0.2)
+		self.max_delay = max_delay if max_delay is not None else _env_float("GRAPHQL_RETRY_MAX_DELAY", 2.0)
+		self.max_elapsed = max_elapsed if max_elapsed is not None else _env_float("GRAPHQL_RETRY_MAX_ELAPSED", 20.0)
+		self.hedge = hedge if hedge is not None else os.getenv("GRAPHQL_HEDGE", "0") == "1"
+		self.hedge_quantile = hedge_quantile
+		self.hedge_min_samples = hedge_min_samples
+		self.hedge_min_delay = hedge_min_delay if hedge_min_delay is not None else _env_float("GRAPHQL_HEDGE_MIN_DELAY", 0.05)
+		self.latencies = LatencyWindow()
+
+	def backoff(self, attempt: int) -> float:
+		return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+	def hedge_delay(self) -> Optional[float]:
+		if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+			return None
+		return max(self.hedge_min_delay, self.latencies.quantile(self.hedge_quantile))
+
+	async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+		started = time.monotonic()
+		attempt = 0
+		while True:
+			self.breaker.before_call()
+			attempt_started = time.monotonic()
+			try:
+				result = await self._attempt(fn)
+			except asyncio.CancelledError:
+				self.breaker.abandon()
+				raise
+			except Exception as e:
+				reason = retry_reason(e)
+				if reason is None:
+					# the upstream answered, it is healthy even if the request was bad
+					self.breaker.record_success()
+					raise
+				self.breaker.record_failure()
+				delay = self.backoff(attempt)
+				if attempt >= self.retries or time.monotonic() - started + delay > self.max_elapsed:
+					raise
+				RETRIES.inc(reason)
+				attempt += 1
+				await asyncio.sleep(delay)
+			else:
+				self.breaker.record_success()
+				self.latencies.add(time.monotonic() - attempt_started)
+				return result
+
+	async def _attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+		delay = self.hedge_delay()
+		if delay is None:
+			return await fn()
+
+		primary = asyncio.ensure_future(fn())
+		tasks = {primary}
+		try:
+			done, _ = await asyncio.wait(tasks, timeout=delay)
+			if done:
+				return primary.result()
+
+			HEDGES.inc("fired")
+			hedged = asyncio.ensure_future(fn())
+			tasks.add(hedged)
+			pending = set(tasks)
+			error: Optional[BaseException] = None
+			while pending:
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					if task.exception() is None:
+						if task is hedged:
+							HEDGES.inc("won")
+						return task.result()
+					error = task.exception()
+			raise error
+		finally:
+			for task in tasks:
+				if not task.done():
+					task.cancel()
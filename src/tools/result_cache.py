@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# strings are kept verbatim; comments, whitespace and commas are insignificant in GraphQL
+_TOKEN_RE = re.compile(
+	r'(?P<string>"""(?:\\"""|[^"]|"(?!""))*"""|"(?:\\.|[^"\\])*")'
+	r'|(?P<ignored>#[^\n]*|[\s,]+)'
+	r'|(?P<punctuator>\.\.\.|[!$&():=@\[\]{|}])'
+	r'|(?P<word>[^\s,#"!$&():=@\[\]{|}.]+|\.)'
+)
+
+
+def normalize_query(query: str) -> str:
+	"""canonical form of a GraphQL document so formatting-only differences share a cache entry"""
+	parts = []
+	needs_space = False
+	for match in _TOKEN_RE.finditer(query):
+		kind = match.lastgroup
+		if kind == "ignored":
+			continue
+		is_word = kind != "punctuator"
+		if is_word and needs_space:
+			parts.append(" ")
+		parts.append(match.group(0))
+		needs_space = is_word
+	return "".join(parts)
+
+
+def _retrieve_exception(task: asyncio.Future):
+	# every caller may have been cancelled before the fetch failed
+	if not task.cancelled():
+		task.exception()
+
+
+class ResultCache:
+	"""
+	In-process cache of upstream GraphQL results.
+
+	Entries are keyed on the normalized document plus variables, bounded by
+	their serialized size (LRU eviction) and expire after `ttl` seconds.
+	Error results are cached too, for the shorter `error_ttl`, so a failing
+	lookup is not hammered upstream. Concurrent misses for the same key are
+	coalesced into a single upstream call.
+	"""
+
+	def __init__(
+		self,
+		max_bytes: Optional[int] = None,
+		ttl: Optional[float] = None,
+		error_ttl: Optional[float] = None,
+	):
+		self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+		self.ttl = ttl if ttl is not None else float(os.getenv("RESULT_CACHE_TTL", "300"))
+		self.error_ttl = error_ttl if error_ttl is not None else float(os.getenv("RESULT_CACHE_ERROR_TTL", "10"))
+		# key -> (expires_at, size, result)
+		self._entries: "OrderedDict[str, Tuple[float, int, dict]]" = OrderedDict()
+		self._inflight: Dict[str, asyncio.Future] = {}
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self.negative_hits = 0
+		self.coalesced = 0
+		self.evictions = 0
+		self.expirations = 0
+
+	@staticmethod
+	def make_key(query: str, variables: Optional[dict] = None) -> str:
+		payload = normalize_query(query) + "\n" + json.dumps(variables or {}, sort_keys=True, separators=(",", ":"))
+		return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+	def get(self, key: str) -> Optional[dict]:
+		entry = self._entries.get(key)
+		if entry is None:
+			return None
+		expires_at, size, result = entry
+		if expires_at < time.monotonic():
+			self._remove(key)
+			self.expirations += 1
+			return None
+		self._entries.move_to_end(key)
+		return result
+
+	def put(self, key: str, result: dict):
+		ttl = self.error_ttl if "error" in result else self.ttl
+		if ttl <= 0:
+			return
+		size = len(json.dumps(result, separators=(",", ":"), default=str))
+		if size > self.max_bytes:
+			return
+		if key in self._entries:
+			self._remove(key)
+		self._entries[key] = (time.monotonic() + ttl, size, result)
+		self.size += size
+		while self.size > self.max_bytes:
+			oldest = next(iter(self._entries))
+			self._remove(oldest)
+			self.evictions += 1
+
+	def _remove(self, key: str):
+		_, size, _ = self._entries.pop(key)
+		self.size -= size
+
+	def clear(self):
+		self._entries.clear()
+		self.size = 0
+
+	async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[dict]]) -> dict:
+		"""return the cached result for `key` or run `fetch` once for all concurrent callers"""
+		result = self.get(key)
+		if result is not None:
+			self.hits += 1
+			if "error" in result:
+				self.negative_hits += 1
+			return result
+
+		inflight = self._inflight.get(key)
+		if inflight is not None:
+			self.coalesced += 1
+		else:
+			self.misses += 1
+			# the fetch belongs to the cache, not to the first caller: cancelling one caller leaves the others waiting
+			inflight = self._inflight[key] = asyncio.ensure_future(self._fetch(key, fetch))
+			inflight.add_done_callback(_retrieve_exception)
+		return await asyncio.shield(inflight)
+
+	async def _fetch(self, key: str, fetch: Callable[[], Awaitable[dict]]) -> dict:
+		try:
+			result = await fetch()
+			self.put(key, result)
+			return result
+		finally:
+			del self._inflight[key]
+
+	def stats(self) -> dict:
+		lookups = self.hits + self.misses
+		return {
+			"entries": len(self._entries),
+			"bytes": self.size,
+			"max_bytes": self.max_bytes,
+			"hits": self.hits,
+			"negative_hits": self.negative_hits,
+			"misses": self.misses,
+			"coalesced": self.coalesced,
+			"evictions": self.evictions,
+			"expirations": self.expirations,
+			"hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+			"inflight": len(self._inflight),
+		}
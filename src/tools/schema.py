@@ -1,7 +1,138 @@
-from typing import Dict
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+def render_type(type_ref: Optional[Dict]) -> str:
+  """render an introspection type reference in SDL notation, e.g. `[Identity!]!`"""
+  if not type_ref:
+    return "?"
+  kind = type_ref.get("kind")
+  if kind == "NON_NULL":
+    return render_type(type_ref.get("ofType")) + "!"
+  if kind == "LIST":
+    return "[" + render_type(type_ref.get("ofType")) + "]"
+  return type_ref.get("name") or "?"
+
+def named_type(type_ref: Optional[Dict]) -> Optional[str]:
+  """unwrap NON_NULL/LIST wrappers and return the named type"""
+  while type_ref and not type_ref.get("name"):
+    type_ref = type_ref.get("ofType")
+  return type_ref.get("name") if type_ref else None
+
+class SchemaIndex:
+  """lookup tables over an introspection result, built once per schema"""
+
+  def __init__(self, schema_data: Dict):
+    root = schema_data.get("__schema", {})
+    self.query_type = (root.get("queryType") or {}).get("name") or "Query"
+    self.types: Dict[str, Dict] = {
+      t["name"]: t for t in root.get("types") or [] if t.get("name") and not t["name"].startswith("__")
+    }
+    self._names = {name.lower(): name for name in self.types}
+
+    # type name -> field name -> SDL signature / rendered result type / named result type
+    self.fields: Dict[str, Dict[str, str]] = {}
+    self.return_types: Dict[str, Dict[str, str]] = {}
+    self.field_types: Dict[str, Dict[str, Optional[str]]] = {}
+    # field name -> types declaring it
+    self.field_owners: Dict[str, List[str]] = {}
+    self.enum_values: Dict[str, List[str]] = {}
+
+    for name, t in self.types.items():
+      if t.get("kind") == "ENUM":
+        self.enum_values[name] = [v["name"] for v in t.get("enumValues") or []]
+      fields = t.get("fields") or t.get("inputFields") or []
+      self.fields[name] = {f["name"]: self._signature(f) for f in fields}
+      self.return_types[name] = {f["name"]: render_type(f.get("type")) for f in fields}
+      self.field_types[name] = {f["name"]: named_type(f.get("type")) for f in fields}
+      for f in fields:
+        self.field_owners.setdefault(f["name"], []).append(name)
+
+  @staticmethod
+  def _signature(field: Dict) -> str:
+    args = field.get("args") or []
+    arg_list = ", ".join(f"{a['name']}: {render_type(a.get('type'))}" for a in args)
+    params = f"({arg_list})" if args else ""
+    return f"{field['name']}{params}: {render_type(field.get('type'))}"
+
+  def resolve_type_name(self, name: str) -> Optional[str]:
+    """case-insensitive type name lookup"""
+    return self._names.get(name.strip().lower())
+
+  def describe_type(self, name: str) -> str:
+    """compact SDL of a single type"""
+    type_name = self.resolve_type_name(name)
+    if type_name is None:
+      return f"Unknown type '{name}'"
+    kind = self.types[type_name].get("kind")
+    if kind == "ENUM":
+      return f"enum {type_name} {{ {' '.join(self.enum_values[type_name])} }}"
+    if kind == "SCALAR":
+      return f"scalar {type_name}"
+    keyword = {"INPUT_OBJECT": "input", "INTERFACE": "interface", "UNION": "union"}.get(kind, "type")
+    body = "\n".join(f"  {sig}" for sig in self.fields[type_name].values())
+    return f"{keyword} {type_name} {{\n{body}\n}}"
+
+  def find_field_paths(self, field_name: str, max_depth: int = 5, limit: int = 5) -> List[str]:
+    """
+    selection paths from the query root to the types declaring `field_name`; every shortest path
+    to such a type is listed (a type reachable through several parents has several), at most `limit`
+    """
+    paths: List[str] = []
+    # a type is expanded along each of its shortest paths (at most `limit` of them), never a longer one
+    depth = {self.query_type: 0}
+    routes: Dict[str, int] = {}
+    queue = deque([(self.query_type, [])])
+    while queue and len(paths) < limit:
+      type_name, path = queue.popleft()
+      for field, child in self.field_types.get(type_name, {}).items():
+        hop = path + [f"{type_name}.{field}"]
+        if field == field_name:
+          paths.append(" -> ".join(hop) + f": {self.return_types[type_name][field]}")
+          if len(paths) >= limit:
+            break
+        if len(hop) >= max_depth or self.types.get(child, {}).get("kind") not in ("OBJECT", "INTERFACE"):
+          continue
+        if depth.setdefault(child, len(hop)) != len(hop) or routes.get(child, 0) >= limit:
+          continue
+        routes[child] = routes.get(child, 0) + 1
+        queue.append((child, hop))
+    return paths
+
+  def summary(self) -> str:
+    """root query fields plus the names of the other types, for a first look at the schema"""
+    kinds: Dict[str, List[str]] = {}
+    for name, t in self.types.items():
+      if name != self.query_type:
+        kinds.setdefault(t.get("kind", "OTHER"), []).append(name)
+    lines = [self.describe_type(self.query_type)]
+    for kind in ("OBJECT", "INTERFACE", "UNION", "INPUT_OBJECT", "ENUM", "SCALAR"):
+      if kind in kinds:
+        lines.append(f"{kind.lower()}: {', '.join(sorted(kinds[kind]))}")
+    return "\n".join(lines)
 
 class SchemaInfo:
-  def __init__(self, name: str, endpoint: str, schema_data: Dict):
+  def __init__(self, name: str, endpoint: str, schema_data: Dict, fetched_at: Optional[float] = None):
     self.name = name
     self.endpoint = endpoint
     self.schema = schema_data
+    self.fetched_at = time.time() if fetched_at is None else fetched_at
+    self._index: Optional[SchemaIndex] = None
+    self._validator = None
+
+  def age(self) -> float:
+    return time.time() - self.fetched_at
+
+  @property
+  def index(self) -> SchemaIndex:
+    if self._index is None:
+      self._index = SchemaIndex(self.schema)
+    return self._index
+
+  @property
+  def validator(self):
+    """QueryValidator for this schema, built on first use"""
+    if self._validator is None:
+      from validation import QueryValidator
+      self._validator = QueryValidator(self.schema)
+    return self._validator
@@ -0,0 +1,108 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from schema import SchemaInfo
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "schemas.json.gz")
+# bump when the cached payload changes shape (e.g. INTROSPECTION_QUERY selects more fields)
+CACHE_VERSION = 3
+
+
+class SchemaCache:
+	"""
+	Introspection results keyed by endpoint URL.
+
+	Entries expire after `ttl` seconds and are persisted to `path` as
+	gzip-compressed compact JSON, so a restarted server answers schema
+	tools without another introspection round trip.
+	"""
+
+	def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None):
+		self.path = path or os.getenv("SCHEMA_CACHE_PATH", DEFAULT_CACHE_PATH)
+		self.ttl = ttl if ttl is not None else float(os.getenv("SCHEMA_CACHE_TTL", "86400"))
+		self._entries: Dict[str, SchemaInfo] = {}
+
+	def __contains__(self, endpoint: str) -> bool:
+		return self.get(endpoint) is not None
+
+	def get(self, endpoint: str) -> Optional[SchemaInfo]:
+		"""return the schema for `endpoint`, or None when missing or expired"""
+		schema_info = self._entries.get(endpoint)
+		if schema_info is None:
+			return None
+		if schema_info.age() > self.ttl:
+			del self._entries[endpoint]
+			return None
+		return schema_info
+
+	def values(self) -> List[SchemaInfo]:
+		"""all unexpired entries"""
+		return [s for s in (self.get(endpoint) for endpoint in list(self._entries)) if s is not None]
+
+	def put(self, schema_info: SchemaInfo, persist: bool = True):
+		self._entries[schema_info.endpoint] = schema_info
+		if persist:
+			self.save()
+
+	def invalidate(self, endpoint: Optional[str] = None, persist: bool = True) -> int:
+		"""drop one endpoint (or everything) from memory and disk, return the number removed"""
+		if endpoint is None:
+			removed = len(self._entries)
+			self._entries.clear()
+		else:
+			removed = 1 if self._entries.pop(endpoint, None) is not None else 0
+		if persist:
+			self.save()
+		return removed
+
+	def load(self) -> int:
+		"""load unexpired entries from disk, return how many were loaded"""
+		try:
+			with gzip.open(self.path, "rt", encoding="utf-8") as f:
+				raw = json.load(f)
+		except FileNotFoundError:
+			return 0
+		except (OSError, ValueError) as e:
+			print(f"Ignoring unreadable schema cache {self.path}: {e}")
+			return 0
+
+		if raw.get("version") != CACHE_VERSION:
+			return 0
+
+		now = time.time()
+		for entry in raw.get("entries", []):
+			if now - entry["fetched_at"] > self.ttl:
+				continue
+			self._entries[entry["endpoint"]] = SchemaInfo(
+				entry["name"], entry["endpoint"], entry["schema"], entry["fetched_at"]
+			)
+		return len(self._entries)
+
+	def save(self):
+		"""atomically write all entries to disk"""
+		raw = {
+			"version": CACHE_VERSION,
+			"entries": [
+				{
+					"name": s.name,
+					"endpoint": s.endpoint,
+					"fetched_at": s.fetched_at,
+					"schema": s.schema,
+				}
+				for s in self._entries.values()
+			],
+		}
+		directory = os.path.dirname(self.path) or "."
+		os.makedirs(directory, exist_ok=True)
+		fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+		try:
+			with os.fdopen(fd, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb") as gz:
+				gz.write(json.dumps(raw, separators=(",", ":")).encode("utf-8"))
+			os.replace(tmp_path, self.path)
+		except BaseException:
+			os.unlink(tmp_path)
+			raise
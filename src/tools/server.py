@@ -1,20 +1,76 @@
+import asyncio
+import time
 from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware
 from pydantic import Field
-import requests
 import os
 from platforms import Platform
 from query import INTROSPECTION_QUERY, IDENTITY_QUERY
 from dotenv import load_dotenv
-from typing import Annotated, Dict
+from typing import Annotated, Dict, List, Optional
 from schema import SchemaInfo
+from schema_cache import SchemaCache
+from graphql_client import GraphQLClient
+from result_cache import ResultCache
+from identity_store import IdentityStore
+from persisted_queries import PersistedQueryRegistry
+from resilience import CircuitOpenError, ResilientExecutor, UpstreamHTTPError, retry_reason
+from shaping import DEFAULT_MAX_BYTES, DEFAULT_VERTEX_LIMIT, shape_result
+from identity import IdentityRef, build_identity_batch_query, chunked, identity_key, parse_platform, split_batch_result
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from metrics import CONTENT_TYPE, ENABLED as METRICS_ENABLED, REGISTRY
 load_dotenv()
 
 mcp = FastMCP(name="relate-account")
 
 url = os.getenv("DATA_API_URL", "https://graph.web3.bio/graphql")
-schemas: Dict[str, SchemaInfo] = {}
+schemas = SchemaCache()
+schemas.load()
+for _schema_info in schemas.values():
+	_schema_info.index  # build lookup tables before the first tool call
+# the fixed documents go upstream as sha256 hashes (persisted queries)
+persisted_queries = PersistedQueryRegistry(pinned=[IDENTITY_QUERY, INTROSPECTION_QUERY])
+graphql_client = GraphQLClient(persisted_queries=persisted_queries)
+result_cache = ResultCache()
+# every identity graph fetched with the IDENTITY_QUERY selection, indexed by each of its vertices
+identity_store = IdentityStore()
+# retries, circuit breaker and optional hedging around every upstream request
+upstream = ResilientExecutor()
+identity_batch_size = int(os.getenv("IDENTITY_BATCH_SIZE", "10"))
+_schema_lock = asyncio.Lock()
+# a failed introspection is remembered briefly, so during an outage queries do not each pay for another attempt
+schema_error_ttl = float(os.getenv("SCHEMA_ERROR_TTL", "30"))
+_schema_error: Optional[tuple] = None
 
-def execute_graphql_query(query_obj: dict, url: str, timeout: int = 10000) -> dict:
+TOOL_SECONDS = REGISTRY.histogram("mcp_tool_seconds", "Server-side duration of MCP tool calls", ("tool", "status"))
+REGISTRY.collect(
+	"graphql_result_cache_lookups_total", "counter", "Result cache lookups by outcome; coalesced calls waited for an identical in-flight query",
+	lambda: {("hit",): result_cache.hits, ("miss",): result_cache.misses, ("coalesced",): result_cache.coalesced},
+	("result",),
+)
+REGISTRY.collect("graphql_result_cache_bytes", "gauge", "Bytes held by the result cache", lambda: result_cache.size)
+REGISTRY.collect(
+	"graphql_circuit_breaker_state", "gauge", "Upstream circuit breaker: 0 closed, 1 half-open, 2 open", lambda: upstream.breaker.state_value
+)
+
+class ToolMetrics(Middleware):
+	"""time every tool call on the server side, MCP transport excluded"""
+
+	async def on_call_tool(self, context, call_next):
+		started = time.perf_counter()
+		status = "error"
+		try:
+			result = await call_next(context)
+			status = "ok"
+			return result
+		finally:
+			TOOL_SECONDS.observe(time.perf_counter() - started, context.message.name, status)
+
+if METRICS_ENABLED:
+	mcp.add_middleware(ToolMetrics())
+
+async def execute_graphql_query(query_obj: dict, url: str, deadline: Optional[float] = None, partial: bool = False) -> dict:
 	headers = {
 		"Content-Type": "application/json",
 		"User-Agent": "relate-account-mcp/3.0.0",
@@ -22,42 +78,108 @@ def execute_graphql_query(query_obj: dict, url: str, timeout: int = 10000) -> di
 	access_token = os.getenv("ACCESS_TOKEN")
 	if access_token:
 		headers["Authorization"] = access_token
-	try:
-		response = requests.post(
+
+	async def attempt() -> dict:
+		response, json_data = await graphql_client.post_query(
 			url,
-			json=query_obj,
+			query_obj,
 			headers=headers,
-			timeout=timeout
+			deadline=deadline
 		)
-		if not response.ok:
-			raise Exception(f"HTTP {response.status_code}: {response.reason}")
-		json_data = response.json()
+		if response.is_error:
+			raise UpstreamHTTPError(response.status_code, response.reason_phrase)
+		return json_data
+
+	try:
+		# transient failures (timeouts, 429/5xx) are retried, GraphQL errors are not
+		json_data = await upstream.call(attempt)
+		if partial and json_data.get("data"):
+			# keep the data of the fields that did resolve, report the rest alongside
+			data = dict(json_data["data"])
+			if json_data.get("errors"):
+				data["errors"] = json_data["errors"]
+			return data
 		if "errors" in json_data:
 			raise Exception(
 				"GraphQL errors: " + ", ".join(e.get("message", str(e)) for e in json_data["errors"])
 			)
 		return json_data.get("data", {})
 	except Exception as e:
-		return {"error": f"Query failed: {e}"}
+		error = {"error": f"Query failed: {e}"}
+		# the upstream is down, overloaded or refuses our credentials: the same query may work later,
+		# unlike one the upstream rejects as invalid
+		if isinstance(e, CircuitOpenError) or retry_reason(e) is not None or (isinstance(e, UpstreamHTTPError) and e.status_code in (401, 403)):
+			error["transient"] = True
+		return error
+
+async def cached_graphql_query(query_obj: dict, url: str, partial: bool = False, ingest: bool = False) -> dict:
+	"""
+	execute_graphql_query behind the result cache; repeated and concurrent identical queries share one upstream call.
+	`ingest` stores the identity graphs of a fresh upstream answer (not of cache hits), only pass it for IDENTITY_QUERY selections.
+	"""
+	key = result_cache.make_key(url + "\n" + query_obj["query"], query_obj.get("variables"))
+
+	async def fetch() -> dict:
+		data = await execute_graphql_query(query_obj, url, partial=partial)
+		if ingest and "error" not in data:
+			identity_store.ingest(data)
+		return data
+
+	return await result_cache.get_or_fetch(key, fetch)
+
+async def get_schema(refresh: bool = False) -> SchemaInfo:
+	"""Return the cached schema of the endpoint, introspecting upstream only when it is missing or stale"""
+	global _schema_error
+	schema_info = None if refresh else schemas.get(url)
+	if schema_info is not None:
+		return schema_info
+	async with _schema_lock:
+		# another session may have fetched it while we waited
+		schema_info = None if refresh else schemas.get(url)
+		if schema_info is None:
+			if not refresh and _schema_error is not None and _schema_error[0] > time.monotonic():
+				raise Exception(_schema_error[1])
+			data = await execute_graphql_query({"query": INTROSPECTION_QUERY}, url)
+			if "error" in data:
+				_schema_error = (time.monotonic() + schema_error_ttl, data["error"])
+				raise Exception(data["error"])
+			_schema_error = None
+			schema_info = SchemaInfo("web3.bio", url, data)
+			schema_info.index
+			schemas.put(schema_info)
+	return schema_info
+
+async def validate_query(query_statement: str) -> List[str]:
+	"""local validation errors against the cached schema; none when the query is fine or no schema is available"""
+	try:
+		validator = (await get_schema()).validator
+	except Exception as e:
+		print(f"Local query validation skipped: {e}")
+		return []
+	return validator.check(query_statement)
 	
 @mcp.tool(
 	name="discover-query-schema",
-	description="Discover the query schema for the given endpoint, the given endpoint is provided by web3.bio which is used as a crypto-related identity graph service provider. Users can use web3.bio to query all identity information of a specific platform identity. You should first use this tool to discover the query schema for the given endpoint to help build the query statement before you execute the query.",
+	description="Discover the query schema for the given endpoint, the given endpoint is provided by web3.bio which is used as a crypto-related identity graph service provider. Users can use web3.bio to query all identity information of a specific platform identity. You should first use this tool to discover the query schema for the given endpoint to help build the query statement before you execute the query. It returns the root query fields with their arguments and the names of all other types; use describe-type and find-field-path for details.",
 )
-def discover_query_schema() -> str:
-	query_obj = {
-		"query": INTROSPECTION_QUERY,
-	}
-	data = execute_graphql_query(query_obj, url)
-	schemas["web3.bio"] = SchemaInfo("web3.bio", url, data)
-	return str(data)
+async def discover_query_schema(
+	refresh: Annotated[bool, Field(description="Ignore the cached schema and introspect the endpoint again.")] = False
+) -> str:
+	try:
+		schema_info = await get_schema(refresh)
+	except Exception as e:
+		return f"Schema discovery failed: {e}"
+	return schema_info.index.summary()
 
 @mcp.tool(
 	name="analyze-schema",
 	description="Analyze the schema of the given endpoint, the given endpoint is provided by web3.bio which is used as a crypto-related identity graph service provider. This tool will be used to parse the fetched schema data and formalize it into a standard format for future use (etc. build query statement and execute the query).",
 )
-def analyze_schema() -> str:
-	schema_info = schemas["web3.bio"]
+async def analyze_schema() -> str:
+	try:
+		schema_info = await get_schema()
+	except Exception as e:
+		return f"Schema discovery failed: {e}"
 
 	types = schema_info.schema.get("__schema", {}).get("types", [])
 	# Filter out internal types
@@ -73,21 +195,71 @@ def analyze_schema() -> str:
 	}
 	return str(analysis)
 
+@mcp.tool(
+	name="describe-type",
+	description="Describe one type of the web3.bio schema in compact SDL: the fields of an object or input type with their argument signatures, or the values of an enum (e.g. Platform). Use this instead of reading the whole schema.",
+)
+async def describe_type(
+	type_name: Annotated[str, Field(description="The GraphQL type name, e.g. Identity, IdentityGraph or Platform.")]
+) -> str:
+	try:
+		schema_info = await get_schema()
+	except Exception as e:
+		return f"Schema discovery failed: {e}"
+	return schema_info.index.describe_type(type_name)
+
+@mcp.tool(
+	name="find-field-path",
+	description="Find where a field lives in the web3.bio schema: every shortest selection path from the root Query type down to the types that declare the field (a type reachable through several parents is listed once per path), e.g. 'vertices' -> Query.identity -> Identity.identityGraph -> IdentityGraph.vertices.",
+)
+async def find_field_path(
+	field_name: Annotated[str, Field(description="The field name to look for, e.g. displayName or graphId.")]
+) -> str:
+	try:
+		schema_info = await get_schema()
+	except Exception as e:
+		return f"Schema discovery failed: {e}"
+	index = schema_info.index
+	paths = index.find_field_paths(field_name)
+	if paths:
+		return "\n".join(paths)
+	owners = index.field_owners.get(field_name)
+	if owners:
+		return f"'{field_name}' is declared on {', '.join(owners)} but is not reachable from {index.query_type}"
+	return f"No type declares a field named '{field_name}'"
+
+@mcp.tool(
+	name="invalidate-schema-cache",
+	description="Drop the cached schema of the web3.bio endpoint so the next schema tool call introspects it again. Only use this when the schema looks outdated.",
+)
+def invalidate_schema_cache() -> str:
+	global _schema_error
+	_schema_error = None
+	removed = schemas.invalidate(url)
+	return f"Invalidated {removed} cached schema(s)"
+
 @mcp.tool(
 	name="execute-query",
-	description="Execute the query statement for the given endpoint, the given endpoint is provided by web3.bio which is used as a crypto-related identity graph service provider. This tool will be used to execute the query statement for the given endpoint based on the schema analysis result.",
+	description="Execute the query statement for the given endpoint, the given endpoint is provided by web3.bio which is used as a crypto-related identity graph service provider. This tool will be used to execute the query statement for the given endpoint based on the schema analysis result. The query is first validated locally against the schema; invalid, too deep or too costly queries are rejected at once with the exact errors, so fix them and retry. The result is compact JSON: null fields are dropped, addresses are written as network:address, identityGraph vertices are paged and long lists end with a 'truncated, N more' marker.",
 )
-def execute_query(
-	query_statement: Annotated[str, Field(description="The query statement to execute, which is generated by the graphql_agent.")]
+async def execute_query(
+	query_statement: Annotated[str, Field(description="The query statement to execute, which is generated by the graphql_agent.")],
+	fields: Annotated[Optional[List[str]], Field(description="Only return these dotted result paths, e.g. ['identity.identityGraph.vertices.identity', 'identity.identityGraph.vertices.platform']. Omit to return everything.")] = None,
+	vertex_offset: Annotated[int, Field(description="Skip this many identityGraph vertices (for paging).", ge=0)] = 0,
+	vertex_limit: Annotated[int, Field(description="Return at most this many identityGraph vertices.", ge=1)] = DEFAULT_VERTEX_LIMIT,
+	max_tokens: Annotated[Optional[int], Field(description="Approximate token budget of the returned JSON; longer results are truncated with a 'truncated, N more' marker.", ge=100)] = None,
 ) -> str:
 	"""
 	执行 GraphQL 查询语句
 	
 	Args:
 		query_statement: 从 graphql_agent 传来的查询语句
+		fields: 只保留的结果字段路径
+		vertex_offset / vertex_limit: identityGraph 顶点分页
+		max_tokens: 返回结果的大致 token 预算
 		
 	Returns:
-		查询结果的字符串表示
+		紧凑 JSON 格式的查询结果
 	"""
 	try:
 		# 构建查询对象
@@ -95,21 +267,103 @@ def execute_query(
 			"query": query_statement
 		}
 		
-		# 执行 GraphQL 查询
-		result = execute_graphql_query(query_obj, url)
+		# 先用缓存的 schema 在本地校验，有错误的查询不再访问上游
+		errors = await validate_query(query_statement)
+		if errors:
+			return "查询执行失败: 本地校验未通过: " + "; ".join(errors)
+		
+		# 执行 GraphQL 查询（命中缓存时不访问上游）
+		result = await cached_graphql_query(query_obj, url)
 		
 		# 检查是否有错误
 		if "error" in result:
 			return f"查询执行失败: {result['error']}"
 		
-		# 返回查询结果
-		return str(result)
+		# 返回裁剪后的紧凑 JSON 结果
+		return shape_result(result, fields, vertex_offset, vertex_limit, max_tokens=max_tokens)
 		
 	except Exception as e:
 		return f"执行查询时发生错误: {str(e)}"
 
+@mcp.tool(
+	name="lookup-identity",
+	description="Look up one identity on web3.bio with a fixed, known-good query: its profile, addresses and the whole identity graph of linked identities on other platforms (ENS, Farcaster, Lens, addresses, ...). Use this whenever the question is about a single identity whose platform is known; no schema discovery is needed. Identities that appeared in an identity graph fetched earlier are answered from the local identity store without an upstream request.",
+)
+async def lookup_identity(
+	platform: Annotated[str, Field(description="The platform of the identity, a value of the Platform enum, e.g. ens, farcaster, lens, ethereum.")],
+	identity: Annotated[str, Field(description="The identity on that platform, e.g. vitalik.eth.")],
+) -> str:
+	try:
+		platform_value = parse_platform(platform).value
+	except ValueError as e:
+		return f"查询执行失败: {e}"
+	query_obj = {
+		"query": IDENTITY_QUERY,
+		"variables": {"platform": platform_value, "identity": identity},
+	}
+	# any vertex of an identity graph fetched before is answered locally
+	known = identity_store.lookup(platform_value, identity)
+	if known is not None:
+		return shape_result(known)
+	result = await cached_graphql_query(query_obj, url, ingest=True)
+	if "error" in result:
+		return f"查询执行失败: {result['error']}"
+	if result.get("identity") is None:
+		return f"查询执行失败: identity {platform_value}:{identity} not found"
+	return shape_result(result["identity"])
+
+@mcp.tool(
+	name="resolve-identities",
+	description="Resolve many identities at once on web3.bio. Each item is a (platform, identity) pair such as (ens, vitalik.eth) or (farcaster, dwr); platform must be a value of the Platform enum. All pairs are looked up with one batched GraphQL query and the identity profile and identity graph of every pair is returned, keyed by 'platform:identity'. Prefer this over several execute-query calls when the question is about more than one identity.",
+)
+async def resolve_identities(
+	identities: Annotated[List[IdentityRef], Field(description="The (platform, identity) pairs to resolve.")]
+) -> str:
+	results: Dict[str, dict] = {}
+	pairs = []
+	for ref in identities:
+		try:
+			platform = parse_platform(ref.platform)
+		except ValueError as e:
+			results[f"{ref.platform}:{ref.identity}"] = {"error": str(e)}
+			continue
+		key = identity_key(platform, ref.identity)
+		if key in results:
+			continue
+		known = identity_store.lookup(platform.value, ref.identity)
+		if known is not None:
+			results[key] = known
+		else:
+			results[key] = {}
+			pairs.append((platform, ref.identity))
+
+	chunks = list(chunked(pairs, identity_batch_size))
+	batch_queries = [build_identity_batch_query(chunk) for chunk in chunks]
+	for query_obj in batch_queries:
+		# a batch of n pairs is always the same document, only the variables differ
+		persisted_queries.register(query_obj["query"])
+	responses = await asyncio.gather(*(
+		cached_graphql_query(query_obj, url, partial=True, ingest=True) for query_obj in batch_queries
+	))
+	for chunk, data in zip(chunks, responses):
+		results.update(split_batch_result(chunk, data))
+	return shape_result(results, max_bytes=len(results) * DEFAULT_MAX_BYTES // 2)
+
+@mcp.custom_route("/cache/stats", methods=["GET"])
+async def cache_stats(request: Request) -> JSONResponse:
+	return JSONResponse({"result_cache": result_cache.stats(), "identity_store": identity_store.stats()})
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def export_metrics(request: Request) -> Response:
+	return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
-	mcp.run(transport="http", host="127.0.0.1", port=8000, path="/mcp")
+	mcp.run(
+		transport="http",
+		host=os.getenv("MCP_HOST", "127.0.0.1"),
+		port=int(os.getenv("MCP_PORT", "8000")),
+		path="/mcp",
+	)
   
 	
 	
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+from typing import Any, List, Optional
+
+try:
+	import orjson
+except ImportError:  # pragma: no cover - orjson ships with the requirements
+	orjson = None
+	import json
+
+DEFAULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", "12000"))
+DEFAULT_VERTEX_LIMIT = int(os.getenv("RESULT_VERTEX_LIMIT", "25"))
+# rough size of one LLM token in bytes of compact JSON
+BYTES_PER_TOKEN = 4
+
+def dumps(value: Any) -> str:
+	"""compact JSON, non-ASCII kept as is"""
+	if orjson is not None:
+		return orjson.dumps(value).decode("utf-8")
+	return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+def truncation_marker(remaining: int) -> str:
+	return f"… truncated, {remaining} more"
+
+def project(value: Any, fields: List[str]) -> Any:
+	"""
+	keep only the dotted `fields` paths (e.g. `identity.identityGraph.vertices.platform`);
+	lists are traversed transparently, a path ending on an object keeps the whole object
+	"""
+	tree: dict = {}
+	for path in fields:
+		node = tree
+		for part in path.split("."):
+			node = node.setdefault(part, {})
+	return _project(value, tree)
+
+def _project(value: Any, tree: dict) -> Any:
+	if not tree:
+		return value
+	if isinstance(value, list):
+		return [_project(item, tree) for item in value]
+	if isinstance(value, dict):
+		return {key: _project(value[key], sub) for key, sub in tree.items() if key in value}
+	return value
+
+def _is_address(value: Any) -> bool:
+	return isinstance(value, dict) and set(value) == {"address", "network"}
+
+def compact(value: Any) -> Any:
+	"""
+	drop null/empty fields, write {address, network} objects as `network:address`
+	and remove repeated entries from lists
+	"""
+	if _is_address(value):
+		return f"{value['network']}:{value['address']}" if value.get("network") else value.get("address")
+	if isinstance(value, dict):
+		out = {}
+		for key, item in value.items():
+			item = compact(item)
+			if item is None or item == "" or item == [] or item == {}:
+				continue
+			out[key] = item
+		return out
+	if isinstance(value, list):
+		out = []
+		seen = set()
+		for item in value:
+			item = compact(item)
+			marker = item if isinstance(item, (str, int, float, bool)) else dumps(item)
+			if marker in seen:
+				continue
+			seen.add(marker)
+			out.append(item)
+		return out
+	return value
+
+def page_vertices(value: Any, offset: int = 0, limit: Optional[int] = None) -> Any:
+	"""apply offset/limit to every identityGraph `vertices` list, noting how many were left out"""
+	if isinstance(value, list):
+		return [page_vertices(item, offset, limit) for item in value]
+	if not isinstance(value, dict):
+		return value
+	out = {}
+	for key, item in value.items():
+		if key == "vertices" and isinstance(item, list):
+			total = len(item)
+			end = total if limit is None else offset + limit
+			page = [page_vertices(v, offset, limit) for v in item[offset:end]]
+			if end < total:
+				page.append(truncation_marker(total - end))
+			out[key] = page
+			out["vertexCount"] = total
+		else:
+			out[key] = page_vertices(item, offset, limit)
+	return out
+
+def _is_marker(item: Any) -> bool:
+	return isinstance(item, str) and item.startswith("… truncated, ")
+
+def _largest_list(value: Any, best: Optional[list] = None) -> Optional[list]:
+	if isinstance(value, dict):
+		for item in value.values():
+			best = _largest_list(item, best)
+	elif isinstance(value, list):
+		if len(value) > 2 and (best is None or len(value) > len(best)):
+			best = value
+		for item in value:
+			best = _largest_list(item, best)
+	return best
+
+def fit_budget(value: Any, max_bytes: int) -> str:
+	"""serialize `value`, halving the longest lists until it fits in `max_bytes`, then hard-cutting"""
+	text = dumps(value)
+	while len(text.encode("utf-8")) > max_bytes:
+		target = _largest_list(value)
+		if target is None:
+			break
+		# `value` is a private copy made by the shaping steps, so trim in place
+		dropped = int(target.pop().split(" ")[2]) if _is_marker(target[-1]) else 0
+		keep = len(target) // 2
+		dropped += len(target) - keep
+		target[:] = target[:keep] + [truncation_marker(dropped)]
+		text = dumps(value)
+	if len(text.encode("utf-8")) > max_bytes:
+		text = _hard_cut(text, max_bytes)
+	return text
+
+def _hard_cut(text: str, max_bytes: int) -> str:
+	"""the head of `text` with a marker, as one JSON string of at most `max_bytes` (unless the marker alone is larger)"""
+	data = text.encode("utf-8")
+	keep = max_bytes
+	while True:
+		cut = data[:keep].decode("utf-8", errors="ignore")
+		out = dumps(cut + " " + truncation_marker(len(data) - len(cut.encode("utf-8"))) + " bytes")
+		# quotes and escapes make the JSON string longer than the cut, give that room back
+		overflow = len(out.encode("utf-8")) - max_bytes
+		if overflow <= 0 or keep == 0:
+			return out
+		keep = max(0, keep - overflow)
+
+def shape_result(
+	value: Any,
+	fields: Optional[List[str]] = None,
+	vertex_offset: int = 0,
+	vertex_limit: Optional[int] = DEFAULT_VERTEX_LIMIT,
+	max_bytes: Optional[int] = None,
+	max_tokens: Optional[int] = None,
+) -> str:
+	"""projection -> vertex paging -> compaction -> compact JSON within the byte/token budget"""
+	if fields:
+		value = project(value, fields)
+	value = page_vertices(value, vertex_offset, vertex_limit)
+	value = compact(value)
+	budget = max_bytes or DEFAULT_MAX_BYTES
+	if max_tokens:
+		budget = min(budget, max_tokens * BYTES_PER_TOKEN)
+	return fit_budget(value, budget)
@@ -0,0 +1,177 @@
+import copy
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from graphql import (
+	FieldNode,
+	FragmentDefinitionNode,
+	FragmentSpreadNode,
+	GraphQLError,
+	GraphQLList,
+	GraphQLNonNull,
+	GraphQLObjectType,
+	GraphQLInterfaceType,
+	InlineFragmentNode,
+	IntValueNode,
+	OperationDefinitionNode,
+	SelectionSetNode,
+	build_client_schema,
+	get_named_type,
+	parse,
+	validate,
+)
+
+from metrics import REGISTRY
+
+VALIDATIONS = REGISTRY.counter(
+	"graphql_query_validations_total", "execute-query documents checked against the cached schema, by outcome", ("result",)
+)
+
+# @skip/@include, for introspection results that did not select directives
+_SPECIFIED_DIRECTIVES = [
+	{
+		"name": name,
+		"locations": ["FIELD", "FRAGMENT_SPREAD", "INLINE_FRAGMENT"],
+		"args": [{"name": "if", "type": {"kind": "NON_NULL", "name": None, "ofType": {"kind": "SCALAR", "name": "Boolean", "ofType": None}}}],
+	}
+	for name in ("skip", "include")
+]
+
+# list arguments that bound how many items a list field returns
+_LIMIT_ARGS = ("first", "last", "limit")
+
+
+def _normalize(schema_data: Dict) -> Dict:
+	"""fill in what older, narrower introspection results did not select"""
+	root = copy.deepcopy(schema_data.get("__schema", schema_data))
+	for type_ in root.get("types", []):
+		if type_.get("kind") in ("OBJECT", "INTERFACE") and type_.get("interfaces") is None:
+			type_["interfaces"] = []
+	if not root.get("directives"):
+		root["directives"] = _SPECIFIED_DIRECTIVES
+	return {"__schema": root}
+
+
+def _format_error(error: GraphQLError) -> str:
+	message = error.message
+	if error.locations:
+		location = error.locations[0]
+		message += f" ({location.line}:{location.column})"
+	return message
+
+
+class QueryValidator:
+	"""
+	Checks query documents against one introspected schema before they are
+	sent upstream: syntax, field names, arguments and types, then a depth
+	and cost limit. Cost counts every selected field, with the fields under
+	a list multiplied by its expected length (`first`/`limit` when given as
+	a literal, `list_size` otherwise), so nesting identityGraph inside
+	identityGraph is rejected long before the depth limit.
+
+	Results are cached by the sha256 of the document text.
+	"""
+
+	def __init__(
+		self,
+		schema_data: Dict,
+		max_depth: Optional[int] = None,
+		max_cost: Optional[int] = None,
+		list_size: Optional[int] = None,
+		max_chars: Optional[int] = None,
+		cache_size: int = 256,
+	):
+		self.schema = build_client_schema(_normalize(schema_data))
+		self.max_depth = max_depth or int(os.getenv("QUERY_MAX_DEPTH", "8"))
+		# IDENTITY_QUERY costs about 1100
+		self.max_cost = max_cost or int(os.getenv("QUERY_MAX_COST", "1500"))
+		self.list_size = list_size or int(os.getenv("QUERY_LIST_SIZE", "10"))
+		self.max_chars = max_chars or int(os.getenv("QUERY_MAX_CHARS", "20000"))
+		self.cache_size = cache_size
+		self._cache: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
+
+	def check(self, query: str) -> List[str]:
+		"""validation errors of `query`, empty when it may be sent upstream"""
+		key = hashlib.sha256(query.encode()).hexdigest()
+		errors = self._cache.get(key)
+		if errors is not None:
+			self._cache.move_to_end(key)
+			VALIDATIONS.inc("cached")
+			return list(errors)
+
+		errors, result = self._check(query)
+		VALIDATIONS.inc(result)
+		self._cache[key] = tuple(errors)
+		if len(self._cache) > self.cache_size:
+			self._cache.popitem(last=False)
+		return errors
+
+	def _check(self, query: str) -> Tuple[List[str], str]:
+		if len(query) > self.max_chars:
+			return [f"Query is {len(query)} characters long, the limit is {self.max_chars}."], "too_large"
+		try:
+			document = parse(query)
+		except GraphQLError as e:
+			return [_format_error(e)], "syntax_error"
+
+		errors = validate(self.schema, document)
+		if errors:
+			return [_format_error(e) for e in errors[:5]], "invalid"
+
+		fragments = {d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)}
+		for definition in document.definitions:
+			if not isinstance(definition, OperationDefinitionNode):
+				continue
+			root_type = self.schema.get_root_type(definition.operation)
+			cost, depth = self._measure(definition.selection_set, root_type, fragments)
+			if depth > self.max_depth:
+				return [f"Query depth {depth} exceeds the limit of {self.max_depth}; select fewer nested fields."], "too_deep"
+			if cost > self.max_cost:
+				return [
+					f"Query cost {cost} exceeds the limit of {self.max_cost}; lists count {self.list_size} items unless "
+					"limited, so avoid nesting identityGraph/vertices inside each other and drop unneeded list fields."
+				], "too_costly"
+		return [], "ok"
+
+	def _list_length(self, field: FieldNode) -> int:
+		for argument in field.arguments:
+			if argument.name.value in _LIMIT_ARGS and isinstance(argument.value, IntValueNode):
+				return max(int(argument.value.value), 1)
+		return self.list_size
+
+	def _measure(self, selection_set: Optional[SelectionSetNode], parent_type, fragments: Dict[str, FragmentDefinitionNode]) -> Tuple[int, int]:
+		"""(cost, depth) of a selection set; validation already ruled out fragment cycles"""
+		if selection_set is None:
+			return 0, 0
+		cost = 0
+		depth = 0
+		for selection in selection_set.selections:
+			if isinstance(selection, FieldNode):
+				field_def = None
+				if isinstance(parent_type, (GraphQLObjectType, GraphQLInterfaceType)):
+					field_def = parent_type.fields.get(selection.name.value)
+				if field_def is None:
+					# __typename and other meta fields
+					cost += 1
+					depth = max(depth, 1)
+					continue
+				child_cost, child_depth = self._measure(selection.selection_set, get_named_type(field_def.type), fragments)
+				field_type = field_def.type.of_type if isinstance(field_def.type, GraphQLNonNull) else field_def.type
+				multiplier = self._list_length(selection) if isinstance(field_type, GraphQLList) else 1
+				cost += 1 + multiplier * child_cost
+				depth = max(depth, 1 + child_depth)
+			else:
+				if isinstance(selection, FragmentSpreadNode):
+					fragment = fragments[selection.name.value]
+					type_condition, child_set = fragment.type_condition, fragment.selection_set
+				elif isinstance(selection, InlineFragmentNode):
+					type_condition, child_set = selection.type_condition, selection.selection_set
+				else:
+					continue
+				fragment_type = self.schema.get_type(type_condition.name.value) if type_condition else parent_type
+				child_cost, child_depth = self._measure(child_set, fragment_type, fragments)
+				cost += child_cost
+				depth = max(depth, child_depth)
+		return cost, depth
@@ -1,9 +1,8 @@
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.schema import BaseMessage
 from typing import List, TypedDict, Annotated
-import os
 from dotenv import load_dotenv
+from llm import get_chat_model
 
 load_dotenv()
 
@@ -14,12 +13,8 @@ class AgentState(TypedDict):
     agent_response: Annotated[str, "agent response"]
 
 class WeatherAgent:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            base_url=os.getenv("BASE_URL"),
-            api_key=os.getenv("OPENAI_API_KEY"),
-        )
+    def __init__(self, llm=None):
+        self._llm = llm
 
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", """你是一个天气专家，专门处理天气相关的查询。
@@ -37,16 +32,21 @@ class WeatherAgent:
             请以友好的方式回复，并说明你是Weather Agent。
             注意：由于这是演示，你可能需要模拟一些天气数据。 如果是模拟的数据，请在回复中说明。
             """),
+            MessagesPlaceholder("history", optional=True),
             ("human", "{user_query}")
         ])
 
-    def process_query(self, state: AgentState) -> AgentState:
+    @property
+    def llm(self):
+        return self._llm or get_chat_model("gpt-4o-mini")
+
+    async def process_query(self, state: AgentState) -> AgentState:
         """process weather related query"""
         user_query = state["user_query"]
         
         # use LLM to process query
-        response = self.llm.invoke(
-            self.prompt.format_messages(user_query=user_query)
+        response = await self.llm.ainvoke(
+            self.prompt.format_messages(user_query=user_query, history=state.get("messages") or [])
         )
         
         # update state
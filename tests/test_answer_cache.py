@@ -0,0 +1,33 @@
+from answer_cache import AnswerCache
+
+
+def test_paraphrases_hit_and_other_entities_miss(tmp_path):
+    cache = AnswerCache(path=str(tmp_path / "answers.npz"))
+    cache.store("what is vitalik.eth's farcaster", "vitalik", "graphql_agent")
+
+    assert cache.lookup("vitalik.eth farcaster account?")["answer"] == "vitalik"
+    assert cache.lookup("sujiyan.eth farcaster account?") is None
+
+
+def test_expired_answers_are_not_returned(tmp_path):
+    cache = AnswerCache(path=str(tmp_path / "answers.npz"), ttls={"weather_agent": -1})
+    cache.store("北京今天天气怎么样", "sunny", "weather_agent")
+
+    assert cache.lookup("北京今天天气怎么样") is None
+
+
+def test_lru_eviction_and_snapshot_roundtrip(tmp_path):
+    path = str(tmp_path / "answers.npz")
+    cache = AnswerCache(path=path, max_entries=2)
+    cache.store("vitalik.eth farcaster", "a", "graphql_agent")
+    cache.store("sujiyan.eth lens", "b", "graphql_agent")
+    cache.lookup("vitalik.eth farcaster")
+    cache.store("dwr.eth github", "c", "graphql_agent")
+
+    assert cache.evictions == 1
+    assert cache.lookup("sujiyan.eth lens") is None
+
+    cache.save()
+    restored = AnswerCache(path=path)
+    assert restored.load() == 2
+    assert restored.lookup("dwr.eth github")["answer"] == "c"
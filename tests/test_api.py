@@ -0,0 +1,172 @@
+import asyncio
+import time
+
+import httpx
+
+from api import create_app
+from chatbot import ChatbotRuntime
+from test_runtime import FakeOrchestrator, FakeWeatherAgent
+
+
+class SlowGraphQLAgent:
+    """GraphQL agent stand-in whose upstream takes `delay` seconds"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def _initialize(self):
+        pass
+
+    async def run(self, state):
+        await asyncio.sleep(self.delay)
+        state["agent_response"] = f"identity of {state['user_query']}"
+        return state
+
+    async def aclose(self):
+        pass
+
+
+def make_app(delay=0.0, **options):
+    runtime = ChatbotRuntime(FakeOrchestrator(), FakeWeatherAgent(), SlowGraphQLAgent(delay))
+    return create_app(runtime, **options)
+
+
+async def serve(app, scenario):
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await scenario(client)
+
+
+def test_concurrent_sessions_share_one_loop():
+    app = make_app(delay=0.2, max_concurrency=8)
+
+    async def scenario(client):
+        started = asyncio.get_running_loop().time()
+        responses = await asyncio.gather(*(
+            client.post("/chat", json={"message": f"user{n}.eth"}) for n in range(8)
+        ))
+        return responses, asyncio.get_running_loop().time() - started
+
+    responses, elapsed = asyncio.run(serve(app, scenario))
+
+    assert [r.status_code for r in responses] == [200] * 8
+    assert len({r.json()["session_id"] for r in responses}) == 8
+    assert elapsed < 0.2 * 4
+
+
+def test_malformed_bodies_are_rejected_with_400():
+    app = make_app()
+
+    async def scenario(client):
+        return [
+            await client.post("/chat", content=content, headers={"Content-Type": "application/json"})
+            for content in ("not json", "[]", '"hi"', '{"message": 5}', '{"message": "  "}', '{"message": "hi", "session_id": 7}')
+        ]
+
+    responses = asyncio.run(serve(app, scenario))
+
+    assert [r.status_code for r in responses] == [400] * 6
+    assert [r.json()["error"] for r in responses[1:4]] == [
+        "request body must be a JSON object", "request body must be a JSON object", "message must be a string",
+    ]
+
+
+def test_saturated_server_sheds_load_with_429():
+    app = make_app(delay=0.2, max_concurrency=1, max_queue=1)
+
+    async def scenario(client):
+        return await asyncio.gather(*(
+            client.post("/chat", json={"message": f"user{n}.eth"}) for n in range(4)
+        ))
+
+    statuses = sorted(r.status_code for r in asyncio.run(serve(app, scenario)))
+
+    assert statuses == [200, 200, 429, 429]
+
+
+def test_turn_deadline_returns_504():
+    app = make_app(delay=1.0, deadline=0.05)
+
+    async def scenario(client):
+        return await client.post("/chat", json={"message": "slow.eth"})
+
+    assert asyncio.run(serve(app, scenario)).status_code == 504
+
+
+def test_waiting_for_a_busy_session_counts_against_the_deadline():
+    app = make_app(delay=1.0, deadline=0.1, max_concurrency=4)
+
+    async def scenario(client):
+        return await asyncio.gather(*(
+            client.post("/chat", json={"message": "slow.eth", "session_id": "same"}) for _ in range(2)
+        ))
+
+    started = time.perf_counter()
+    responses = asyncio.run(serve(app, scenario))
+
+    # the second request gives up while still waiting for the session, not after the first turn
+    assert [r.status_code for r in responses] == [504, 504]
+    assert time.perf_counter() - started < 1.0
+
+
+def test_sessions_are_bounded():
+    app = make_app(max_sessions=3)
+
+    async def scenario(client):
+        for n in range(10):
+            await client.post("/chat", json={"message": f"user{n}.eth", "session_id": f"s{n}"})
+        return (await client.get("/healthz")).json()
+
+    assert asyncio.run(serve(app, scenario))["sessions"] == 3
+
+
+def test_streaming_response_ends_with_final_event():
+    app = make_app()
+
+    async def scenario(client):
+        response = await client.post("/chat", json={"message": "weather?", "stream": True, "session_id": "s1"})
+        return response
+
+    response = asyncio.run(serve(app, scenario))
+
+    assert response.headers["x-session-id"] == "s1"
+    last = response.text.strip().splitlines()[-1]
+    assert '"type": "final"' in last and '"text": "sunny"' in last
+
+
+def test_shutdown_drains_in_flight_turns():
+    app = make_app(delay=0.2)
+    service = app.state.service
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            lifespan = app.router.lifespan_context(app)
+            await lifespan.__aenter__()
+            turn = asyncio.create_task(client.post("/chat", json={"message": "drain.eth"}))
+            await asyncio.sleep(0.05)
+            await lifespan.__aexit__(None, None, None)
+            rejected = await client.post("/chat", json={"message": "late.eth"})
+            return await turn, rejected
+
+    finished, rejected = asyncio.run(scenario())
+
+    assert finished.status_code == 200
+    assert rejected.status_code == 503
+    assert service.limiter.active == 0
+
+
+def test_metrics_and_traces_endpoints():
+    app = make_app()
+
+    async def scenario(client):
+        await client.post("/chat", json={"message": "vitalik.eth", "session_id": "m1"})
+        return await client.get("/metrics"), await client.get("/traces", params={"session_id": "m1"})
+
+    metrics, traces = asyncio.run(serve(app, scenario))
+
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'chatbot_turn_seconds_count{agent="graphql_agent",cached="false"}' in metrics.text
+    assert "chatbot_active_turns 0" in metrics.text
+    assert [trace["user_query"] for trace in traces.json()] == ["vitalik.eth"]
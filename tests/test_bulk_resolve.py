@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import bulk_resolve
+from bulk_resolve import amain, parse_args
+from identity_store import IdentityStore
+from mcp_transport import import_tool_server
+
+
+class BatchUpstream:
+    """answers aliased batch queries, i<n> for the pair ($p<n>, $i<n>)"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, request):
+        variables = json.loads(request.content)["variables"]
+        names = [variables[f"i{n}"] for n in range(len(variables) // 2)]
+        self.batches.append(names)
+        data = {f"i{n}": None if name.startswith("missing") else {"identity": name, "platform": variables[f"p{n}"]} for n, name in enumerate(names)}
+        return httpx.Response(200, json={"data": data})
+
+
+def run(monkeypatch, upstream, argv):
+    server = import_tool_server()
+    monkeypatch.setattr(server, "identity_store", IdentityStore(":memory:", enabled=True))
+    monkeypatch.setattr(server.graphql_client, "aclose", lambda: asyncio.sleep(0))
+
+    async def scenario():
+        monkeypatch.setattr(server.graphql_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+        return await amain(parse_args(argv))
+
+    return asyncio.run(scenario())
+
+
+def write_input(tmp_path, count):
+    path = tmp_path / "identities.csv"
+    rows = ["platform,identity"] + [f"ens,name{n}.eth" for n in range(count)]
+    rows[3] = "nowhere,bad.eth"
+    rows[5] = "ens,missing.eth"
+    path.write_text("\n".join(rows) + "\n")
+    return path
+
+
+def test_rows_are_batched_and_written_in_order(monkeypatch, tmp_path):
+    source = write_input(tmp_path, 25)
+    output = tmp_path / "out.jsonl"
+    upstream = BatchUpstream()
+
+    summary = run(monkeypatch, upstream, [str(source), "-o", str(output), "--batch-size", "10", "--concurrency", "3", "--rate", "0"])
+
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [line["row"] for line in lines] == list(range(25))
+    assert lines[0]["data"]["identity"] == "name0.eth"
+    assert "Unknown platform" in lines[2]["error"]
+    assert lines[4]["error"] == "Identity not found"
+    assert summary["rows"] == 25 and summary["errors"] == 2
+    assert [len(batch) for batch in upstream.batches] == [9, 10, 5]
+    assert not (tmp_path / "out.jsonl.checkpoint").exists()
+
+
+def test_interrupted_run_resumes_after_the_checkpoint(monkeypatch, tmp_path):
+    source = write_input(tmp_path, 30)
+    output = tmp_path / "out.jsonl"
+    first = [json.dumps({"row": n}) for n in range(10)]
+    output.write_text("\n".join(first) + "\n" + '{"row": 10, "partial')
+    checkpoint = tmp_path / "out.jsonl.checkpoint"
+    checkpoint.write_text(json.dumps({"input": str(source), "rows": 10, "offset": len("\n".join(first)) + 1}))
+    upstream = BatchUpstream()
+
+    summary = run(monkeypatch, upstream, [str(source), "-o", str(output), "--batch-size", "10", "--rate", "0"])
+
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [line["row"] for line in lines] == list(range(30))
+    assert summary["resolved_this_run"] == 20
+    assert upstream.batches[0][0] == "name10.eth"
+
+
+class PoisonedUpstream(BatchUpstream):
+    """rejects any document containing poison.eth, like a GraphQL validation error"""
+
+    def __call__(self, request):
+        variables = json.loads(request.content)["variables"]
+        if "poison.eth" in variables.values():
+            self.batches.append([variables[f"i{n}"] for n in range(len(variables) // 2)])
+            return httpx.Response(200, json={"errors": [{"message": "invalid identity 'poison.eth'"}]})
+        return super().__call__(request)
+
+
+def test_rejected_batch_is_split_to_isolate_the_bad_row(monkeypatch, tmp_path):
+    source = tmp_path / "identities.csv"
+    source.write_text("platform,identity\n" + "".join(f"ens,{'poison' if n == 6 else f'name{n}'}.eth\n" for n in range(8)))
+    output = tmp_path / "out.jsonl"
+
+    summary = run(monkeypatch, PoisonedUpstream(), [str(source), "-o", str(output), "--batch-size", "8", "--rate", "0"])
+
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [line["row"] for line in lines] == list(range(8))
+    assert "invalid identity 'poison.eth'" in lines[6]["error"]
+    assert all("data" in line for n, line in enumerate(lines) if n != 6)
+    assert summary["errors"] == 1
+
+
+def test_unavailable_upstream_stops_the_run_for_a_resume(monkeypatch, tmp_path):
+    from bulk_resolve import BatchFailedError
+
+    server = import_tool_server()
+    monkeypatch.setattr(server.upstream, "retries", 0)
+    source = write_input(tmp_path, 10)
+    output = tmp_path / "out.jsonl"
+
+    try:
+        with pytest.raises(BatchFailedError, match="HTTP 503"):
+            run(monkeypatch, lambda request: httpx.Response(503), [str(source), "-o", str(output), "--rate", "0"])
+    finally:
+        server.upstream.breaker.record_success()
+
+    assert output.read_text() == ""
+
+
+def test_checkpoint_of_another_input_is_reported_without_a_traceback(monkeypatch, tmp_path, capsys):
+    source = write_input(tmp_path, 6)
+    output = tmp_path / "out.jsonl"
+    output.write_text("")
+    (tmp_path / "out.jsonl.checkpoint").write_text(json.dumps({"input": "/elsewhere/other.csv", "rows": 1, "offset": 0}))
+    monkeypatch.setattr("sys.argv", ["bulk_resolve.py", str(source), "-o", str(output)])
+
+    with pytest.raises(SystemExit) as exit_info:
+        bulk_resolve.main()
+
+    assert exit_info.value.code == 2
+    assert capsys.readouterr().err.strip().endswith("belongs to /elsewhere/other.csv, pass --restart to start over")
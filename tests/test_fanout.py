@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from chatbot import ChatbotRuntime, create_initial_state
+from orchestrator import Orchestrator, parse_tasks
+from router import split_compound_query
+from test_runtime import FakeGraphQLAgent, SlowChatModel
+from weather_agent import WeatherAgent
+
+
+class SlowIdentityAgent:
+    def __init__(self, latency_s=0.2):
+        self.latency_s = latency_s
+        self.calls = []
+
+    async def run(self, state):
+        self.calls.append((state["route_platform"], state["route_identity"], state["user_query"]))
+        await asyncio.sleep(self.latency_s)
+        state["agent_response"] = f"{state['route_identity']} owns @vitalik on Farcaster"
+        return state
+
+
+def test_compound_queries_are_split_per_agent():
+    parts = split_compound_query("what's the weather in Shanghai and which Farcaster account does vitalik.eth own?")
+
+    assert [(text, d.agent_name) for text, d in parts] == [
+        ("what's the weather in Shanghai", "weather_agent"),
+        ("which Farcaster account does vitalik.eth own", "graphql_agent"),
+    ]
+    assert split_compound_query("北京今天天气怎么样？") is None
+    assert split_compound_query("vitalik.eth and jesse.base.eth") is None
+
+
+def test_llm_router_can_return_sub_tasks():
+    reply = '```json\n{"agent_name": "multi", "tasks": [{"agent_name": "weather_agent", "query": "上海天气"}, {"agent_name": "graphql_agent", "query": "dwr 的账号"}]}\n```'
+
+    assert parse_tasks(reply) == [
+        {"agent_name": "weather_agent", "query": "上海天气"},
+        {"agent_name": "graphql_agent", "query": "dwr 的账号"},
+    ]
+    assert parse_tasks('{"agent_name": "weather_agent"}') is None
+
+
+def test_agents_of_a_compound_query_run_in_parallel():
+    identity_agent = SlowIdentityAgent()
+    runtime = ChatbotRuntime(
+        Orchestrator(llm=SlowChatModel(reply="unused")),
+        WeatherAgent(llm=SlowChatModel(reply="Shanghai is sunny")),
+        FakeGraphQLAgent(),
+        identity_agent=identity_agent,
+    )
+
+    async def scenario():
+        async with runtime:
+            started = time.perf_counter()
+            result = await runtime.app.ainvoke(create_initial_state("what's the weather in Shanghai and which Farcaster account does vitalik.eth own?"))
+            return result, time.perf_counter() - started
+
+    result, elapsed = asyncio.run(scenario())
+
+    assert result["agent_response"] == "Shanghai is sunny\n\nvitalik.eth owns @vitalik on Farcaster"
+    assert result["agent_path"] == "parallel"
+    assert [r["agent"] for r in result["agent_results"]] == ["weather_agent", "identity_agent"]
+    assert identity_agent.calls == [("ens", "vitalik.eth", "which Farcaster account does vitalik.eth own")]
+    # two 0.2 s agents one after the other would take 0.4 s
+    assert elapsed < 0.35
+
+
+def test_compound_answers_expire_with_their_shortest_lived_agent(tmp_path):
+    from answer_cache import AnswerCache
+
+    cache = AnswerCache(path=str(tmp_path / "answers.npz"))
+    runtime = ChatbotRuntime(
+        Orchestrator(llm=SlowChatModel(reply="unused")),
+        WeatherAgent(llm=SlowChatModel(reply="Shanghai is sunny", latency_s=0.0)),
+        FakeGraphQLAgent(),
+        answer_cache=cache,
+        identity_agent=SlowIdentityAgent(latency_s=0.0),
+    )
+
+    async def scenario():
+        async with runtime:
+            await runtime.ainvoke("what's the weather in Shanghai and which Farcaster account does vitalik.eth own?")
+
+    asyncio.run(scenario())
+
+    slot = next(n for n, entry in enumerate(cache._entries) if entry is not None)
+    assert cache._entries[slot]["agent"] == "multi"
+    assert cache._expires_at[slot] - time.time() <= cache.ttls["weather_agent"]
+    cache.invalidate("weather_agent")
+    assert len(cache) == 0
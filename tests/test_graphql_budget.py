@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import StructuredTool
+from langgraph.prebuilt import create_react_agent
+
+from graphql_agent import ReactGraphQLAgent
+
+
+class ToolCallingFakeModel(GenericFakeChatModel):
+    """scripted chat model that create_react_agent can bind tools to"""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def tool_call_message(*names, tokens=100):
+    return AIMessage(
+        content="",
+        tool_calls=[{"name": name, "args": {}, "id": f"call-{n}-{name}"} for n, name in enumerate(names)],
+        usage_metadata={"input_tokens": tokens, "output_tokens": 0, "total_tokens": tokens},
+    )
+
+
+def endless_tool_calls(tokens=100):
+    step = 0
+    while True:
+        step += 1
+        message = tool_call_message("execute-query", tokens=tokens)
+        message.tool_calls[0]["id"] = f"call-{step}"
+        yield message
+
+
+def make_agent(replies, tool_delay=0.0, model=None, **budgets):
+    async def slow_tool() -> str:
+        await asyncio.sleep(tool_delay)
+        return "partial tool result"
+
+    tools = [
+        StructuredTool.from_function(coroutine=slow_tool, name=name, description=name)
+        for name in ("discover-query-schema", "execute-query")
+    ]
+    model = model or ToolCallingFakeModel(messages=iter(replies))
+    agent = ReactGraphQLAgent(llm=model, **budgets)
+    agent.tools = tools
+    agent.agent = create_react_agent(model=model, tools=tools)
+    agent._initialized = True
+    return agent
+
+
+def run(agent, history=None):
+    state = {"messages": history or [], "current_agent": "graphql_agent", "user_query": "q", "agent_response": ""}
+    return asyncio.run(agent.run(state))
+
+
+def test_answer_within_budget():
+    agent = make_agent([tool_call_message("execute-query"), AIMessage(content="done")])
+
+    state = run(agent)
+
+    assert state["agent_response"] == "done"
+    assert state["budget_usage"]["exhausted"] is None
+    assert state["budget_usage"]["iterations"] == 2
+
+
+def test_iteration_budget_returns_partial_answer():
+    agent = make_agent(endless_tool_calls(), max_iterations=3)
+
+    state = run(agent)
+
+    assert state["budget_usage"]["exhausted"] == "iterations"
+    assert state["budget_usage"]["iterations"] == 3
+    assert "partial tool result" in state["agent_response"]
+
+
+def test_history_does_not_count_against_the_budget():
+    history = []
+    for n in range(8):
+        history += [HumanMessage(content=f"question {n}"), AIMessage(content=f"earlier answer {n}", usage_metadata={"input_tokens": 900, "output_tokens": 0, "total_tokens": 900})]
+    agent = make_agent([tool_call_message("execute-query"), AIMessage(content="done")], max_iterations=3, max_tokens=1000)
+
+    state = run(agent, history)
+
+    assert state["agent_response"] == "done"
+    assert state["budget_usage"] == {**state["budget_usage"], "iterations": 2, "tokens": 100, "exhausted": None}
+
+
+def test_partial_answer_never_repeats_an_earlier_turn():
+    history = [HumanMessage(content="question 0"), AIMessage(content="earlier answer")]
+    agent = make_agent(endless_tool_calls(), max_iterations=2)
+
+    state = run(agent, history)
+
+    assert state["budget_usage"]["exhausted"] == "iterations"
+    assert "earlier answer" not in state["agent_response"]
+    assert "partial tool result" in state["agent_response"]
+
+
+def test_token_budget():
+    agent = make_agent(endless_tool_calls(tokens=400), max_tokens=1000)
+
+    state = run(agent)
+
+    assert state["budget_usage"]["exhausted"] == "tokens"
+    assert state["budget_usage"]["tokens"] >= 1000
+
+
+def test_time_budget_cancels_in_flight_tools():
+    agent = make_agent([tool_call_message("execute-query"), AIMessage(content="never")], tool_delay=5.0, max_seconds=0.2)
+
+    started = time.perf_counter()
+    state = run(agent)
+
+    assert time.perf_counter() - started < 1.0
+    assert state["budget_usage"]["exhausted"] == "time"
+
+
+def test_tool_calls_of_one_step_run_concurrently():
+    agent = make_agent(
+        [tool_call_message("discover-query-schema", "execute-query"), AIMessage(content="done")],
+        tool_delay=0.3,
+    )
+
+    started = time.perf_counter()
+    state = run(agent)
+
+    assert state["agent_response"] == "done"
+    assert time.perf_counter() - started < 0.55
@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+import pytest
+
+from graphql_client import GraphQLClient
+
+
+def make_client(handler, **options):
+    client = GraphQLClient(http2=False, **options)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_calls_share_one_pooled_client():
+    requests = []
+
+    def upstream(request):
+        requests.append(request)
+        return httpx.Response(200, json={"data": {"n": len(requests)}})
+
+    client = make_client(upstream)
+
+    async def scenario():
+        pooled = client.client
+        bodies = [body for _, body in await asyncio.gather(*(client.post_json("http://upstream/graphql", {"query": "{n}"}) for _ in range(5)))]
+        assert client.client is pooled
+        await client.aclose()
+        assert client._client is None
+        # the next call opens a new pool instead of failing on the closed one
+        reopened = client.client
+        assert reopened is not pooled and not reopened.is_closed
+        await client.aclose()
+        return bodies
+
+    bodies = asyncio.run(scenario())
+
+    assert len(requests) == 5
+    assert sorted(body["data"]["n"] for body in bodies) == [1, 2, 3, 4, 5]
+
+
+def test_pool_limits_and_timeouts_come_from_the_options():
+    client = GraphQLClient(pool_size=3, connect_timeout=1.5, read_timeout=7.0, http2=False)
+
+    async def scenario():
+        timeout = client.client.timeout
+        await client.aclose()
+        return timeout
+
+    timeout = asyncio.run(scenario())
+
+    assert (timeout.connect, timeout.read, timeout.pool) == (1.5, 7.0, 1.5)
+
+
+def test_error_status_returns_no_body():
+    client = make_client(lambda request: httpx.Response(502, text="<html>bad gateway</html>"))
+
+    response, body = asyncio.run(client.post_json("http://upstream/graphql", {"query": "{n}"}))
+
+    assert response.status_code == 502
+    assert body is None
+
+
+def test_deadline_raises_timeout_error():
+    async def slow(request):
+        await asyncio.sleep(1.0)
+        return httpx.Response(200, json={"data": {}})
+
+    client = make_client(slow)
+
+    with pytest.raises(TimeoutError, match="deadline"):
+        asyncio.run(client.post_json("http://upstream/graphql", {"query": "{n}"}, deadline=0.05))
+
+
+def test_oversized_response_is_refused():
+    client = make_client(lambda request: httpx.Response(200, json={"data": {"bio": "x" * 4096}}))
+    client.max_response_bytes = 1024
+
+    with pytest.raises(ValueError, match="larger than 1024 bytes"):
+        asyncio.run(client.post_json("http://upstream/graphql", {"query": "{n}"}))
+
+
+def test_connection_errors_propagate():
+    def unreachable(request):
+        raise httpx.ConnectError("connection refused")
+
+    client = make_client(unreachable)
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(client.post_json("http://upstream/graphql", {"query": "{n}"}))
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from graphql import parse
+
+from identity import IdentityRef, build_identity_batch_query, chunked, parse_platform, split_batch_result
+from mcp_transport import import_tool_server
+from platforms import Platform
+
+PAIRS = [(Platform.ENS, "vitalik.eth"), (Platform.FARCASTER, "dwr"), (Platform.LENS, "stani.lens")]
+
+
+def test_parse_platform_accepts_values_and_names():
+    assert parse_platform(" ENS ") is Platform.ENS
+    assert parse_platform(Platform.FARCASTER.value.upper()) is Platform.FARCASTER
+    with pytest.raises(ValueError, match="Unknown platform 'myspace'"):
+        parse_platform("myspace")
+
+
+def test_batch_query_has_one_alias_per_pair():
+    query_obj = build_identity_batch_query(PAIRS)
+
+    operation = parse(query_obj["query"]).definitions[0]
+    assert [s.alias.value for s in operation.selection_set.selections] == ["i0", "i1", "i2"]
+    assert [v.variable.name.value for v in operation.variable_definitions] == ["p0", "i0", "p1", "i1", "p2", "i2"]
+    assert query_obj["variables"] == {
+        "p0": "ens", "i0": "vitalik.eth", "p1": "farcaster", "i1": "dwr", "p2": "lens", "i2": "stani.lens",
+    }
+    # the document only depends on the batch size, so it can be registered as a persisted query
+    assert build_identity_batch_query(list(reversed(PAIRS)))["query"] == query_obj["query"]
+    assert [len(chunk) for chunk in chunked(PAIRS * 3, 4)] == [4, 4, 1]
+
+
+def test_errors_are_split_per_alias_and_partial_data_is_kept():
+    data = {
+        "i0": {"identity": "vitalik.eth"},
+        "i1": None,
+        "i2": None,
+        "errors": [
+            {"message": "upstream timeout", "path": ["i1"]},
+            {"message": "resolver failed", "path": ["i1", "profile"]},
+            {"message": "no path at all"},
+        ],
+    }
+
+    results = split_batch_result(PAIRS, data)
+
+    assert results == {
+        "ens:vitalik.eth": {"identity": "vitalik.eth"},
+        "farcaster:dwr": {"error": "upstream timeout; resolver failed"},
+        "lens:stani.lens": {"error": "Identity not found"},
+    }
+
+
+def test_whole_batch_error_applies_to_every_pair():
+    results = split_batch_result(PAIRS, {"error": "Query failed: circuit open"})
+
+    assert set(results) == {"ens:vitalik.eth", "farcaster:dwr", "lens:stani.lens"}
+    assert all(result == {"error": "Query failed: circuit open"} for result in results.values())
+
+
+def test_resolve_identities_sends_each_pair_once(monkeypatch):
+    server = import_tool_server()
+    sent = []
+
+    def upstream(request):
+        variables = json.loads(request.content)["variables"]
+        sent.append(variables)
+        aliases = sorted(key for key in variables if key.startswith("i"))
+        return httpx.Response(200, json={"data": {alias: {"identity": variables[alias]} for alias in aliases}})
+
+    async def scenario():
+        monkeypatch.setattr(server.identity_store, "enabled", False)
+        monkeypatch.setattr(server.result_cache, "ttl", 0)
+        monkeypatch.setattr(server.graphql_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+        return await server.resolve_identities.fn([
+            IdentityRef(platform="ens", identity="vitalik.eth"),
+            IdentityRef(platform="ENS", identity="vitalik.eth"),
+            IdentityRef(platform="farcaster", identity="dwr"),
+            IdentityRef(platform="myspace", identity="tom"),
+        ])
+
+    results = json.loads(asyncio.run(scenario()))
+
+    assert sent == [{"p0": "ens", "i0": "vitalik.eth", "p1": "farcaster", "i1": "dwr"}]
+    assert results["ens:vitalik.eth"] == {"identity": "vitalik.eth"}
+    assert results["myspace:tom"] == {"error": "Unknown platform 'myspace'"}
+
+
+def test_platform_is_one_enum_under_both_import_paths():
+    import platforms
+    import router
+    from tools import platforms as package_platforms
+
+    assert package_platforms is platforms
+    assert router.Platform is Platform
+    assert isinstance(parse_platform("ens"), router.Platform)
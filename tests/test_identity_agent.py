@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+
+from identity_agent import IdentityLookupAgent
+
+
+class ToolOnlyGraphQLAgent:
+    """ReAct agent stand-in that only exposes its MCP tools and records fallbacks"""
+
+    def __init__(self, lookup):
+        self.tools = [StructuredTool.from_function(coroutine=lookup, name="lookup-identity", description="lookup")]
+        self.react_runs = 0
+
+    async def _initialize(self):
+        pass
+
+    async def run(self, state):
+        self.react_runs += 1
+        state["agent_response"] = "react answer"
+        state["agent_path"] = "react"
+        return state
+
+
+def make_state(platform, identity):
+    return {
+        "messages": [],
+        "current_agent": "identity_agent",
+        "user_query": f"which farcaster account does {identity} own?",
+        "agent_response": "",
+        "route_platform": platform,
+        "route_identity": identity,
+    }
+
+
+def test_template_path_answers_with_one_summarization_call():
+    calls = []
+
+    async def lookup(platform: str, identity: str) -> str:
+        calls.append((platform, identity))
+        return json.dumps({"identity": identity, "identityGraph": {"vertices": [{"platform": "farcaster", "identity": "vitalik"}]}})
+
+    graphql_agent = ToolOnlyGraphQLAgent(lookup)
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="vitalik.eth owns farcaster:vitalik")]))
+    agent = IdentityLookupAgent(graphql_agent, llm=llm)
+
+    state = asyncio.run(agent.run(make_state("ens", "vitalik.eth")))
+
+    assert calls == [("ens", "vitalik.eth")]
+    assert state["agent_response"] == "vitalik.eth owns farcaster:vitalik"
+    assert state["agent_path"] == "template"
+    assert state["agent_latency_ms"] >= 0
+    assert graphql_agent.react_runs == 0
+
+
+def test_failed_lookup_falls_back_to_react_agent():
+    async def lookup(platform: str, identity: str) -> str:
+        return "查询执行失败: identity ens:nobody.eth not found"
+
+    graphql_agent = ToolOnlyGraphQLAgent(lookup)
+    agent = IdentityLookupAgent(graphql_agent, llm=GenericFakeChatModel(messages=iter([])))
+
+    state = asyncio.run(agent.run(make_state("ens", "nobody.eth")))
+
+    assert state["agent_response"] == "react answer"
+    assert state["agent_path"] == "react"
+    assert graphql_agent.react_runs == 1
+
+
+def test_unreachable_mcp_server_falls_back_to_react_agent():
+    async def lookup(platform: str, identity: str) -> str:
+        raise AssertionError("the tools are not loaded")
+
+    class UnreachableGraphQLAgent(ToolOnlyGraphQLAgent):
+        async def _initialize(self):
+            raise ConnectionError("All connection attempts failed")
+
+    graphql_agent = UnreachableGraphQLAgent(lookup)
+    agent = IdentityLookupAgent(graphql_agent, llm=GenericFakeChatModel(messages=iter([])))
+
+    state = asyncio.run(agent.run(make_state("ens", "vitalik.eth")))
+
+    assert state["agent_response"] == "react answer"
+    assert graphql_agent.react_runs == 1
@@ -0,0 +1,153 @@
+import asyncio
+import copy
+import json
+import os
+import time
+
+import httpx
+
+from identity import IdentityRef
+from identity_store import IdentityStore
+from mcp_transport import import_tool_server
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures", "identity.json")
+
+
+def load_identity():
+    with open(FIXTURE) as f:
+        return json.load(f)
+
+
+def test_every_vertex_is_answered_from_one_graph():
+    store = IdentityStore(":memory:", enabled=True)
+    identity = load_identity()
+
+    written = store.ingest({"identity": identity})
+
+    vertices = identity["identityGraph"]["vertices"]
+    assert written == len(vertices)
+    other = vertices[-1]
+    record = store.lookup(other["platform"], other["identity"])
+    assert record["identity"] == other["identity"]
+    assert record["identityGraph"]["graphId"] == identity["identityGraph"]["graphId"]
+    assert len(record["identityGraph"]["vertices"]) == len(vertices)
+    assert "expiredAt" not in record
+    # the queried identity keeps its full record
+    assert store.lookup(identity["platform"], identity["identity"])["aliases"] == identity["aliases"]
+    assert store.lookup("ens", "unknown.eth") is None
+
+
+def test_expired_and_stale_vertices_are_not_served():
+    store = IdentityStore(":memory:", enabled=True)
+    identity = load_identity()
+    expired = identity["identityGraph"]["vertices"][1]
+    expired["expiredAt"] = int(time.time()) - 60
+    store.ingest({"identity": identity})
+
+    assert store.lookup(expired["platform"], expired["identity"]) is None
+    assert store.lookup(identity["platform"], identity["identity"]) is not None
+
+    store.max_age = 0
+    assert store.lookup(identity["platform"], identity["identity"]) is None
+
+
+def test_older_vertices_do_not_replace_newer_ones():
+    store = IdentityStore(":memory:", enabled=True)
+    newer = load_identity()
+    vertex = newer["identityGraph"]["vertices"][2]
+    vertex["profile"] = {"displayName": "newer"}
+    store.ingest({"identity": newer})
+
+    older = copy.deepcopy(newer)
+    older["identityGraph"]["graphId"] = "another-graph"
+    older_vertex = older["identityGraph"]["vertices"][2]
+    older_vertex["updatedAt"] -= 1000
+    older_vertex["profile"] = {"displayName": "older"}
+    store.ingest({"identity": older})
+
+    record = store.lookup(vertex["platform"], vertex["identity"])
+    assert record["profile"]["displayName"] == "newer"
+
+
+def test_partial_projection_keeps_stored_fields():
+    store = IdentityStore(":memory:", enabled=True)
+    identity = load_identity()
+    store.ingest({"identity": identity})
+    vertex = identity["identityGraph"]["vertices"][2]
+
+    narrow = {
+        "platform": identity["platform"],
+        "identity": identity["identity"],
+        "identityGraph": {
+            "graphId": identity["identityGraph"]["graphId"],
+            "vertices": [
+                {"platform": v["platform"], "identity": v["identity"], "updatedAt": v.get("updatedAt")}
+                for v in identity["identityGraph"]["vertices"]
+            ],
+        },
+    }
+    store.ingest({"identity": narrow})
+
+    assert store.lookup(identity["platform"], identity["identity"])["aliases"] == identity["aliases"]
+    record = store.lookup(vertex["platform"], vertex["identity"])
+    assert {key: record[key] for key in vertex if key not in ("expiredAt", "registeredAt")} == {
+        key: value for key, value in vertex.items() if key not in ("expiredAt", "registeredAt")
+    }
+
+
+def test_only_fresh_identity_query_results_are_ingested(monkeypatch):
+    server = import_tool_server()
+    identity = load_identity()
+    ingested = []
+
+    def upstream(request):
+        return httpx.Response(200, json={"data": {"identity": identity}})
+
+    async def scenario():
+        store = IdentityStore(":memory:", enabled=True)
+        monkeypatch.setattr(store, "ingest", lambda result: ingested.append(result))
+        monkeypatch.setattr(store, "lookup", lambda platform, identity: None)
+        monkeypatch.setattr(server, "identity_store", store)
+        monkeypatch.setattr(server, "validate_query", lambda query: asyncio.sleep(0, []))
+        monkeypatch.setattr(server.result_cache, "ttl", 60)
+        server.result_cache.clear()
+        monkeypatch.setattr(server.graphql_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+        await server.execute_query.fn("{ identity(platform: ens, identity: \"vitalik.eth\") { identity } }")
+        await server.lookup_identity.fn(identity["platform"], identity["identity"])
+        # answered by the result cache this time
+        await server.lookup_identity.fn(identity["platform"], identity["identity"])
+        server.result_cache.clear()
+
+    asyncio.run(scenario())
+
+    assert len(ingested) == 1
+
+
+def test_lookup_identity_answers_known_vertices_without_upstream(monkeypatch):
+    server = import_tool_server()
+    identity = load_identity()
+    linked = identity["identityGraph"]["vertices"][3]
+    requests = []
+
+    def upstream(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"data": {"identity": identity}})
+
+    async def scenario():
+        monkeypatch.setattr(server, "identity_store", IdentityStore(":memory:", enabled=True))
+        monkeypatch.setattr(server.result_cache, "ttl", 0)
+        monkeypatch.setattr(server.graphql_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+        first = await server.lookup_identity.fn(identity["platform"], identity["identity"])
+        second = await server.lookup_identity.fn(linked["platform"], linked["identity"])
+        batch = await server.resolve_identities.fn([
+            IdentityRef(platform=linked["platform"], identity=linked["identity"]),
+            IdentityRef(platform=identity["platform"], identity=identity["identity"]),
+        ])
+        return first, second, batch
+
+    first, second, batch = asyncio.run(scenario())
+
+    assert len(requests) == 1
+    assert linked["identity"] in second
+    assert identity["identityGraph"]["graphId"] in second
+    assert f"{linked['platform']}:{linked['identity']}" in batch
@@ -0,0 +1,32 @@
+import asyncio
+import json
+
+import httpx
+
+from mcp_transport import import_tool_server, load_inprocess_tools
+
+
+def test_inprocess_tools_call_the_server_functions(monkeypatch):
+    server = import_tool_server()
+    requests = []
+
+    def upstream(request):
+        body = json.loads(request.content)
+        requests.append(body)
+        identity = {"identity": body["variables"]["identity"], "platform": "ens", "profile": {"displayName": "Inproc"}}
+        return httpx.Response(200, json={"data": {"identity": identity}})
+
+    async def scenario():
+        monkeypatch.setattr(server.graphql_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+        tools = {tool.name: tool for tool in await load_inprocess_tools()}
+        found = await tools["lookup-identity"].ainvoke({"platform": "ENS", "identity": "inproc-test.eth"})
+        rejected = await tools["lookup-identity"].ainvoke({"platform": "nowhere", "identity": "x"})
+        return tools, found, rejected
+
+    tools, found, rejected = asyncio.run(scenario())
+
+    assert {"lookup-identity", "execute-query", "discover-query-schema"} <= set(tools)
+    assert "Inproc" in found
+    assert requests[0]["variables"] == {"platform": "ens", "identity": "inproc-test.eth"}
+    assert rejected.startswith("查询执行失败")
+    assert len(requests) == 1
@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+from answer_cache import AnswerCache
+from chatbot import ChatbotRuntime
+from memory import ConversationMemory, InMemoryConversationStore, SqliteConversationStore, messages_tokens
+from test_runtime import FakeGraphQLAgent, FakeOrchestrator, FakeWeatherAgent
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        return SimpleNamespace(content=f"summary #{self.calls}")
+
+
+def test_in_memory_store_evicts_least_recently_used_sessions():
+    memory = ConversationMemory(InMemoryConversationStore(max_sessions=2))
+
+    async def scenario():
+        await memory.append_turn("a", "q", "a1")
+        await memory.append_turn("b", "q", "b1")
+        memory.history("a")
+        await memory.append_turn("c", "q", "c1")
+
+    asyncio.run(scenario())
+
+    assert memory.history("b") == []
+    assert [m.content for m in memory.history("a")] == ["q", "a1"]
+
+
+def test_sqlite_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    asyncio.run(ConversationMemory(SqliteConversationStore(path)).append_turn("s1", "vitalik.eth?", "ens name"))
+
+    reopened = ConversationMemory(SqliteConversationStore(path))
+
+    assert [m.content for m in reopened.history("s1")] == ["vitalik.eth?", "ens name"]
+
+
+def test_long_history_is_compacted_into_a_summary():
+    summarizer = FakeSummarizer()
+    memory = ConversationMemory(
+        InMemoryConversationStore(), summarizer, window=4, summary_threshold=200, max_tokens=400,
+    )
+
+    async def scenario():
+        for n in range(20):
+            await memory.append_turn("s", f"question {n} " + "x" * 100, f"answer {n} " + "y" * 100)
+
+    asyncio.run(scenario())
+    history = memory.history("s")
+
+    assert summarizer.calls > 0
+    assert history[0].content.endswith(f"summary #{summarizer.calls}")
+    assert len(history) <= 5
+    assert messages_tokens(history) <= 400
+    assert history[-1].content.startswith("answer 19")
+
+
+def test_runtime_passes_session_history_to_agents():
+    seen = []
+
+    class RecordingGraphQLAgent(FakeGraphQLAgent):
+        async def run(self, state):
+            seen.append([m.content for m in state["messages"]])
+            return await super().run(state)
+
+    runtime = ChatbotRuntime(
+        FakeOrchestrator(), FakeWeatherAgent(), RecordingGraphQLAgent(),
+        memory=ConversationMemory(InMemoryConversationStore()),
+    )
+
+    async def scenario():
+        async with runtime:
+            await runtime.ainvoke("vitalik.eth", session_id="s1")
+            await runtime.ainvoke("and his lens?", session_id="s1")
+            await runtime.ainvoke("sujiyan.eth", session_id="s2")
+
+    asyncio.run(scenario())
+
+    assert seen == [[], ["vitalik.eth", "identity of vitalik.eth"], []]
+
+
+def test_turns_naming_an_identity_use_the_answer_cache_despite_history(tmp_path):
+    class CountingGraphQLAgent(FakeGraphQLAgent):
+        runs = 0
+
+        async def run(self, state):
+            self.runs += 1
+            return await super().run(state)
+
+    graphql_agent = CountingGraphQLAgent()
+    runtime = ChatbotRuntime(
+        FakeOrchestrator(), FakeWeatherAgent(), graphql_agent,
+        answer_cache=AnswerCache(path=str(tmp_path / "answers.npz")),
+        memory=ConversationMemory(InMemoryConversationStore()),
+    )
+
+    async def scenario():
+        async with runtime:
+            # one session for every turn, like the CLI
+            await runtime.ainvoke("who is vitalik.eth", session_id="cli")
+            await runtime.ainvoke("and his lens?", session_id="cli")
+            await runtime.ainvoke("who is vitalik.eth", session_id="cli")
+            await runtime.ainvoke("and his lens?", session_id="cli")
+
+    asyncio.run(scenario())
+
+    # the repeated identity question is served from the cache, follow-ups always run
+    assert graphql_agent.runs == 3
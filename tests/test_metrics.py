@@ -0,0 +1,88 @@
+import asyncio
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+import telemetry
+from chatbot import ChatbotRuntime
+from test_runtime import FakeGraphQLAgent, FakeOrchestrator
+from tools.metrics import Registry
+from weather_agent import WeatherAgent
+
+
+def test_prometheus_text_format():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ("status",))
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    registry.collect("queue_depth", "gauge", "Queued", lambda: 3)
+
+    requests.inc("200")
+    requests.inc("200")
+    requests.inc('5"x', amount=0.5)
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.observe(value, "/chat")
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{status="200"} 2' in text
+    assert 'requests_total{status="5\\"x"} 0.5' in text
+    assert 'latency_seconds_bucket{route="/chat",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="/chat",le="1"} 3' in text
+    assert 'latency_seconds_bucket{route="/chat",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/chat"} 4' in text
+    assert 'latency_seconds_sum{route="/chat"} 2.65' in text
+    assert "queue_depth 3" in text
+
+
+def test_same_name_returns_the_registered_metric():
+    registry = Registry()
+
+    assert registry.counter("turns_total", "Turns") is registry.counter("turns_total", "Turns")
+
+
+def test_turn_trace_covers_nodes_and_llm_calls():
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="sunny", usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15})]))
+    runtime = ChatbotRuntime(FakeOrchestrator(), WeatherAgent(llm=llm), FakeGraphQLAgent())
+    weather_nodes = telemetry.NODE_SECONDS.count("weather_agent")
+    prompt_tokens = telemetry.LLM_TOKENS.value("weather_agent", "GenericFakeChatModel", "prompt")
+
+    async def scenario():
+        async with runtime:
+            return await runtime.ainvoke("weather in Shanghai", session_id="s1")
+
+    assert asyncio.run(scenario()) == "sunny"
+
+    trace = telemetry.recent_traces[-1]
+    assert trace["session_id"] == "s1"
+    assert trace["agent"] == "weather_agent"
+    assert [span["name"] for span in trace["spans"] if span["kind"] == "node"] == ["orchestrator", "weather_agent", "format_response"]
+    llm_span = next(span for span in trace["spans"] if span["kind"] == "llm")
+    assert llm_span["name"] == "weather_agent"
+    assert llm_span["prompt_tokens"] == 12
+    assert telemetry.NODE_SECONDS.count("weather_agent") == weather_nodes + 1
+    assert telemetry.LLM_TOKENS.value("weather_agent", "GenericFakeChatModel", "prompt") == prompt_tokens + 12
+
+
+def test_disabled_telemetry_attaches_nothing(monkeypatch):
+    monkeypatch.setattr(telemetry, "ENABLED", False)
+
+    assert telemetry.turn_tracer("s1", "q") is None
+    assert telemetry.run_config(None) is None
+
+
+def test_disabled_registry_records_nothing():
+    registry = Registry(enabled=False)
+    requests = registry.counter("requests_total", "Requests", ("status",))
+    latency = registry.histogram("latency_seconds", "Latency")
+    reads = []
+    registry.collect("queue_depth", "gauge", "Queued", lambda: reads.append(1) or 3)
+
+    requests.inc("200")
+    latency.observe(0.5)
+    text = registry.render()
+
+    assert requests.value("200") == 0
+    assert latency.count() == 0
+    assert "queue_depth" not in text
+    assert reads == []
@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import json
+
+import httpx
+
+from graphql_client import GraphQLClient
+from persisted_queries import PersistedQueryRegistry, document_hash
+from query import IDENTITY_QUERY
+
+URL = "http://upstream.test/graphql"
+VARIABLES = {"platform": "ens", "identity": "vitalik.eth"}
+
+
+class APQServer:
+    """GraphQL endpoint stand-in speaking the automatic persisted query protocol"""
+
+    def __init__(self, supports_apq=True):
+        self.supports_apq = supports_apq
+        self.documents = {}
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.requests.append((len(request.content), body))
+        persisted = (body.get("extensions") or {}).get("persistedQuery")
+        query = body.get("query")
+        if persisted and self.supports_apq:
+            digest = persisted["sha256Hash"]
+            if query is None:
+                query = self.documents.get(digest)
+                if query is None:
+                    return httpx.Response(200, json={"errors": [{"message": "PersistedQueryNotFound", "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]})
+            elif hashlib.sha256(query.encode()).hexdigest() != digest:
+                return httpx.Response(400, json={"errors": [{"message": "provided sha does not match query"}]})
+            else:
+                self.documents[digest] = query
+        if query is None:
+            return httpx.Response(400, json={"errors": [{"message": "Must provide query string."}]})
+        return httpx.Response(200, json={"data": {"identity": {"identity": body["variables"]["identity"]}}})
+
+
+def make_client(server, registry):
+    client = GraphQLClient(persisted_queries=registry)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(server))
+    return client
+
+
+def post(client, query, times):
+    async def scenario():
+        return [await client.post_query(URL, {"query": query, "variables": VARIABLES}) for _ in range(times)]
+    return asyncio.run(scenario())
+
+
+def test_hash_negotiation_then_hash_only_requests():
+    server = APQServer()
+    client = make_client(server, PersistedQueryRegistry(pinned=[IDENTITY_QUERY], enabled=True))
+
+    results = post(client, IDENTITY_QUERY, 3)
+
+    assert all(body["data"]["identity"]["identity"] == "vitalik.eth" for _, body in results)
+    sent = [body for _, body in server.requests]
+    # hash only, not found; hash + document; then hash only
+    assert ["query" in body for body in sent] == [False, True, False, False]
+    assert sent[0]["extensions"]["persistedQuery"]["sha256Hash"] == document_hash(IDENTITY_QUERY)
+    full_size, hashed_size = server.requests[1][0], server.requests[2][0]
+    assert hashed_size < full_size / 5
+
+
+def test_server_without_persisted_queries_gets_full_documents():
+    server = APQServer(supports_apq=False)
+    registry = PersistedQueryRegistry(pinned=[IDENTITY_QUERY], enabled=True)
+    client = make_client(server, registry)
+
+    results = post(client, IDENTITY_QUERY, 3)
+
+    assert all(body["data"] for _, body in results)
+    # one failed hash-only attempt, then plain requests only
+    assert ["query" in body for _, body in server.requests] == [False, True, True, True]
+    assert not registry.applies_to(URL)
+
+
+def test_unregistered_documents_are_sent_in_full():
+    server = APQServer()
+    client = make_client(server, PersistedQueryRegistry(pinned=[IDENTITY_QUERY], enabled=True))
+    query = 'query { identity(platform: ens, identity: "vitalik.eth") { identity } }'
+
+    post(client, query, 2)
+
+    assert [("query" in body, "extensions" in body) for _, body in server.requests] == [(True, False), (True, False)]
+
+
+def test_registry_evicts_least_recently_used_documents():
+    registry = PersistedQueryRegistry(pinned=[IDENTITY_QUERY], max_documents=2, enabled=True)
+    registry.register("query A { a }")
+    registry.register("query B { b }")
+    registry.lookup("query A { a }")
+    registry.register("query C { c }")
+
+    assert registry.lookup("query B { b }") is None
+    assert registry.lookup("query A { a }") is not None
+    assert registry.lookup(IDENTITY_QUERY) == document_hash(IDENTITY_QUERY)
+    assert len(registry) == 3
+
+
+def test_transient_error_on_a_hash_request_keeps_persisted_queries():
+    server = APQServer()
+    registry = PersistedQueryRegistry(pinned=[IDENTITY_QUERY], enabled=True)
+    client = make_client(server, registry)
+    failures = [httpx.Response(502, text="bad gateway")]
+
+    def flaky(request):
+        return failures.pop() if failures else server(request)
+
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(flaky))
+
+    (response, body), = post(client, IDENTITY_QUERY, 1)
+
+    # the 502 goes back to the caller's retry layer instead of being re-sent as a plain query
+    assert (response.status_code, body) == (502, None)
+    assert server.requests == []
+    assert registry.applies_to(URL)
+
+    post(client, IDENTITY_QUERY, 2)
+
+    assert ["query" in body for _, body in server.requests] == [False, True, False]
+    assert registry.applies_to(URL)
+
+
+def test_graphql_error_on_a_hash_request_is_not_sent_again():
+    requests = []
+
+    def failing(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"data": None, "errors": [{"message": "identity resolver timed out"}]})
+
+    registry = PersistedQueryRegistry(pinned=[IDENTITY_QUERY], enabled=True)
+    client = make_client(failing, registry)
+
+    (response, body), = post(client, IDENTITY_QUERY, 1)
+
+    assert body["errors"][0]["message"] == "identity resolver timed out"
+    assert ["query" in body for body in requests] == [False]
+    assert registry.applies_to(URL)
@@ -0,0 +1,132 @@
+import asyncio
+
+import httpx
+from graphql import build_schema, introspection_from_schema
+
+from mcp_transport import import_tool_server
+from schema import SchemaInfo
+from validation import QueryValidator
+
+SDL = """
+enum Platform { ens farcaster lens }
+type Address { address: String! network: String }
+type Profile { displayName: String addresses: [Address!] }
+type IdentityGraph { graphId: String! vertices: [Identity!]! }
+type Identity {
+  identity: String!
+  platform: Platform!
+  profile: Profile
+  identityGraph: IdentityGraph
+}
+type Query { identity(platform: Platform!, identity: String!): Identity }
+"""
+
+SCHEMA_DATA = introspection_from_schema(build_schema(SDL))
+
+
+def make_validator(**limits):
+    return QueryValidator(SCHEMA_DATA, **limits)
+
+
+def test_valid_query_passes():
+    validator = make_validator()
+
+    errors = validator.check('query { identity(platform: ens, identity: "vitalik.eth") { identity profile { displayName } } }')
+
+    assert errors == []
+
+
+def test_errors_are_precise_and_compact():
+    validator = make_validator()
+
+    unknown_field = validator.check('{ identity(platform: ens, identity: "a") { identity displayName } }')
+    missing_arg = validator.check("{ identity(platform: ens) { identity } }")
+    bad_enum = validator.check('{ identity(platform: twitter, identity: "a") { identity } }')
+    syntax = validator.check('{ identity(platform: ens, identity: "a") { identity ')
+
+    assert unknown_field == ["Cannot query field 'displayName' on type 'Identity'. (1:53)"]
+    assert "argument 'identity' of type 'String!' is required" in missing_arg[0]
+    assert "does not exist in 'Platform' enum" in bad_enum[0]
+    assert syntax[0].startswith("Syntax Error")
+
+
+def test_nested_identity_graphs_exceed_the_cost_limit():
+    validator = make_validator(max_cost=500)
+    nested = (
+        '{ identity(platform: ens, identity: "a") { identityGraph { vertices { '
+        "identityGraph { vertices { identity profile { addresses { address } } } } } } } }"
+    )
+
+    errors = validator.check(nested)
+
+    assert errors and errors[0].startswith("Query cost")
+
+
+def test_depth_limit():
+    validator = make_validator(max_depth=3)
+
+    errors = validator.check('{ identity(platform: ens, identity: "a") { identityGraph { vertices { identity } } } }')
+
+    assert errors == ["Query depth 4 exceeds the limit of 3; select fewer nested fields."]
+
+
+def test_results_are_cached_by_document_hash(monkeypatch):
+    validator = make_validator()
+    query = '{ identity(platform: ens, identity: "a") { identity } }'
+    validator.check(query)
+    monkeypatch.setattr(validator, "_check", lambda query: (_ for _ in ()).throw(AssertionError("not cached")))
+
+    assert validator.check(query) == []
+
+
+def test_execute_query_rejects_invalid_queries_without_an_upstream_call(monkeypatch):
+    server = import_tool_server()
+    calls = []
+
+    def upstream(request):
+        calls.append(request)
+        return httpx.Response(200, json={"data": {"identity": {"identity": "a"}}})
+
+    async def cached_schema(refresh=False):
+        return SchemaInfo("test", server.url, SCHEMA_DATA)
+
+    async def scenario():
+        monkeypatch.setattr(server, "get_schema", cached_schema)
+        monkeypatch.setattr(server.graphql_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+        invalid = await server.execute_query.fn('{ identity(platform: ens, identity: "validation-test") { nope } }')
+        valid = await server.execute_query.fn('{ identity(platform: ens, identity: "validation-test") { identity } }')
+        return invalid, valid
+
+    invalid, valid = asyncio.run(scenario())
+
+    assert invalid.startswith("查询执行失败: 本地校验未通过: Cannot query field 'nope'")
+    assert '"identity"' in valid
+    assert len(calls) == 1
+
+
+def test_failed_introspection_is_not_retried_by_every_query(monkeypatch):
+    server = import_tool_server()
+    requests = []
+
+    def upstream(request):
+        body = request.content.decode()
+        requests.append("introspection" if "__schema" in body else "query")
+        return httpx.Response(503)
+
+    async def scenario():
+        monkeypatch.setattr(server, "schemas", server.SchemaCache(path=":unused:", ttl=0))
+        monkeypatch.setattr(server, "_schema_error", None)
+        monkeypatch.setattr(server.upstream, "retries", 0)
+        # one request per attempt, without the persisted-query round trip
+        monkeypatch.setattr(server.graphql_client, "persisted_queries", None)
+        monkeypatch.setattr(server.result_cache, "ttl", 0)
+        monkeypatch.setattr(server.result_cache, "error_ttl", 0)
+        monkeypatch.setattr(server.graphql_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+        for n in range(3):
+            await server.execute_query.fn(f'query {{ identity(platform: ens, identity: "user{n}.eth") {{ identity }} }}')
+        server.upstream.breaker.record_success()
+
+    asyncio.run(scenario())
+
+    assert requests.count("introspection") == 1
+    assert requests.count("query") == 3
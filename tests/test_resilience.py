@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from mcp_transport import import_tool_server
+from resilience import CircuitBreaker, CircuitOpenError, ResilientExecutor, UpstreamHTTPError
+
+
+def make_executor(**options):
+    options.setdefault("breaker", CircuitBreaker(failure_threshold=3, reset_timeout=0.05))
+    options.setdefault("retries", 2)
+    options.setdefault("base_delay", 0.001)
+    options.setdefault("max_delay", 0.001)
+    options.setdefault("max_elapsed", 5.0)
+    options.setdefault("hedge", False)
+    return ResilientExecutor(**options)
+
+
+def flaky(*outcomes):
+    """an upstream call that raises or returns the given outcomes in turn"""
+    calls = []
+
+    async def fn():
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(outcome)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    return fn, calls
+
+
+def test_transient_failures_are_retried():
+    executor = make_executor()
+    fn, calls = flaky(UpstreamHTTPError(502, "Bad Gateway"), httpx.ReadTimeout("slow"), "ok")
+
+    assert asyncio.run(executor.call(fn)) == "ok"
+    assert len(calls) == 3
+    assert executor.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_are_not_retried():
+    executor = make_executor()
+    fn, calls = flaky(UpstreamHTTPError(400, "Bad Request"), "ok")
+
+    with pytest.raises(UpstreamHTTPError):
+        asyncio.run(executor.call(fn))
+    assert len(calls) == 1
+    assert executor.breaker.failures == 0
+
+
+def test_retries_are_bounded():
+    executor = make_executor(retries=1)
+    fn, calls = flaky(UpstreamHTTPError(503, "Service Unavailable"))
+
+    with pytest.raises(UpstreamHTTPError):
+        asyncio.run(executor.call(fn))
+    assert len(calls) == 2
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    executor = make_executor(retries=0)
+    down, calls = flaky(httpx.ConnectError("refused"))
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(httpx.ConnectError):
+                await executor.call(down)
+        with pytest.raises(CircuitOpenError):
+            await executor.call(down)
+        assert len(calls) == 3
+        await asyncio.sleep(0.06)
+        # half-open: the probe succeeds and closes the breaker
+        assert await executor.call(flaky("ok")[0]) == "ok"
+
+    asyncio.run(scenario())
+    assert executor.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.before_call()
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_hedged_request_wins_over_a_slow_one():
+    executor = make_executor(hedge=True, hedge_min_samples=5, hedge_min_delay=0.01)
+    for _ in range(5):
+        executor.latencies.add(0.01)
+    started = []
+
+    async def call():
+        started.append(time.monotonic())
+        # the first request stalls, the duplicate answers quickly
+        await asyncio.sleep(1.0 if len(started) == 1 else 0.01)
+        return len(started)
+
+    async def scenario():
+        begin = time.monotonic()
+        result = await executor.call(call)
+        return result, time.monotonic() - begin
+
+    result, elapsed = asyncio.run(scenario())
+
+    assert result == 2
+    assert elapsed < 0.5
+
+
+def test_execute_graphql_query_retries_bad_gateway(monkeypatch):
+    server = import_tool_server()
+    responses = [httpx.Response(502), httpx.Response(200, json={"data": {"identity": {"identity": "a"}}})]
+
+    def upstream(request):
+        return responses.pop(0)
+
+    monkeypatch.setattr(server, "upstream", make_executor())
+    monkeypatch.setattr(server.graphql_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+
+    result = asyncio.run(server.execute_graphql_query({"query": "query { identity { identity } }"}, "http://upstream.test/graphql"))
+
+    assert result == {"identity": {"identity": "a"}}
+    assert responses == []
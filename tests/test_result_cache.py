@@ -0,0 +1,109 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from result_cache import ResultCache, normalize_query
+
+
+def entry_size(result):
+    return len(json.dumps(result, separators=(",", ":")))
+
+
+def test_formatting_differences_share_a_key():
+    a = ResultCache.make_key('query { identity(platform: ens, identity: "vitalik.eth") { id } }')
+    b = ResultCache.make_key('query {\n  identity(platform: ens, identity: "vitalik.eth") {\n    id # the id\n  }\n}')
+
+    assert a == b
+    assert normalize_query('{ a(x: "a  b") }') == '{a(x:"a  b")}'
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    result = {"data": "x" * 80}
+    cache = ResultCache(max_bytes=3 * entry_size(result), ttl=60)
+    for key in "abc":
+        cache.put(key, result)
+    cache.get("a")
+
+    cache.put("d", result)
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    assert cache.size == 3 * entry_size(result)
+    assert cache.evictions == 1
+
+
+def test_results_and_errors_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl=60, error_ttl=5)
+    cache.put("ok", {"identity": {}})
+    cache.put("failed", {"error": "Query failed: 502"})
+
+    now[0] += 10
+    assert cache.get("failed") is None
+    assert cache.get("ok") is not None
+
+    now[0] += 60
+    assert cache.get("ok") is None
+    assert cache.expirations == 2
+    assert cache.size == 0
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = ResultCache(ttl=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"identity": {"id": "ens,vitalik.eth"}}
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_fetch("key", fetch) for _ in range(5)))
+        return results + [await cache.get_or_fetch("key", fetch)]
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert all(result == results[0] for result in results)
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 4, 1)
+
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    cache = ResultCache(ttl=60)
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return {"identity": {}}
+
+    async def scenario():
+        leader = asyncio.ensure_future(cache.get_or_fetch("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_fetch("key", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == {"identity": {}}
+    assert cache.get("key") == {"identity": {}}
+
+
+def test_failed_fetch_is_raised_to_every_caller_and_not_cached():
+    cache = ResultCache(ttl=60)
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_fetch("key", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("key") is None
+    assert cache.stats()["inflight"] == 0
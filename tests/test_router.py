@@ -0,0 +1,28 @@
+from router import classify_query
+
+
+def test_identity_names_route_to_graphql_agent():
+    decision = classify_query("what is vitalik.eth's farcaster")
+    assert decision.agent_name == "graphql_agent"
+    assert (decision.platform, decision.identity) == ("ens", "vitalik.eth")
+
+    assert classify_query("jesse.base.eth").platform == "basenames"
+    assert classify_query("toly.sol accounts").platform == "sns"
+    assert classify_query("@dwr on farcaster")[2:] == ("farcaster", "dwr")
+
+
+def test_addresses_route_to_graphql_agent():
+    decision = classify_query("who owns 0xD8dA6BF26964aF9D7eEd9e03E53415D37aA96045")
+    assert decision.agent_name == "graphql_agent"
+    assert decision.identity == "0xd8da6bf26964af9d7eed9e03e53415d37aa96045"
+
+
+def test_weather_keywords_route_to_weather_agent():
+    assert classify_query("北京今天天气怎么样？").agent_name == "weather_agent"
+    assert classify_query("Will it rain in New York tomorrow?").agent_name == "weather_agent"
+
+
+def test_ambiguous_queries_fall_back_to_llm():
+    assert classify_query("tell me a joke") is None
+    assert classify_query("mode of transport") is None
+    assert classify_query("weather in Shanghai and who is vitalik.eth") is None
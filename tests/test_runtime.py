@@ -0,0 +1,201 @@
+import asyncio
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import chatbot
+from chatbot import ChatbotRuntime
+from orchestrator import Orchestrator
+from weather_agent import WeatherAgent
+
+
+class FakeOrchestrator:
+    def route_query(self, state):
+        state["current_agent"] = "weather_agent" if "weather" in state["user_query"] else "graphql_agent"
+        return state
+
+    def should_continue(self, state):
+        return state["current_agent"]
+
+    def format_response(self, state):
+        return state
+
+
+class FakeWeatherAgent:
+    def process_query(self, state):
+        state["agent_response"] = "sunny"
+        return state
+
+
+class FakeGraphQLAgent:
+    def __init__(self):
+        self.initialize_calls = 0
+
+    async def _initialize(self):
+        self.initialize_calls += 1
+
+    async def run(self, state):
+        state["agent_response"] = f"identity of {state['user_query']}"
+        return state
+
+    async def aclose(self):
+        pass
+
+
+def test_graph_is_built_once_across_turns(monkeypatch):
+    builds = []
+    original = chatbot.create_chatbot
+
+    def counting_create_chatbot(*args, **kwargs):
+        builds.append(1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(chatbot, "create_chatbot", counting_create_chatbot)
+    graphql_agent = FakeGraphQLAgent()
+    runtime = ChatbotRuntime(FakeOrchestrator(), FakeWeatherAgent(), graphql_agent)
+
+    async def scenario():
+        async with runtime:
+            responses = [
+                await runtime.ainvoke("weather in Shanghai"),
+                await runtime.ainvoke("sujiyan.eth"),
+                await runtime.ainvoke("vitalik.eth"),
+            ]
+        return responses
+
+    responses = asyncio.run(scenario())
+
+    assert responses == ["sunny", "identity of sujiyan.eth", "identity of vitalik.eth"]
+    assert len(builds) == 1
+    assert graphql_agent.initialize_calls == 1
+
+
+def test_agents_are_built_when_first_routed_to(monkeypatch):
+    built = []
+
+    def new_weather_agent():
+        built.append("weather_agent")
+        return FakeWeatherAgent()
+
+    def new_graphql_agent():
+        built.append("graphql_agent")
+        return FakeGraphQLAgent()
+
+    monkeypatch.setenv("AGENT_WARMUP", "0")
+    monkeypatch.setattr(chatbot, "new_weather_agent", new_weather_agent)
+    monkeypatch.setattr(chatbot, "new_graphql_agent", new_graphql_agent)
+    runtime = ChatbotRuntime(FakeOrchestrator())
+
+    async def scenario():
+        async with runtime:
+            assert built == []
+            responses = [await runtime.ainvoke("weather in Shanghai"), await runtime.ainvoke("weather in Beijing")]
+        return responses
+
+    assert asyncio.run(scenario()) == ["sunny", "sunny"]
+    # the graphql agent was never routed to, so it was never built (nor closed)
+    assert built == ["weather_agent"]
+
+
+def test_partial_answers_are_not_cached(tmp_path):
+    from answer_cache import AnswerCache
+
+    class ExhaustedGraphQLAgent(FakeGraphQLAgent):
+        runs = 0
+
+        async def run(self, state):
+            self.runs += 1
+            state["agent_response"] = "（已达到本轮迭代次数预算，以下为部分结果）"
+            state["budget_usage"] = {"iterations": 8, "tokens": 0, "elapsed_ms": 0.0, "exhausted": "iterations"}
+            return state
+
+    graphql_agent = ExhaustedGraphQLAgent()
+    cache = AnswerCache(path=str(tmp_path / "answers.npz"))
+    runtime = ChatbotRuntime(FakeOrchestrator(), FakeWeatherAgent(), graphql_agent, answer_cache=cache)
+
+    async def scenario():
+        async with runtime:
+            await runtime.ainvoke("vitalik.eth")
+            async for _ in runtime.astream("vitalik.eth"):
+                pass
+
+    asyncio.run(scenario())
+
+    assert graphql_agent.runs == 2
+    assert cache.lookup("vitalik.eth") is None
+
+
+def test_start_is_idempotent():
+    runtime = ChatbotRuntime(FakeOrchestrator(), FakeWeatherAgent(), FakeGraphQLAgent())
+
+    async def scenario():
+        await runtime.start()
+        app = runtime.app
+        await runtime.start()
+        same = runtime.app is app
+        await runtime.aclose()
+        return same
+
+    assert asyncio.run(scenario())
+    assert not runtime.started
+
+
+class SlowChatModel(BaseChatModel):
+    """answers after a fixed delay; the sync path blocks, the async path does not"""
+
+    latency_s: float = 0.2
+    reply: str = "sunny"
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_s)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_s)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+
+def test_concurrent_turns_do_not_block_each_other():
+    llm = SlowChatModel()
+    runtime = ChatbotRuntime(Orchestrator(llm=llm), WeatherAgent(llm=llm), FakeGraphQLAgent())
+
+    async def scenario():
+        async with runtime:
+            started = time.perf_counter()
+            answers = await asyncio.gather(*(runtime.ainvoke(f"weather in city {n} today?") for n in range(8)))
+            return answers, time.perf_counter() - started
+
+    answers, elapsed = asyncio.run(scenario())
+
+    assert answers == ["sunny"] * 8
+    # eight blocking calls would take 8 * 0.2 s
+    assert elapsed < 0.8
+
+
+def test_lazy_agent_is_built_once_across_threads():
+    import threading
+
+    from chatbot import LazyAgent
+
+    builds = []
+
+    def factory():
+        builds.append(1)
+        time.sleep(0.05)
+        return FakeWeatherAgent()
+
+    agent = LazyAgent(factory)
+    threads = [threading.Thread(target=agent.get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert agent.process_query({})["agent_response"] == "sunny"
@@ -0,0 +1,68 @@
+from graphql import build_schema, introspection_from_schema
+
+from schema import SchemaIndex
+
+SDL = """
+type Query {
+  identity(platform: Platform!, identity: String!): Identity
+  domain(name: String!): Domain
+}
+
+enum Platform { ens farcaster lens }
+
+type Identity {
+  identity: String!
+  profile: Profile
+  identityGraph: IdentityGraph
+}
+
+type Domain {
+  name: String!
+  owner: Identity
+  profile: Profile
+}
+
+type IdentityGraph {
+  graphId: String!
+  vertices: [Identity!]!
+}
+
+type Profile {
+  displayName: String
+  avatar: String
+}
+"""
+
+
+def make_index():
+    return SchemaIndex(introspection_from_schema(build_schema(SDL)))
+
+
+def test_describe_type_renders_sdl():
+    index = make_index()
+
+    assert index.describe_type("identitygraph") == "type IdentityGraph {\n  graphId: String!\n  vertices: [Identity!]!\n}"
+    assert index.describe_type("Platform") == "enum Platform { ens farcaster lens }"
+    assert "identity(platform: Platform!, identity: String!): Identity" in index.describe_type("Query")
+    assert index.describe_type("Nope") == "Unknown type 'Nope'"
+
+
+def test_every_shortest_path_is_listed():
+    index = make_index()
+
+    assert index.find_field_paths("displayName") == [
+        "Query.identity -> Identity.profile -> Profile.displayName: String",
+        "Query.domain -> Domain.profile -> Profile.displayName: String",
+    ]
+    # Identity is also reachable through Domain.owner, but that path is longer
+    assert index.find_field_paths("graphId") == [
+        "Query.identity -> Identity.identityGraph -> IdentityGraph.graphId: String!",
+    ]
+
+
+def test_find_field_paths_honours_limit_and_depth():
+    index = make_index()
+
+    assert len(index.find_field_paths("displayName", limit=1)) == 1
+    assert index.find_field_paths("graphId", max_depth=2) == []
+    assert index.find_field_paths("missing") == []
@@ -0,0 +1,64 @@
+import gzip
+import json
+import time
+
+from schema import SchemaInfo
+from schema_cache import CACHE_VERSION, SchemaCache
+
+SCHEMA = {"__schema": {"queryType": {"name": "Query"}, "types": []}}
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache = SchemaCache(str(tmp_path / "schemas.json.gz"), ttl=60)
+    cache.put(SchemaInfo("fresh", "http://fresh/graphql", SCHEMA))
+    cache.put(SchemaInfo("old", "http://old/graphql", SCHEMA, fetched_at=time.time() - 120))
+
+    assert "http://fresh/graphql" in cache
+    assert cache.get("http://old/graphql") is None
+    assert [s.name for s in cache.values()] == ["fresh"]
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "schemas.json.gz")
+    fetched_at = time.time() - 30
+    SchemaCache(path, ttl=60).put(SchemaInfo("web3.bio", "http://upstream/graphql", SCHEMA, fetched_at))
+
+    restored = SchemaCache(path, ttl=60)
+
+    assert restored.load() == 1
+    schema_info = restored.get("http://upstream/graphql")
+    assert (schema_info.name, schema_info.schema, schema_info.fetched_at) == ("web3.bio", SCHEMA, fetched_at)
+    # entries that expired while the server was down are not loaded
+    assert SchemaCache(path, ttl=10).load() == 0
+
+
+def test_other_versions_and_unreadable_files_are_ignored(tmp_path):
+    path = tmp_path / "schemas.json.gz"
+    SchemaCache(str(path)).put(SchemaInfo("web3.bio", "http://upstream/graphql", SCHEMA))
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        raw = json.load(f)
+    raw["version"] = CACHE_VERSION - 1
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(raw, f)
+
+    assert SchemaCache(str(path)).load() == 0
+
+    path.write_bytes(b"not gzip")
+    assert SchemaCache(str(path)).load() == 0
+    assert SchemaCache(str(tmp_path / "missing.json.gz")).load() == 0
+
+
+def test_invalidation_is_persisted(tmp_path):
+    path = str(tmp_path / "schemas.json.gz")
+    cache = SchemaCache(path)
+    cache.put(SchemaInfo("a", "http://a/graphql", SCHEMA))
+    cache.put(SchemaInfo("b", "http://b/graphql", SCHEMA))
+
+    assert cache.invalidate("http://a/graphql") == 1
+    assert cache.invalidate("http://a/graphql") == 0
+    reloaded = SchemaCache(path)
+    assert reloaded.load() == 1
+    assert reloaded.get("http://b/graphql") is not None
+
+    assert cache.invalidate() == 1
+    assert SchemaCache(path).load() == 0
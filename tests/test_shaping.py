@@ -0,0 +1,61 @@
+import json
+
+from shaping import shape_result
+
+
+def identity_result(vertex_count):
+    address = {"address": "0xd8da6bf26964af9d7eed9e03e53415d37aa96045", "network": "ethereum"}
+    return {
+        "identity": {
+            "identity": "vitalik.eth",
+            "avatar": None,
+            "resolvedAddress": [address, address],
+            "identityGraph": {
+                "graphId": "g1",
+                "vertices": [
+                    {"identity": f"user{n}.eth", "platform": "ens", "ownerAddress": [address], "profile": {"texts": {"bio": "x" * 80}}}
+                    for n in range(vertex_count)
+                ],
+            },
+        }
+    }
+
+
+def test_projection_and_vertex_paging():
+    shaped = json.loads(shape_result(
+        identity_result(10),
+        fields=["identity.identityGraph.vertices.identity"],
+        vertex_offset=2,
+        vertex_limit=3,
+    ))
+
+    graph = shaped["identity"]["identityGraph"]
+    assert graph["vertices"] == [{"identity": "user2.eth"}, {"identity": "user3.eth"}, {"identity": "user4.eth"}, "… truncated, 5 more"]
+    assert graph["vertexCount"] == 10
+
+
+def test_nulls_dropped_and_addresses_deduplicated():
+    shaped = json.loads(shape_result(identity_result(1)))
+
+    assert "avatar" not in shaped["identity"]
+    assert shaped["identity"]["resolvedAddress"] == ["ethereum:0xd8da6bf26964af9d7eed9e03e53415d37aa96045"]
+
+
+def test_byte_budget_truncates_with_marker():
+    text = shape_result(identity_result(100), vertex_limit=100, max_bytes=2000)
+
+    assert len(text.encode("utf-8")) <= 2000
+    vertices = json.loads(text)["identity"]["identityGraph"]["vertices"]
+    kept = len(vertices) - 1
+    assert vertices[-1] == f"… truncated, {100 - kept} more"
+
+
+def test_hard_cut_stays_valid_json_within_budget():
+    value = {"identity": {"profile": {"bio": 'he said "gm" ' * 500, "name": "维塔利克" * 200}}}
+
+    text = shape_result(value, max_bytes=1000)
+
+    assert len(text.encode("utf-8")) <= 1000
+    cut = json.loads(text)
+    assert cut.startswith('{"identity":{"profile":{"bio":"he said \\"gm\\"')
+    assert cut.endswith(" more bytes")
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+from chatbot import ChatbotRuntime
+from orchestrator import Orchestrator
+from weather_agent import WeatherAgent
+from test_graphql_budget import ToolCallingFakeModel, make_agent, tool_call_message
+from test_runtime import FakeGraphQLAgent, FakeOrchestrator
+
+
+def fake_llm(*replies):
+    return GenericFakeChatModel(messages=iter([AIMessage(content=r) for r in replies]))
+
+
+def collect(runtime, query):
+    async def scenario():
+        async with runtime:
+            return [event async for event in runtime.astream(query)]
+
+    return asyncio.run(scenario())
+
+
+def test_weather_answer_is_streamed_token_by_token():
+    runtime = ChatbotRuntime(
+        Orchestrator(llm=fake_llm()),
+        WeatherAgent(llm=fake_llm("Shanghai is sunny today")),
+        FakeGraphQLAgent(),
+    )
+
+    events = collect(runtime, "weather in Shanghai today?")
+
+    tokens = [e["text"] for e in events if e["type"] == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == "Shanghai is sunny today"
+    final = events[-1]
+    assert final["type"] == "final"
+    assert final["text"] == "Shanghai is sunny today"
+    assert final["agent"] == "weather_agent"
+    assert 0 <= final["ttft_ms"] <= final["total_ms"]
+
+
+def test_router_output_is_not_streamed():
+    runtime = ChatbotRuntime(
+        Orchestrator(llm=fake_llm('{"agent_name": "none"}', "hello there")),
+        WeatherAgent(llm=fake_llm()),
+        FakeGraphQLAgent(),
+    )
+
+    events = collect(runtime, "tell me a joke")
+
+    assert "".join(e["text"] for e in events if e["type"] == "token") == "hello there"
+    assert events[-1]["text"] == "hello there"
+
+
+class StreamingToolModel(ToolCallingFakeModel):
+    """streams each reply word by word and its tool calls as a last chunk, like a chat model API"""
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = next(self.messages)
+        for n, word in enumerate(message.content.split(" ")):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if n == 0 else " " + word))
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": n}
+                for n, call in enumerate(message.tool_calls)
+            ]))
+
+
+def test_react_text_before_tool_calls_is_not_streamed():
+    preamble = tool_call_message("execute-query")
+    preamble.content = "Let me look that up first."
+    model = StreamingToolModel(messages=iter([preamble, AIMessage(content="vitalik.eth owns dwr")]))
+    graphql_agent = make_agent([], model=model)
+    runtime = ChatbotRuntime(FakeOrchestrator(), WeatherAgent(llm=fake_llm()), graphql_agent)
+
+    events = collect(runtime, "vitalik.eth")
+
+    tokens = [e for e in events if e["type"] == "token"]
+    assert "".join(e["text"] for e in tokens) == "vitalik.eth owns dwr"
+    assert {e["node"] for e in tokens} == {"graphql_agent"}
+    assert [e["name"] for e in events if e["type"] == "tool_start"] == ["execute-query"]
+    assert events[-1]["text"] == "vitalik.eth owns dwr"